@@ -0,0 +1,494 @@
+"""
+In-process stand-ins for Supabase, Groq, Gemini and Adzuna used by the
+benchmarks. They implement only the client surface the pipelines call,
+with configurable latency, error rate and canned output, so runs need no
+credentials or network and are reproducible from a seed.
+
+install() wires them in through util.clients.set_client and
+job_fetcher.set_session, the same hooks the pipelines use in production.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+SKILLS = [
+    "Python", "SQL", "Spark", "Airflow", "Kubernetes", "Docker", "Terraform", "AWS",
+    "Azure", "GCP", "React", "TypeScript", "JavaScript", "Node.js", "Java", "Go",
+    "PostgreSQL", "MongoDB", "Redis", "Kafka", "dbt", "Snowflake", "Tableau", "Power BI",
+    "Pandas", "NumPy", "PyTorch", "TensorFlow", "scikit-learn", "Git", "Linux", "CI/CD",
+    "REST APIs", "GraphQL", "Excel", "Statistics", "A/B Testing", "Time Series Analysis",
+    "Data Modeling", "ETL", "Microservices", "Jenkins", "Ansible", "Hadoop", "Scala",
+]
+ROLES = ["Data Engineer", "Data Scientist", "Backend Engineer", "Frontend Engineer", "ML Engineer"]
+
+FILLER = (
+    "You will collaborate with cross-functional partners, own delivery end to end "
+    "and help shape the roadmap of a fast-growing team."
+)
+BOILERPLATE = "We are an equal opportunity employer and value diversity. Apply now."
+
+
+class FakeAPIError(Exception):
+    """Raised by the LLM stubs at the configured error rate."""
+
+    status_code = 500
+
+
+class RateLimitError(FakeAPIError):
+    status_code = 429
+
+
+def _sleep(latency_s: float, jitter: float, rng: random.Random) -> None:
+    if latency_s > 0:
+        time.sleep(latency_s * (1.0 + rng.uniform(-jitter, jitter)))
+
+
+# ---------------------------------------------------------------------------
+# Supabase
+# ---------------------------------------------------------------------------
+
+class _Response:
+    def __init__(self, data: Any):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._filters: List[tuple] = []
+        self._op = "select"
+        self._payload: Any = None
+        self._on_conflict: Optional[str] = None
+        self._range: Optional[tuple] = None
+        self._order: Optional[str] = None
+        self._single = False
+
+    def select(self, *_args, **_kwargs) -> "_Query":
+        return self
+
+    def eq(self, column: str, value: Any) -> "_Query":
+        self._filters.append((column, {value}))
+        return self
+
+    def in_(self, column: str, values) -> "_Query":
+        self._filters.append((column, set(values)))
+        return self
+
+    def order(self, column: str, **_kwargs) -> "_Query":
+        self._order = column
+        return self
+
+    def range(self, start: int, end: int) -> "_Query":
+        self._range = (start, end)
+        return self
+
+    def limit(self, n: int) -> "_Query":
+        self._range = (0, n - 1)
+        return self
+
+    def single(self) -> "_Query":
+        self._single = True
+        return self
+
+    def insert(self, rows) -> "_Query":
+        self._op, self._payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None) -> "_Query":
+        self._op, self._payload = "upsert", rows if isinstance(rows, list) else [rows]
+        self._on_conflict = on_conflict
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "_Query":
+        self._op, self._payload = "update", values
+        return self
+
+    def delete(self) -> "_Query":
+        self._op = "delete"
+        return self
+
+    def execute(self) -> _Response:
+        self._db.round_trip()
+        return self._db.run(self)
+
+
+class FakeSupabase:
+    """
+    Table-backed Supabase client. Tables are lists of dicts with lazily
+    built per-column indexes, so filtered reads stay fast at benchmark sizes.
+    """
+
+    def __init__(self, *, latency_s: float = 0.0, seed: int = 0):
+        self.latency_s = latency_s
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.calls = 0
+        self._lock = threading.RLock()
+        self._indexes: Dict[tuple, Dict[Any, List[int]]] = {}
+        self._next_id = 1
+        self._rng = random.Random(seed)
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def round_trip(self) -> None:
+        with self._lock:
+            self.calls += 1
+        _sleep(self.latency_s, 0.2, self._rng)
+
+    def load(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for row in rows:
+                self._append(table, dict(row))
+
+    def _append(self, table: str, row: Dict[str, Any]) -> None:
+        row.setdefault("id", self._next_id)
+        self._next_id += 1
+        self.tables.setdefault(table, []).append(row)
+        self._drop_indexes(table)
+
+    def _drop_indexes(self, table: str) -> None:
+        for key in [k for k in self._indexes if k[0] == table]:
+            del self._indexes[key]
+
+    def _index(self, table: str, column: str) -> Dict[Any, List[int]]:
+        key = (table, column)
+        index = self._indexes.get(key)
+        if index is None:
+            index = {}
+            for pos, row in enumerate(self.tables.get(table, [])):
+                index.setdefault(row.get(column), []).append(pos)
+            self._indexes[key] = index
+        return index
+
+    def _matching(self, query: _Query) -> List[Dict[str, Any]]:
+        rows = self.tables.get(query._table, [])
+        if not query._filters:
+            return list(rows)
+        column, values = query._filters[0]
+        index = self._index(query._table, column)
+        positions = sorted(p for v in values for p in index.get(v, ()))
+        return [
+            rows[p] for p in positions
+            if all(rows[p].get(c) in vs for c, vs in query._filters[1:])
+        ]
+
+    def run(self, query: _Query) -> _Response:
+        with self._lock:
+            if query._op == "insert":
+                for row in query._payload:
+                    self._append(query._table, dict(row))
+                return _Response(query._payload)
+
+            if query._op == "upsert":
+                keys = (query._on_conflict or "id").split(",")
+                rows = self.tables.setdefault(query._table, [])
+                by_key = {tuple(r.get(k) for k in keys): i for i, r in enumerate(rows)}
+                for row in query._payload:
+                    pos = by_key.get(tuple(row.get(k) for k in keys))
+                    if pos is None:
+                        self._append(query._table, dict(row))
+                        by_key[tuple(row.get(k) for k in keys)] = len(rows) - 1
+                    else:
+                        rows[pos] = {**rows[pos], **row}
+                self._drop_indexes(query._table)
+                return _Response(query._payload)
+
+            matched = self._matching(query)
+            if query._op == "update":
+                for row in matched:
+                    row.update(query._payload)
+                self._drop_indexes(query._table)
+                return _Response([dict(r) for r in matched])
+            if query._op == "delete":
+                ids = {id(r) for r in matched}
+                self.tables[query._table] = [r for r in self.tables.get(query._table, []) if id(r) not in ids]
+                self._drop_indexes(query._table)
+                return _Response(matched)
+
+            if query._order:
+                matched.sort(key=lambda r: (r.get(query._order) is None, r.get(query._order)))
+            if query._range:
+                matched = matched[query._range[0]:query._range[1] + 1]
+            if query._single:
+                return _Response(dict(matched[0]) if matched else None)
+            return _Response([dict(r) for r in matched])
+
+
+# ---------------------------------------------------------------------------
+# LLMs
+# ---------------------------------------------------------------------------
+
+class _LLMStub:
+    """
+    latency_s is the time to the first token and char_latency_s the
+    generation time per output character; trailer is appended to every
+    answer, like the explanations models add after the JSON. malformed_rate
+    of the answers get a defect: a code fence, trailing comma, single
+    quotes, truncation, or no JSON at all.
+    """
+
+    STREAM_CHUNK_CHARS = 16
+
+    def __init__(self, *, latency_s: float = 0.0, char_latency_s: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 malformed_rate: float = 0.0, jitter: float = 0.2, trailer: str = "",
+                 seed: int = 0):
+        self.latency_s = latency_s
+        self.char_latency_s = char_latency_s
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.jitter = jitter
+        self.trailer = trailer
+        self.calls = 0
+        self.chars_generated = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _call(self) -> None:
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+        _sleep(self.latency_s, self.jitter, self._rng)
+        if roll < self.rate_limit_rate:
+            raise RateLimitError("429 Too Many Requests: rate limit exceeded")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise FakeAPIError("500 upstream model error")
+
+    def _corrupt(self, content: str) -> str:
+        with self._lock:
+            if self._rng.random() >= self.malformed_rate:
+                return content
+            defect = self._rng.randrange(5)
+        if defect == 0:
+            return f"```json\n{content}\n```"
+        if defect == 1:
+            return content[:-1] + ",]" if content.endswith("]") else content
+        if defect == 2:
+            return content.replace('"', "'")
+        if defect == 3:
+            return content[: max(1, len(content) * 2 // 3)]
+        return "Sorry, I cannot produce that list."
+
+    def _generate(self, content: str) -> str:
+        """Whole answer at once, after its full generation time."""
+        content = self._corrupt(content) + self.trailer
+        _sleep(len(content) * self.char_latency_s, self.jitter, self._rng)
+        with self._lock:
+            self.chars_generated += len(content)
+        return content
+
+    def _stream(self, content: str) -> Iterator[str]:
+        """Answer in small chunks, each after its own generation time."""
+        content = self._corrupt(content) + self.trailer
+        for start in range(0, len(content), self.STREAM_CHUNK_CHARS):
+            piece = content[start:start + self.STREAM_CHUNK_CHARS]
+            _sleep(len(piece) * self.char_latency_s, self.jitter, self._rng)
+            with self._lock:
+                self.chars_generated += len(piece)
+            yield piece
+
+
+def _section(prompt: str, start: str, end: str) -> List[str]:
+    body = prompt.split(start, 1)[-1].split(end, 1)[0]
+    return [line.strip() for line in body.splitlines() if line.strip()]
+
+
+def gap_responder(messages: List[Dict[str, str]]) -> str:
+    """Canned Groq answer: market skills whose lowercase name is not on the resume."""
+    prompt = next(m["content"] for m in messages if m["role"] == "user")
+    resume = {s.lower() for s in _section(prompt, "(from resume):", "REQUIRED MARKET SKILLS")}
+    market = _section(prompt, "(from job postings):", "Task:")
+    return json.dumps([s for s in market if s.lower() not in resume])
+
+
+class FakeGroq(_LLMStub):
+    """Groq client stub: client.chat.completions.create(messages=..., model=...)."""
+
+    def __init__(self, responder: Callable[[List[Dict[str, str]]], str] = gap_responder, **kwargs):
+        super().__init__(**kwargs)
+        self.responder = responder
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, *, messages, model, stream=False, response_format=None, **_kwargs):
+        self._call()
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        answer = self.responder(messages)
+        if response_format and response_format.get("type") == "json_object":
+            answer = json.dumps({"missing_skills": json.loads(answer)})
+        if stream:
+            return self._chunks(answer, prompt_tokens)
+        content = self._generate(answer)
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(content) // 4)
+        message = SimpleNamespace(content=content, role="assistant")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    def _chunks(self, content: str, prompt_tokens: int) -> Iterator[SimpleNamespace]:
+        for piece in self._stream(content):
+            delta = SimpleNamespace(content=piece)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], x_groq=None)
+        # Like Groq, usage only comes with the final chunk
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(content) // 4)
+        yield SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=usage))
+
+
+_POSTING_RE = re.compile(r"### Posting (\S+)\n")
+
+
+def _skills_in(text: str) -> List[str]:
+    lowered = text.lower()
+    return [s for s in SKILLS if s.lower() in lowered][:10]
+
+
+def market_responder(prompt: str) -> str:
+    """Canned Gemini answer: known skills mentioned in the posting(s)."""
+    if "Job Postings:" in prompt:
+        body = prompt.split("Job Postings:", 1)[1]
+        parts = _POSTING_RE.split(body)[1:]
+        return json.dumps({key: _skills_in(text) for key, text in zip(parts[::2], parts[1::2])})
+    return json.dumps(_skills_in(prompt.split("Job Description:", 1)[-1]))
+
+
+class FakeGeminiModel(_LLMStub):
+    """google.generativeai GenerativeModel stub: model.generate_content(prompt)."""
+
+    def __init__(self, responder: Callable[[str], str] = market_responder,
+                 model_name: str = "fake-gemini", **kwargs):
+        super().__init__(**kwargs)
+        self.responder = responder
+        self.model_name = model_name
+
+    def generate_content(self, prompt, stream=False, **_kwargs):
+        self._call()
+        prompt_tokens = len(prompt) // 4
+        if stream:
+            return self._chunks(self.responder(prompt), prompt_tokens)
+        text = self._generate(self.responder(prompt))
+        usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=len(text) // 4)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def _chunks(self, text: str, prompt_tokens: int) -> Iterator[SimpleNamespace]:
+        sent = 0
+        for piece in self._stream(text):
+            sent += len(piece)
+            usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=sent // 4)
+            yield SimpleNamespace(text=piece, usage_metadata=usage)
+
+
+# ---------------------------------------------------------------------------
+# Adzuna
+# ---------------------------------------------------------------------------
+
+def synthetic_posting(rng: random.Random, role: str, job_id: int) -> Dict[str, Any]:
+    skills = rng.sample(SKILLS, rng.randint(4, 9))
+    lines = [
+        f"<p>We are hiring a {role} to join our platform team.</p>",
+        f"<ul>{''.join(f'<li>Experience with {s}</li>' for s in skills)}</ul>",
+        FILLER,
+        BOILERPLATE,
+    ]
+    return {
+        "id": str(job_id),
+        "title": role,
+        "description": "\n".join(lines),
+        "redirect_url": f"https://example.invalid/jobs/{job_id}",
+    }
+
+
+class FakeAdzunaSession:
+    """
+    requests.Session stub for the Adzuna search endpoint. Serves
+    deterministic synthetic postings per (role, page); duplicate_rate of them
+    are reposts of an earlier posting with a new id.
+    """
+
+    def __init__(self, *, latency_s: float = 0.0, duplicate_rate: float = 0.2, seed: int = 0):
+        self.latency_s = latency_s
+        self.duplicate_rate = duplicate_rate
+        self.seed = seed
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str, params=None, headers=None, timeout=None):
+        with self._lock:
+            self.calls += 1
+        params = params or {}
+        page = int(url.rstrip("/").rsplit("/", 1)[-1])
+        role = params.get("what", "")
+        per_page = int(params.get("results_per_page", 20))
+        rng = random.Random(f"{self.seed}:{role}:{page}")
+        _sleep(self.latency_s, 0.2, rng)
+
+        results: List[Dict[str, Any]] = []
+        for n in range(per_page):
+            job_id = page * 100_000 + n
+            if results and rng.random() < self.duplicate_rate:
+                repost = dict(rng.choice(results))
+                repost["id"] = str(job_id)
+                results.append(repost)
+            else:
+                results.append(synthetic_posting(rng, role, job_id))
+        return _HTTPResponse({"results": results})
+
+    def mount(self, *_args) -> None:
+        pass
+
+
+class _HTTPResponse:
+    status_code = 200
+
+    def __init__(self, payload: Dict[str, Any]):
+        self._payload = payload
+        self.headers: Dict[str, str] = {}
+
+    def json(self) -> Dict[str, Any]:
+        return self._payload
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Data & wiring
+# ---------------------------------------------------------------------------
+
+def seed_users(db: FakeSupabase, n_users: int, *, seed: int = 0,
+               resume_size: int = 12, market_size: int = 10) -> List[str]:
+    """Users with profiles, resume skills and market skills; returns their ids."""
+    rng = random.Random(seed)
+    user_ids = [f"bench-user-{i:05d}" for i in range(n_users)]
+    profiles, skills = [], []
+    for user_id in user_ids:
+        profiles.append({"user_id": user_id, "dream_role": rng.choice(ROLES)})
+        for name in rng.sample(SKILLS, resume_size):
+            skills.append({"user_id": user_id, "source": "resume", "skill_name": name})
+        for name in rng.sample(SKILLS, market_size):
+            # Mix in spelling variants the pre-match has to resolve
+            variant = rng.choice([name, name.lower(), f"{name} programming"])
+            skills.append({"user_id": user_id, "source": "market", "skill_name": variant})
+    db.load("profiles", profiles)
+    db.load("skills", skills)
+    return user_ids
+
+
+def install(*, supabase: FakeSupabase, groq: Optional[FakeGroq] = None,
+            gemini: Optional[FakeGeminiModel] = None,
+            adzuna: Optional[FakeAdzunaSession] = None) -> None:
+    """Route the shared client registry and the Adzuna session to the fakes."""
+    from util import clients
+
+    clients.set_client("supabase", supabase)
+    if groq is not None:
+        clients.set_client("groq", groq)
+    if gemini is not None:
+        clients.set_client("gemini", gemini)
+    if adzuna is not None:
+        import job_fetcher
+
+        job_fetcher.set_session(adzuna)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Measure import (startup) time of the Python job modules.
+
+Each module is imported in a fresh interpreter with `python -X importtime`;
+the cumulative time reported for the module itself is recorded, along with
+the slowest transitive imports it pulls in and the wall time of the whole
+process.
+
+Usage (from gap-service directory):
+  python bench/import_time.py                      # print a report
+  python bench/import_time.py --save bench/import_baseline.json
+  python bench/import_time.py --baseline bench/import_baseline.json
+
+With --baseline, modules more than --tolerance (default 25%) and 20 ms
+slower than the baseline, or that no longer import, are reported and the
+exit status is 1 (as with bench/run_bench.py --baseline).
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), "src")
+
+MODULES = [
+    "util.clients",
+    "skills.matching",
+    "skills.gap_analysis",
+    "market_agent",
+    "job_fetcher",
+    "pipeline",
+    "worker",
+    "run_market_agent",
+]
+
+MIN_REGRESSION_US = 20_000
+
+
+def _parse_importtime(stderr: str) -> dict:
+    """Map module name -> (self_us, cumulative_us) from -X importtime output."""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # header line
+        timings[parts[2].strip()] = (self_us, cumulative_us)
+    return timings
+
+
+def measure(module: str, runs: int) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [SRC, os.path.join(SRC, "market-skills"), env.get("PYTHONPATH", "")]
+    )
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        wall_us = int((time.perf_counter() - start) * 1e6)
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed"
+            return {"module": module, "error": error}
+        timings = _parse_importtime(proc.stderr)
+        cumulative = timings.get(module, (0, 0))[1]
+        if best is None or cumulative < best["cumulative_us"]:
+            slowest = sorted(
+                ((name, t[0]) for name, t in timings.items()),
+                key=lambda item: item[1],
+                reverse=True,
+            )[:5]
+            best = {
+                "module": module,
+                "cumulative_us": cumulative,
+                "wall_us": wall_us,
+                "modules_imported": len(timings),
+                "slowest_self_us": dict(slowest),
+            }
+    return best
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = {r["module"]: r for r in json.load(f)["results"] if "error" not in r}
+    regressions = []
+    for r in results:
+        base = baseline.get(r["module"])
+        if base is None:
+            continue
+        if "error" in r:
+            regressions.append((r["module"], f"imported in the baseline, now {r['error']}"))
+            continue
+        delta = r["cumulative_us"] - base["cumulative_us"]
+        if delta > MIN_REGRESSION_US and delta > base["cumulative_us"] * tolerance:
+            regressions.append(
+                (r["module"], f"import {base['cumulative_us'] / 1000:.1f} ms -> {r['cumulative_us'] / 1000:.1f} ms")
+            )
+    for module, what in regressions:
+        print(f"REGRESSION {module}: {what}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--runs", type=int, default=5, help="best of N fresh interpreters")
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a saved JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = [measure(m, args.runs) for m in args.modules]
+
+    print(f"{'module':<22} {'import ms':>10} {'process ms':>11} {'modules':>8}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['module']:<22} error: {r['error']}")
+            continue
+        print(
+            f"{r['module']:<22} {r['cumulative_us'] / 1000:>10.1f} "
+            f"{r['wall_us'] / 1000:>11.1f} {r['modules_imported']:>8}"
+        )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for market skill normalization.
+
+Builds a synthetic corpus of raw skill strings shaped like LLM output
+(case, punctuation and plural variants of a few thousand base skills) and
+times per-string normalization without the memo against normalize_many,
+with and without interning.
+
+Usage (from gap-service directory):
+  python bench/normalize_bench.py                  # 1M strings
+  python bench/normalize_bench.py --size 200000 --vocab 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+from util.skill_names import normalize_many, normalize_skill_name  # noqa: E402
+
+BASE_WORDS = [
+    "python", "sql", "spark", "airflow", "kubernetes", "docker", "react", "node.js",
+    "data", "machine", "learning", "pipelines", "modeling", "api", "rest", "aws",
+    "azure", "gcp", "tableau", "power", "bi", "etl", "ci/cd", "terraform", "java",
+    "statistics", "time", "series", "analysis", "testing", "systems", "tools",
+]
+
+
+def make_corpus(size: int, vocab: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    bases = [
+        " ".join(rng.choice(BASE_WORDS) for _ in range(rng.randint(1, 4)))
+        for _ in range(vocab)
+    ]
+    variants = [
+        lambda s: s,
+        str.title,
+        str.upper,
+        lambda s: f" {s} ",
+        lambda s: s + "s",
+        lambda s: s.replace(" ", "-"),
+        lambda s: s + ".",
+    ]
+    return [rng.choice(variants)(rng.choice(bases)) for _ in range(size)]
+
+
+def _time(label: str, fn, corpus: list, memory: bool) -> list:
+    start = time.perf_counter()
+    out = fn(corpus)
+    elapsed = time.perf_counter() - start
+    line = (
+        f"{label:<24} {elapsed:>8.3f} s {len(corpus) / elapsed / 1e6:>7.2f} M/s "
+        f"{len({id(s) for s in out}):>9} str objects"
+    )
+    if memory:
+        # Separate pass: tracemalloc slows allocation-heavy code considerably
+        del out
+        normalize_skill_name.cache_clear()
+        tracemalloc.start()
+        out = fn(corpus)
+        line += f" {tracemalloc.get_traced_memory()[0] / 1e6:>8.1f} MB retained"
+        tracemalloc.stop()
+    print(line)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--vocab", type=int, default=20_000)
+    parser.add_argument("--memory", action="store_true", help="also report retained memory")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.size, args.vocab)
+    print(f"{len(corpus)} strings, {len(set(corpus))} distinct raw values")
+
+    uncached = normalize_skill_name.__wrapped__
+    baseline = _time("per-string, no memo", lambda c: [uncached(s) for s in c], corpus, args.memory)
+
+    normalize_skill_name.cache_clear()
+    many = _time("normalize_many", normalize_many, corpus, args.memory)
+    print(f"  memo: {normalize_skill_name.cache_info()}")
+
+    normalize_skill_name.cache_clear()
+    interned = _time("normalize_many(intern)", lambda c: normalize_many(c, intern=True), corpus, args.memory)
+
+    if not (baseline == many == interned):
+        sys.exit("normalize_many output differs from per-string normalization")
+    print(f"{len(set(many))} distinct canonical names; outputs identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the gap and market pipelines.
+
+Supabase, Groq, Gemini and Adzuna are replaced by the in-process fakes in
+bench/fakes.py, so no credentials or network are needed. Every scenario
+runs once per (users, postings) combination and reports throughput,
+p50/p99 latency per operation and peak traced memory.
+
+Scenarios:
+  gap_single     analyze_skill_gaps once per user
+  gap_batch      analyze_skill_gaps_batch over all users (one operation)
+  market_rows    build_market_skill_rows over synthetic postings, once per user
+  market_agent   run_market_skills_agent once per user (needs python-dotenv)
+
+Usage (from gap-service directory):
+  python bench/run_bench.py
+  python bench/run_bench.py --users 10,100 --postings 20,100 --llm-latency-ms 50
+  python bench/run_bench.py --llm-latency-ms 200 --char-latency-ms 2 --chatter --stream
+  python bench/run_bench.py --save bench/bench_baseline.json
+  python bench/run_bench.py --baseline bench/bench_baseline.json
+
+With --baseline, results whose throughput dropped or whose p99 grew by
+more than --tolerance (default 25%) are reported and the exit status is 1.
+Only compare results taken with the same options on the same machine.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), "src")
+sys.path[:0] = [HERE, SRC, os.path.join(SRC, "market-skills")]
+
+# Local stores in memory and no background writers, so runs are isolated
+os.environ.setdefault("GAP_RUN_STORE_PATH", "off")
+os.environ.setdefault("SINGLEFLIGHT_DIR", "off")
+os.environ["GAP_WRITE_BEHIND"] = "0"
+os.environ["MARKET_WRITE_BEHIND"] = "0"
+for _var in ("MARKET_CACHE_PATH", "ADZUNA_CACHE_PATH", "MARKET_CHECKPOINT_PATH", "ROLE_PROFILE_PATH"):
+    os.environ[_var] = ":memory:"
+
+import fakes  # noqa: E402
+from util import metrics  # noqa: E402
+
+SCENARIOS = ["gap_single", "gap_batch", "market_rows", "market_agent"]
+ADZUNA_PAGE_SIZE = 20
+
+# What models tend to append after the JSON they were asked for
+CHATTER = (
+    "\n\nThese skills were selected because they are concrete and teachable; "
+    "generic terms and soft skills were excluded as instructed. Let me know if "
+    "you would like them grouped by category or ranked by importance."
+)
+
+
+class Skip(Exception):
+    """Scenario cannot run in this environment."""
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def make_env(args, users):
+    db = fakes.FakeSupabase(latency_s=args.db_latency_ms / 1000, seed=args.seed)
+    llm = dict(
+        latency_s=args.llm_latency_ms / 1000,
+        char_latency_s=args.char_latency_ms / 1000,
+        trailer=CHATTER if args.chatter else "",
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+    env = {
+        "db": db,
+        "groq": fakes.FakeGroq(**llm),
+        "gemini": fakes.FakeGeminiModel(**llm),
+        "adzuna": fakes.FakeAdzunaSession(seed=args.seed),
+    }
+    env["user_ids"] = fakes.seed_users(db, users, seed=args.seed)
+    fakes.install(supabase=db, groq=env["groq"], gemini=env["gemini"], adzuna=env["adzuna"])
+    return env
+
+
+# ---------------------------------------------------------------------------
+# Scenarios: each returns a list of per-operation callables
+# ---------------------------------------------------------------------------
+
+def ops_gap_single(env, postings, stream):
+    from skills import analyze_skill_gaps
+
+    return [lambda u=u: analyze_skill_gaps(u) for u in env["user_ids"]]
+
+
+def ops_gap_batch(env, postings, stream):
+    from skills import analyze_skill_gaps_batch
+
+    return [lambda: analyze_skill_gaps_batch(env["user_ids"])]
+
+
+def ops_market_rows(env, postings, stream):
+    from market_agent import build_market_skill_rows
+
+    rng = random.Random(0)
+    jobs = [fakes.synthetic_posting(rng, "Data Engineer", i) for i in range(postings)]
+
+    def run(user_id):
+        build_market_skill_rows(
+            jobs,
+            user_id=user_id,
+            dream_role="Data Engineer",
+            model=env["gemini"],
+            sleep_s=0,
+            dedupe=True,
+            stream=stream,
+        )
+
+    return [lambda u=u: run(u) for u in env["user_ids"]]
+
+
+def ops_market_agent(env, postings, stream):
+    try:
+        import run_market_agent
+    except ImportError as e:
+        raise Skip(str(e))
+
+    for getter in (run_market_agent._extraction_cache, run_market_agent._posting_cache,
+                   run_market_agent._pipeline_checkpoint, run_market_agent._role_profiles):
+        getter.cache_clear()
+    run_market_agent.MAX_JOBS = postings
+    run_market_agent.ADZUNA_PAGES = max(1, math.ceil(postings / ADZUNA_PAGE_SIZE))
+    run_market_agent.MARKET_RPM = None
+    run_market_agent.SLEEP_S = 0
+    run_market_agent.MARKET_LLM_STREAM = stream
+    return [lambda u=u: run_market_agent.run_market_skills_agent(u) for u in env["user_ids"]]
+
+
+OPS = {
+    "gap_single": ops_gap_single,
+    "gap_batch": ops_gap_batch,
+    "market_rows": ops_market_rows,
+    "market_agent": ops_market_agent,
+}
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def _execute(ops):
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    # The pipelines print progress; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for op in ops:
+            t0 = time.perf_counter()
+            try:
+                op()
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+    return latencies, errors, time.perf_counter() - start
+
+
+def run_scenario(name, args, users, postings):
+    metrics.reset()
+    env = make_env(args, users)
+    ops = OPS[name](env, postings, args.stream)
+    latencies, errors, wall = _execute(ops)
+    snap = metrics.snapshot()
+    db_calls = env["db"].calls
+
+    peak = None
+    if args.memory:
+        # Separate pass: tracing slows every allocation down
+        env = make_env(args, users)
+        ops = OPS[name](env, postings, args.stream)
+        tracemalloc.start()
+        _execute(ops)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    llm = [c for c in snap["counters"] if c["name"] == "llm_requests_total"]
+    return {
+        "scenario": name,
+        "users": users,
+        "postings": postings,
+        "ops": len(latencies),
+        "errors": errors,
+        "wall_s": wall,
+        "throughput_ops_s": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_mb": peak / 2**20 if peak is not None else None,
+        "llm_calls": int(sum(c["value"] for c in llm)),
+        "llm_errors": int(sum(c["value"] for c in llm if c["labels"]["outcome"] == "error")),
+        "db_calls": db_calls,
+    }
+
+
+def _parse_counts(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _key(r):
+    return (r["scenario"], r["users"], r["postings"])
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = {_key(r): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        base = baseline.get(_key(r))
+        if base is None:
+            continue
+        if r["throughput_ops_s"] < base["throughput_ops_s"] * (1 - tolerance):
+            regressions.append((r, "throughput", base["throughput_ops_s"], r["throughput_ops_s"]))
+        if r["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            regressions.append((r, "p99 ms", base["p99_ms"], r["p99_ms"]))
+        if r["peak_mb"] and base.get("peak_mb") and r["peak_mb"] > base["peak_mb"] * (1 + tolerance):
+            regressions.append((r, "peak MB", base["peak_mb"], r["peak_mb"]))
+    for r, what, before, after in regressions:
+        print(
+            f"REGRESSION {r['scenario']} users={r['users']} postings={r['postings']}: "
+            f"{what} {before:.2f} -> {after:.2f}"
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help=f"subset of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--users", type=_parse_counts, default=[10, 100], help="comma-separated user counts")
+    parser.add_argument("--postings", type=_parse_counts, default=[20], help="comma-separated posting counts")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--char-latency-ms", type=float, default=0.0, help="LLM generation time per output character")
+    parser.add_argument("--chatter", action="store_true", help="LLM stubs append prose after the JSON")
+    parser.add_argument("--stream", action="store_true", help="stream LLM replies (GAP_LLM_STREAM, stream=True)")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of LLM calls failing with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of LLM calls failing with a 429")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of LLM replies with broken JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc pass")
+    parser.add_argument("--verbose", action="store_true", help="keep pipeline logging")
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a saved JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    os.environ["GAP_LLM_STREAM"] = "1" if args.stream else "0"
+    if not args.verbose:
+        # Injected LLM errors would otherwise log a traceback each
+        logging.disable(logging.CRITICAL)
+
+    results = []
+    print(
+        f"{'scenario':<13} {'users':>6} {'postings':>8} {'ops/s':>9} {'p50 ms':>8} "
+        f"{'p99 ms':>8} {'peak MB':>8} {'llm':>6} {'llm err':>7} {'errors':>6}"
+    )
+    for name in args.scenarios or SCENARIOS:
+        # Gap scenarios read market skills from the skills table, not postings
+        posting_counts = args.postings if name.startswith("market") else [0]
+        try:
+            for users in args.users:
+                for postings in posting_counts:
+                    r = run_scenario(name, args, users, postings)
+                    results.append(r)
+                    peak = f"{r['peak_mb']:.1f}" if r["peak_mb"] is not None else "-"
+                    print(
+                        f"{name:<13} {users:>6} {postings:>8} {r['throughput_ops_s']:>9.1f} "
+                        f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {peak:>8} "
+                        f"{r['llm_calls']:>6} {r['llm_errors']:>7} {r['errors']:>6}"
+                    )
+        except Skip as e:
+            print(f"{name:<13} skipped: {e}")
+
+    if args.save:
+        options = {k: v for k, v in vars(args).items() if k not in ("save", "baseline")}
+        with open(args.save, "w") as f:
+            json.dump({"python": sys.version.split()[0], "options": options, "results": results}, f, indent=2)
+
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,24 @@ Usage:
   # Or set DEFAULT_USER_ID in .env and run:
   python run_gap_analysis.py
 
+  # Batch mode: several user ids, or "-" to read one id per line from stdin
+  python run_gap_analysis.py <user_id> <user_id> ...
+  python run_gap_analysis.py - < user_ids.txt
+
+Batch mode fetches skills in bulk, runs up to GAP_BATCH_CONCURRENCY
+(default 4) Groq calls at once and writes gap_skills in chunked inserts.
+
+  # Cohort report: most common gaps across users and per dream role (JSON,
+  # read-only, no LLM calls)
+  python run_gap_analysis.py --cohort - < user_ids.txt
+
+Set METRICS_TEXTFILE (Prometheus textfile) and/or METRICS_JSON to export
+stage timings, token counts and cache hit rates on exit.
+
 Loads .env from the current directory if present.
 """
 
+import json
 import logging
 import os
 import sys
@@ -26,7 +41,13 @@ except ImportError:
 # Add src to path so "skills" package is found
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
 
-from skills.gap_analysis import analyze_skill_gaps
+from skills.gap_analysis import (
+    DEFAULT_BATCH_CONCURRENCY,
+    analyze_skill_gaps,
+    analyze_skill_gaps_batch,
+    cohort_gap_report,
+)
+from util import metrics
 
 logging.basicConfig(
     level=logging.INFO,
@@ -35,10 +56,54 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def run_batch(user_ids: list[str]) -> None:
+    concurrency = int(os.environ.get("GAP_BATCH_CONCURRENCY") or DEFAULT_BATCH_CONCURRENCY)
+    try:
+        results = analyze_skill_gaps_batch(user_ids, max_workers=concurrency)
+    except Exception as e:
+        logger.exception("Batch skill gap analysis failed")
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    failed = 0
+    for user_id, result in results.items():
+        if "error" in result:
+            failed += 1
+            print(f"{user_id}\terror\t{result['error']}")
+        else:
+            reused = "\treused" if result.get("reused") else ""
+            print(f"{user_id}\t{result['run_id']}\tmissing={len(result['missing_skills'])}{reused}")
+    print(f"Users: {len(results)}  Failed: {failed}")
+    if failed:
+        sys.exit(1)
+
+
+def run_cohort(user_ids: list[str]) -> None:
+    try:
+        report = cohort_gap_report(user_ids)
+    except Exception as e:
+        logger.exception("Cohort gap report failed")
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(report, indent=2))
+
+
 def main() -> None:
-    user_id = None
-    if len(sys.argv) >= 2:
-        user_id = sys.argv[1].strip()
+    metrics.install_exporters_from_env()
+    args = [a.strip() for a in sys.argv[1:] if a.strip()]
+    cohort = bool(args) and args[0] == "--cohort"
+    if cohort:
+        args = args[1:]
+    if args == ["-"]:
+        args = [line.strip() for line in sys.stdin if line.strip()]
+    if cohort:
+        run_cohort(args)
+        return
+    if len(args) > 1:
+        run_batch(args)
+        return
+
+    user_id = args[0] if args else None
     if not user_id:
         user_id = (os.environ.get("DEFAULT_USER_ID") or "").strip()
     if not user_id:
@@ -53,6 +118,10 @@ def main() -> None:
         print("Market skills:", result["market_skills_count"])
         print("Missing skills:", result["missing_skills"])
         print("Rows inserted into gap_skills:", result["gap_skills_inserted"])
+        if result.get("reused"):
+            print("Skill sets unchanged; reused previous run")
+        if result.get("matcher"):
+            print("Matched by:", result["matcher"])
     except Exception as e:
         logger.exception("Skill gap analysis failed")
         print(f"Error: {e}", file=sys.stderr)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Precompute market skill profiles for the most popular dream roles.
+
+Usage:
+  # From gap-service directory (e.g. from cron, off-peak):
+  python run_role_refresh.py
+  python run_role_refresh.py --top 50 --llm-budget 500
+
+  # Build time and age of every stored role profile (JSON, no LLM calls)
+  python run_role_refresh.py --freshness
+
+Reads the top ROLE_REFRESH_TOP (default 20) dream_role values from
+profiles and rebuilds the shared role profiles that are missing or older
+than ROLE_REFRESH_MIN_AGE_S (default half of ROLE_PROFILE_TTL_S). The run
+never sends more than ROLE_REFRESH_LLM_BUDGET LLM requests, retries
+included; a role that runs out of budget keeps its previous profile.
+Interactive market runs for those roles then reuse the precomputed rows.
+run_worker.py can run the same refresh periodically (--refresh-interval).
+
+Set METRICS_TEXTFILE and/or METRICS_JSON to export metrics on exit.
+Loads .env from the current directory if present.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src", "market-skills"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from run_market_agent import _role_profiles, refresh_popular_roles
+from util import metrics
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(levelname)s %(name)s %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, help="number of most common roles to consider")
+    parser.add_argument("--llm-budget", type=int, help="maximum LLM calls for this run")
+    parser.add_argument("--freshness", action="store_true", help="print stored profile ages and exit")
+    args = parser.parse_args()
+    metrics.install_exporters_from_env()
+
+    if args.freshness:
+        print(json.dumps(_role_profiles().freshness(), indent=2))
+        return
+
+    try:
+        summary = refresh_popular_roles(top=args.top, llm_budget=args.llm_budget)
+    except Exception as e:
+        logger.exception("Role profile refresh failed")
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps(summary, indent=2))
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
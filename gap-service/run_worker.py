@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Run a long-lived worker for gap analysis and market skills jobs.
+
+Usage:
+  # From gap-service directory: claim "<kind>_pending" rows from the runs table
+  python run_worker.py --concurrency 4
+
+  # Local queue stand-in: one "<kind> <user_id>" per line on stdin
+  # (kind is "gap" or "market"); exits once stdin is consumed and drained
+  printf 'gap <user_id>\\nmarket <user_id>\\n' | python run_worker.py --stdin
+
+SIGTERM / SIGINT stop claiming new work and wait for in-flight jobs.
+gap_skills and skills rows are written before a job is marked done. With
+GAP_WRITE_BEHIND / MARKET_WRITE_BEHIND=1 they are coalesced across jobs in
+write-behind buffers instead (flushed on exit after the drain); a job is
+then marked done before its rows are persisted, and a failed background
+write is only logged.
+With --refresh-interval (or ROLE_REFRESH_INTERVAL_S) the worker also
+refreshes the popular roles' market profiles every that many seconds,
+only within ROLE_REFRESH_HOURS local hours if set (e.g. "1-5"); see
+run_role_refresh.py.
+METRICS_TEXTFILE / METRICS_JSON export pipeline metrics on exit and, with
+METRICS_EXPORT_INTERVAL_S, periodically while running.
+Loads .env from the current directory if present.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src", "market-skills"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from skills.gap_analysis import analyze_skill_gaps
+from util import clients, metrics
+from worker import LocalQueue, RunsTableQueue, Worker
+from worker.worker import DEFAULT_CONCURRENCY, DEFAULT_POLL_INTERVAL_S
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(levelname)s %(name)s %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def run_market(user_id: str):
+    # Imported on first market job; the module stays loaded for later jobs
+    from run_market_agent import run_market_skills_agent
+
+    return run_market_skills_agent(user_id)
+
+
+def refresh_roles_periodically(interval_s: float, hours: str, stop: threading.Event) -> None:
+    from role_refresh import in_hours
+    from run_market_agent import refresh_popular_roles
+
+    while not stop.is_set():
+        if in_hours(hours):
+            try:
+                summary = refresh_popular_roles()
+                logger.info(
+                    "Role refresh refreshed=%d over_budget=%d failed=%d llm_calls=%d",
+                    len(summary["refreshed"]), len(summary["over_budget"]),
+                    len(summary["failed"]), summary["llm_calls"],
+                )
+            except Exception:
+                logger.exception("Role profile refresh failed")
+        stop.wait(interval_s)
+
+
+def feed_stdin(job_queue: LocalQueue) -> None:
+    for line in sys.stdin:
+        parts = line.split()
+        if len(parts) != 2:
+            continue
+        try:
+            job_queue.submit(parts[0], parts[1])
+        except ValueError as e:
+            logger.warning("Skipping line %r: %s", line.strip(), e)
+    job_queue.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stdin", action="store_true", help="read jobs from stdin instead of the runs table")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.environ.get("WORKER_CONCURRENCY") or DEFAULT_CONCURRENCY),
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=float(os.environ.get("WORKER_POLL_INTERVAL_S") or DEFAULT_POLL_INTERVAL_S),
+    )
+    parser.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=float(os.environ.get("ROLE_REFRESH_INTERVAL_S") or 0),
+        help="seconds between popular-role profile refreshes (0: off)",
+    )
+    args = parser.parse_args()
+    metrics.install_exporters_from_env()
+
+    stop_refresh = threading.Event()
+    if args.refresh_interval > 0:
+        threading.Thread(
+            target=refresh_roles_periodically,
+            args=(args.refresh_interval, os.environ.get("ROLE_REFRESH_HOURS", ""), stop_refresh),
+            daemon=True,
+        ).start()
+
+    if args.stdin:
+        job_queue = LocalQueue()
+        threading.Thread(target=feed_stdin, args=(job_queue,), daemon=True).start()
+    else:
+        job_queue = RunsTableQueue(clients.supabase_client())
+
+    worker = Worker(
+        job_queue,
+        {"gap": analyze_skill_gaps, "market": run_market},
+        concurrency=args.concurrency,
+        poll_interval_s=args.poll_interval,
+    )
+    worker.install_signal_handlers()
+    worker.run()
+    stop_refresh.set()
+    if worker.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Posting clean-up and near-duplicate elimination.
+
+Adzuna often returns the same role reposted across cities or agencies with
+near-identical text. Descriptions are stripped of HTML and boilerplate,
+turned into word shingles and MinHash signatures, and bucketed with LSH
+banding; postings whose estimated Jaccard similarity reaches the threshold
+collapse onto the first posting of their cluster.
+"""
+
+import hashlib
+import html
+import random
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Adzuna descriptions are short snippets (~500 chars), so small shingles and
+# a moderate threshold are needed for a one-phrase edit to still match.
+DEFAULT_SHINGLE_SIZE = 3
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_THRESHOLD = 0.7
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_BLOCK_TAG_RE = re.compile(r"<\s*(br|/p|/li|/div|/h\d)\s*/?>", re.I)
+_WS_RE = re.compile(r"[ \t\r\f\v]+")
+_WORD_RE = re.compile(r"\w+")
+
+BOILERPLATE_PATTERNS = [
+    re.compile(p, re.I)
+    for p in (
+        r"equal (employment )?opportunity",
+        r"\beeo\b",
+        r"without regard to (race|age|sex|gender)",
+        r"reasonable accommodation",
+        r"e-?verify",
+        r"click (here|apply)|apply now|to apply,",
+        r"recruitment agenc(y|ies)",
+        r"privacy (notice|policy)",
+    )
+]
+
+
+def clean_description(text: str) -> str:
+    """Strip HTML tags/entities and boilerplate lines; normalize whitespace."""
+    if not text:
+        return ""
+    text = _BLOCK_TAG_RE.sub("\n", text)
+    text = html.unescape(_TAG_RE.sub(" ", text))
+
+    lines = []
+    for line in text.split("\n"):
+        line = _WS_RE.sub(" ", line).strip()
+        if line and not any(p.search(line) for p in BOILERPLATE_PATTERNS):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def shingle_hashes(text: str, k: int = DEFAULT_SHINGLE_SIZE) -> Set[int]:
+    """32-bit hashes of the word k-shingles of text (the whole text if shorter)."""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return set()
+    grams = [" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))]
+    return {
+        int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little")
+        for g in grams
+    }
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, hashes: Set[int]) -> Tuple[int, ...]:
+        if not hashes:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+
+def estimated_jaccard(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """
+    Incremental LSH index over cleaned descriptions. find_or_add returns the
+    id of an already indexed near-duplicate, or indexes the text under the
+    next id and returns None.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        hasher: Optional[MinHasher] = None,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.hasher = hasher or MinHasher(num_perm)
+        self._signatures: List[Tuple[int, ...]] = []
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+
+    def find_or_add(self, text: str) -> Optional[int]:
+        sig = self.hasher.signature(shingle_hashes(text, self.shingle_size))
+        band_keys = [(b, sig[b * self.rows:(b + 1) * self.rows]) for b in range(self.bands)]
+
+        for key in band_keys:
+            for idx in self._buckets.get(key, ()):
+                if estimated_jaccard(sig, self._signatures[idx]) >= self.threshold:
+                    return idx
+
+        idx = len(self._signatures)
+        self._signatures.append(sig)
+        for key in band_keys:
+            self._buckets.setdefault(key, []).append(idx)
+        return None
+
+
+def dedupe_postings(
+    job_postings: List[Dict[str, Any]],
+    *,
+    threshold: float = DEFAULT_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    bands: int = DEFAULT_BANDS,
+    shingle_size: int = DEFAULT_SHINGLE_SIZE,
+    hasher: Optional[MinHasher] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Return one representative per near-duplicate cluster, in original order.
+
+    Representatives are shallow copies with the cleaned text as
+    "description" and the number of postings they stand for as
+    "cluster_size". Postings without a description are passed through.
+    """
+    index = NearDuplicateIndex(
+        threshold=threshold,
+        num_perm=num_perm,
+        bands=bands,
+        shingle_size=shingle_size,
+        hasher=hasher,
+    )
+    reps: List[Dict[str, Any]] = []
+    rep_by_id: Dict[int, Dict[str, Any]] = {}
+
+    for job in job_postings:
+        desc = clean_description(job.get("description") or "")
+        rep = dict(job)
+        rep["cluster_size"] = 1
+        if not desc:
+            reps.append(rep)
+            continue
+        rep["description"] = desc
+
+        match = index.find_or_add(desc)
+        if match is not None:
+            rep_by_id[match]["cluster_size"] += 1
+            continue
+
+        rep_by_id[len(rep_by_id)] = rep
+        reps.append(rep)
+
+    return reps
@@ -1,20 +1,337 @@
+import hashlib
+import json
 import os
-import requests
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
 
+from util import metrics
 
-def fetch_jobs(dream_role: str, max_results: int = 20):
-    url = "https://api.adzuna.com/v1/api/jobs/us/search/1"
+# requests is imported on first fetch, not at module import
+if TYPE_CHECKING:
+    import requests
+
+ADZUNA_SEARCH_URL = "https://api.adzuna.com/v1/api/jobs/us/search/{page}"
+
+DEFAULT_TTL_S = 6 * 3600
+DEFAULT_MAX_AGE_S = 7 * 24 * 3600
+DEFAULT_MAX_PAGES = 2000
+DEFAULT_PAGE_WORKERS = 4
+
+
+# ----------------------------
+# Pooled HTTP Session
+# ----------------------------
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> "requests.Session":
+    """Shared keep-alive session, created on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=DEFAULT_PAGE_WORKERS * 2)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def set_session(session: Optional["requests.Session"]) -> None:
+    """Replace the shared session (e.g. with a stub); None resets it."""
+    global _session
+    with _session_lock:
+        _session = session
+
+
+# ----------------------------
+# Local Posting Cache
+# ----------------------------
+
+def _query_key(dream_role: str, results_per_page: int) -> str:
+    raw = json.dumps({"what": dream_role.strip().lower(), "per_page": results_per_page}, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def posting_id(job: Dict[str, Any]) -> str:
+    """Adzuna job id, or a content hash for postings without one."""
+    job_id = job.get("id")
+    if job_id is not None:
+        return str(job_id)
+    return hashlib.sha256(json.dumps(job, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class PostingCache:
+    """
+    SQLite cache of Adzuna result pages (query → ordered job ids, with the
+    response validators) and of the postings themselves, keyed by job id.
+    Pages younger than ttl_s are served without a request; older ones are
+    revalidated with If-None-Match / If-Modified-Since when possible.
+    Bounded by page count (least recently fetched evicted first) and by
+    max_age_s, how long a page is kept for revalidation; postings no
+    remaining page refers to are evicted with them.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        ttl_s: float = DEFAULT_TTL_S,
+        max_age_s: float = DEFAULT_MAX_AGE_S,
+        max_pages: int = DEFAULT_MAX_PAGES,
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl_s = ttl_s
+        self.max_age_s = max(max_age_s, ttl_s)
+        self.max_pages = max_pages
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                query_key TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                job_ids TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (query_key, page)
+            );
+            CREATE INDEX IF NOT EXISTS pages_fetched ON pages (fetched_at);
+            CREATE TABLE IF NOT EXISTS postings (
+                job_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def get_page(self, query_key: str, page: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_ids, etag, last_modified, fetched_at FROM pages "
+                "WHERE query_key = ? AND page = ?",
+                (query_key, page),
+            ).fetchone()
+            if row is None:
+                return None
+            job_ids = json.loads(row[0])
+            jobs = []
+            for job_id in job_ids:
+                posting = self._conn.execute(
+                    "SELECT data FROM postings WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                if posting is None:
+                    return None
+                jobs.append(json.loads(posting[0]))
+        return {
+            "jobs": jobs,
+            "etag": row[1],
+            "last_modified": row[2],
+            "fresh": time.time() - row[3] <= self.ttl_s,
+        }
+
+    def put_page(
+        self,
+        query_key: str,
+        page: int,
+        jobs: List[Dict[str, Any]],
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> None:
+        now = time.time()
+        job_ids = [posting_id(j) for j in jobs]
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT job_ids FROM pages WHERE query_key = ? AND page = ?", (query_key, page)
+            ).fetchone()
+            for job_id, job in zip(job_ids, jobs):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO postings (job_id, data, fetched_at) VALUES (?, ?, ?)",
+                    (job_id, json.dumps(job), now),
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(query_key, page, job_ids, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (query_key, page, json.dumps(job_ids), etag, last_modified, now),
+            )
+            dropped = previous is not None and not set(json.loads(previous[0])) <= set(job_ids)
+            self._evict(now, orphans=dropped)
+            self._conn.commit()
+
+    def touch_page(self, query_key: str, page: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ? WHERE query_key = ? AND page = ?",
+                (time.time(), query_key, page),
+            )
+            self._conn.commit()
+
+    def _evict(self, now: float, *, orphans: bool = False) -> None:
+        # orphans: a replaced page dropped postings that may now be unreferenced
+        cur = self._conn.execute(
+            "DELETE FROM pages WHERE fetched_at < ?", (now - self.max_age_s,)
+        )
+        evicted = cur.rowcount
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()
+        overflow = count - self.max_pages
+        if overflow > 0:
+            cur = self._conn.execute(
+                "DELETE FROM pages WHERE rowid IN ("
+                "SELECT rowid FROM pages ORDER BY fetched_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            evicted += cur.rowcount
+        self.evictions += evicted
+        if evicted or orphans:
+            self._conn.execute(
+                "DELETE FROM postings WHERE job_id NOT IN "
+                "(SELECT value FROM pages, json_each(pages.job_ids))"
+            )
+
+    def count(self, outcome: str) -> None:
+        """Record a page lookup outcome: "hits", "misses" or "revalidated"."""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "evictions": self.evictions,
+                "size": size,
+            }
+
+
+# ----------------------------
+# Fetching
+# ----------------------------
+
+def _fetch_page(
+    dream_role: str,
+    page: int,
+    results_per_page: int,
+    cache: Optional[PostingCache],
+) -> List[Dict[str, Any]]:
+    query_key = _query_key(dream_role, results_per_page)
+    cached = cache.get_page(query_key, page) if cache is not None else None
+    if cached is not None and cached["fresh"]:
+        cache.count("hits")
+        metrics.record_cache("adzuna", "hit")
+        return cached["jobs"]
 
     params = {
         "app_id": os.getenv("ADZUNA_APP_ID"),
         "app_key": os.getenv("ADZUNA_APP_KEY"),
         "what": dream_role,
-        "results_per_page": max_results,
+        "results_per_page": results_per_page,
         "sort_by": "date",
         "content-type": "application/json",
     }
+    headers = {}
+    if cached is not None:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    with metrics.stage("market", "job_fetch"):
+        r = get_session().get(
+            ADZUNA_SEARCH_URL.format(page=page), params=params, headers=headers, timeout=20
+        )
+
+    if r.status_code == 304 and cached is not None:
+        cache.count("revalidated")
+        metrics.record_cache("adzuna", "revalidated")
+        cache.touch_page(query_key, page)
+        return cached["jobs"]
 
-    r = requests.get(url, params=params, timeout=20)
     r.raise_for_status()
+    jobs = r.json().get("results", [])
+
+    if cache is not None:
+        cache.count("misses")
+        metrics.record_cache("adzuna", "miss")
+        cache.put_page(
+            query_key, page, jobs, r.headers.get("ETag"), r.headers.get("Last-Modified")
+        )
+    return jobs
+
+
+def fetch_jobs(
+    dream_role: str,
+    max_results: int = 20,
+    *,
+    pages: int = 1,
+    cache: Optional[PostingCache] = None,
+    max_workers: int = DEFAULT_PAGE_WORKERS,
+) -> List[Dict[str, Any]]:
+    """
+    Fetch up to `pages` result pages of `max_results` postings each.
+
+    Pages are fetched concurrently over a pooled keep-alive session and
+    returned in page order, de-duplicated by Adzuna job id. With a cache,
+    repeated role queries are served locally or revalidated conditionally.
+    """
+    page_numbers = list(range(1, max(1, pages) + 1))
+
+    if len(page_numbers) == 1:
+        page_results = [_fetch_page(dream_role, 1, max_results, cache)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(page_numbers))) as pool:
+            page_results = list(
+                pool.map(lambda p: _fetch_page(dream_role, p, max_results, cache), page_numbers)
+            )
+
+    seen = set()
+    jobs = []
+    for results in page_results:
+        for job in results:
+            job_id = posting_id(job)
+            if job_id in seen:
+                continue
+            seen.add(job_id)
+            jobs.append(job)
+    return jobs
+
 
-    return r.json().get("results", [])
+def iter_jobs(
+    dream_role: str,
+    max_results: int = 20,
+    *,
+    pages: int = 1,
+    cache: Optional[PostingCache] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield postings page by page, fetching the next page only once the
+    previous one is consumed. Stops early on an empty page.
+    """
+    seen = set()
+    for page in range(1, max(1, pages) + 1):
+        results = _fetch_page(dream_role, page, max_results, cache)
+        if not results:
+            return
+        for job in results:
+            job_id = posting_id(job)
+            if job_id in seen:
+                continue
+            seen.add(job_id)
+            yield job
@@ -185,14 +185,22 @@
 
 
 
-import json
-import re
 import time
-from collections import defaultdict
-from typing import List, Dict, Any, Optional
-from util.keywords_gemini import get_keywords_gemini_client
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dedup import dedupe_postings
+from extraction_cache import ExtractionCache, make_cache_key
+from rate_limit import TokenBucket, call_rate_limited
+from util import metrics
+from util.llm_json import MalformedReply, iter_json_array, parse_json_lenient
+from util.prompt_compaction import compact_job_description, estimate_tokens
+from util.skill_names import normalize_many
 
 MAX_OUTPUT_SKILLS = 10
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_JD_TOKEN_BUDGET = 1500   # per job description, after compaction
 
 
 
@@ -201,27 +209,19 @@ MAX_OUTPUT_SKILLS = 10
 # ----------------------------
 
 def _extract_json_array(text: str) -> List[str]:
-    if not text:
-        raise ValueError("Empty model response")
-
-    match = re.search(r"\[[\s\S]*\]", text.strip())
-    if not match:
-        raise ValueError(f"No JSON array found in response:\n{text}")
-
-    return json.loads(match.group())
+    # First complete top-level array; fences/prose are ignored and common
+    # defects repaired locally (raises MalformedReply otherwise)
+    return parse_json_lenient(text.strip() if text else "", source="gemini")
 
 
 # ----------------------------
 # Market Skill Extraction
 # ----------------------------
 
-def extract_market_skills(job_description: str, model) -> List[str]:
-    """
-    Extract concrete, learnable, role-agnostic technical skills
-    implied by the job description.
-    """
+# Bump whenever MARKET_SKILL_PROMPT changes so cached extractions are not reused.
+PROMPT_VERSION = "1"
 
-    prompt = f"""
+MARKET_SKILL_PROMPT = """
 You are designing a learning roadmap for a student.
 
 Extract ONLY concrete, teachable, technical skills that a candidate would need
@@ -245,8 +245,313 @@ Job Description:
 {job_description}
 """
 
-    response = model.generate_content(prompt)
-    return _extract_json_array(response.text)
+
+# Provider-native structured output: JSON mime type, plus a schema where
+# the shape is fixed (batch replies are keyed by posting id)
+SKILL_ARRAY_SCHEMA = {"type": "array", "items": {"type": "string"}}
+
+RETRY_SUFFIX = """
+Your previous reply could not be parsed as JSON ({error}):
+{reply}
+
+Reply again with ONLY the JSON, no markdown and no other text.
+"""
+
+# Models that rejected the structured-output config; they get plain requests
+_structured_rejected = set()
+
+
+def _generation_config(model, schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if _model_name(model) in _structured_rejected:
+        return None
+    config: Dict[str, Any] = {"response_mime_type": "application/json"}
+    if schema is not None:
+        config["response_schema"] = schema
+    return config
+
+
+def _generate_content(model, prompt: str, schema: Optional[Dict[str, Any]], **kwargs):
+    """generate_content with structured output, unless the model rejects it."""
+    config = _generation_config(model, schema)
+    if config is None:
+        return model.generate_content(prompt, **kwargs)
+    try:
+        return model.generate_content(prompt, generation_config=config, **kwargs)
+    except Exception as e:
+        message = str(e).lower()
+        if not any(field in message for field in ("response_mime_type", "response_schema", "generation_config")):
+            raise
+        print(f"[warn] {_model_name(model)} rejected structured output, using plain replies: {e}")
+        _structured_rejected.add(_model_name(model))
+        return model.generate_content(prompt, **kwargs)
+
+
+def _generate(model, prompt: str, schema: Optional[Dict[str, Any]] = None):
+    """model.generate_content with latency and token metrics."""
+    try:
+        with metrics.stage("market", "llm"):
+            response = _generate_content(model, prompt, schema)
+    except Exception:
+        metrics.record_llm("gemini", ok=False)
+        raise
+    usage = getattr(response, "usage_metadata", None)
+    metrics.record_llm(
+        "gemini",
+        ok=True,
+        prompt_tokens=getattr(usage, "prompt_token_count", None),
+        completion_tokens=getattr(usage, "candidates_token_count", None),
+    )
+    return response
+
+
+def _generate_stream(model, prompt: str) -> Iterator[str]:
+    """
+    Stream model.generate_content and yield the elements of the JSON array
+    in the reply as they complete. Reading stops at the closing bracket. A
+    malformed reply is read to the end and repaired locally.
+    """
+    start = time.perf_counter()
+    usage = None
+    received: List[str] = []
+
+    def texts() -> Iterator[str]:
+        nonlocal usage
+        for chunk in response:
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            text = getattr(chunk, "text", "")
+            if text:
+                received.append(text)
+                yield text
+
+    try:
+        with metrics.stage("market", "llm"):
+            response = _generate_content(model, prompt, SKILL_ARRAY_SCHEMA, stream=True)
+            chunks = texts()
+            yielded = 0
+            try:
+                for item in iter_json_array(chunks):
+                    if yielded == 0:
+                        metrics.observe("llm_first_item_seconds", time.perf_counter() - start, provider="gemini")
+                    yielded += 1
+                    yield item
+            except ValueError:
+                for _ in chunks:
+                    pass
+                yield from _extract_json_array("".join(received))[yielded:]
+    except MalformedReply:
+        # The request itself succeeded; the caller decides about a retry
+        metrics.record_llm("gemini", ok=True)
+        raise
+    except Exception:
+        metrics.record_llm("gemini", ok=False)
+        raise
+    metrics.record_llm(
+        "gemini",
+        ok=True,
+        prompt_tokens=getattr(usage, "prompt_token_count", None),
+        completion_tokens=getattr(usage, "candidates_token_count", None),
+    )
+
+
+def extract_market_skills(
+    job_description: str,
+    model,
+    *,
+    stream: bool = False,
+    previous: Optional[MalformedReply] = None,
+) -> List[str]:
+    """
+    Extract concrete, learnable, role-agnostic technical skills
+    implied by the job description.
+
+    With stream, the reply is parsed as it arrives and the request ends as
+    soon as the skill array is complete. With previous (an unparsable
+    earlier reply), the model is shown that reply and asked again.
+    """
+
+    with metrics.stage("market", "prompt_build"):
+        prompt = MARKET_SKILL_PROMPT.format(job_description=job_description)
+        if previous is not None:
+            prompt += RETRY_SUFFIX.format(error=previous, reply=previous.text[:2000])
+
+    if stream and previous is None:
+        return list(_generate_stream(model, prompt))
+
+    response = _generate(model, prompt, SKILL_ARRAY_SCHEMA)
+    with metrics.stage("market", "parse"):
+        return _extract_json_array(response.text)
+
+
+def _model_name(model) -> str:
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+def _extract_with_cache(
+    job_description: str,
+    model,
+    cache: Optional[ExtractionCache],
+    limiter: Optional[TokenBucket] = None,
+    stream: bool = False,
+) -> Tuple[List[str], bool]:
+    """
+    Return (skills, cache_hit). Misses are extracted via the LLM under the
+    rate limiter and stored; hits never consume a rate-limit token.
+    """
+    key = None
+    if cache is not None:
+        key = make_cache_key(job_description, PROMPT_VERSION, _model_name(model))
+        cached = cache.get(key)
+        metrics.record_cache("extraction", "hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached, True
+
+    try:
+        skills = call_rate_limited(
+            lambda: extract_market_skills(job_description, model, stream=stream), limiter
+        )
+    except MalformedReply as e:
+        # Local repair already failed: one corrective retry, under the limiter
+        metrics.inc("retries_total", reason="parse")
+        print(f"[warn] unparsable extraction reply, retrying once: {e}")
+        skills = call_rate_limited(
+            lambda: extract_market_skills(job_description, model, previous=e), limiter
+        )
+    if cache is not None:
+        cache.put(key, skills)
+    return skills, False
+
+
+# ----------------------------
+# Batched (Multi-Posting) Extraction
+# ----------------------------
+
+MARKET_SKILL_BATCH_PROMPT = """
+You are designing a learning roadmap for a student.
+
+For EACH job posting below, extract ONLY concrete, teachable, technical skills
+that a candidate would need to explicitly learn or practice to qualify for it.
+
+STRICT RULES:
+- EXCLUDE generic umbrella terms (e.g., "AI", "Machine Learning", "Data Science")
+- Prefer specific tools, frameworks, platforms, techniques, or methods
+- Infer skills ONLY if clearly implied by responsibilities
+- Each skill must be something a student could realistically study or train for
+- Exclude soft skills, role titles, and vague phrases
+
+OUTPUT RULES:
+- Return ONLY a JSON object mapping each posting id to a JSON array of skills,
+  e.g. {{"0": ["skill", ...], "1": ["skill", ...]}}
+- Include every posting id exactly once
+- Each item must be 1–4 words
+- Use canonical, industry-standard skill names
+- Maximum 10 skills per posting
+- No explanations, no markdown
+
+Job Postings:
+{postings}
+"""
+
+DEFAULT_BATCH_TOKEN_BUDGET = 6000
+
+_BATCH_OVERHEAD_TOKENS = estimate_tokens(MARKET_SKILL_BATCH_PROMPT)
+
+
+def _format_posting(key: str, job_description: str) -> str:
+    return f"### Posting {key}\n{job_description.strip()}\n"
+
+
+def _extract_json_object(text: str) -> Dict[str, Any]:
+    if not text:
+        raise ValueError("Empty model response")
+
+    # A truncated batch reply is repaired to its complete postings; the
+    # rest fall back to single-posting calls
+    parsed = parse_json_lenient(text.strip(), "{", source="gemini")
+    if not isinstance(parsed, dict):
+        raise ValueError("Model output is not a JSON object")
+    return parsed
+
+
+def extract_market_skills_batch(job_descriptions: Dict[str, str], model) -> Dict[str, List[str]]:
+    """
+    Extract skills for several postings in one request.
+
+    Returns only the keys whose value parsed as a skill array; callers should
+    fall back to extract_market_skills for any key that is missing.
+    """
+
+    with metrics.stage("market", "prompt_build"):
+        postings = "\n".join(_format_posting(k, d) for k, d in job_descriptions.items())
+        prompt = MARKET_SKILL_BATCH_PROMPT.format(postings=postings)
+
+    response = _generate(model, prompt)
+    with metrics.stage("market", "parse"):
+        parsed = _extract_json_object(response.text)
+
+    result = {}
+    for key in job_descriptions:
+        value = parsed.get(key)
+        if isinstance(value, list):
+            result[key] = [str(v).strip() for v in value if str(v).strip()]
+    return result
+
+
+def _plan_batches(items: List[Tuple[str, str]], token_budget: int) -> List[List[Tuple[str, str]]]:
+    """
+    Greedily pack (key, description) pairs into batches whose prompt stays
+    within token_budget. A posting too large for any batch goes alone.
+    """
+    batches: List[List[Tuple[str, str]]] = []
+    current: List[Tuple[str, str]] = []
+    used = _BATCH_OVERHEAD_TOKENS
+
+    for key, desc in items:
+        cost = estimate_tokens(_format_posting(key, desc))
+        if current and used + cost > token_budget:
+            batches.append(current)
+            current, used = [], _BATCH_OVERHEAD_TOKENS
+        current.append((key, desc))
+        used += cost
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _extract_batch_with_fallback(
+    batch: List[Tuple[str, str]],
+    model,
+    cache: Optional[ExtractionCache],
+    limiter: Optional[TokenBucket],
+) -> Dict[str, List[str]]:
+    """
+    One batched request for the postings in batch; any posting the batch
+    response did not cover is retried as a single-posting call. Postings that
+    still fail are left out of the result.
+    """
+    results: Dict[str, List[str]] = {}
+    if len(batch) > 1:
+        try:
+            results = call_rate_limited(
+                lambda: extract_market_skills_batch(dict(batch), model), limiter
+            )
+        except Exception as e:
+            metrics.inc("failures_total", pipeline="market", stage="batch_extract")
+            print(f"[warn] batched extraction failed for {len(batch)} postings: {e}")
+
+    for key, desc in batch:
+        if key in results:
+            if cache is not None:
+                cache.put(make_cache_key(desc, PROMPT_VERSION, _model_name(model)), results[key])
+            continue
+        try:
+            results[key], _ = _extract_with_cache(desc, model, None, limiter)
+            if cache is not None:
+                cache.put(make_cache_key(desc, PROMPT_VERSION, _model_name(model)), results[key])
+        except Exception as e:
+            metrics.inc("failures_total", pipeline="market", stage="extract")
+            print(f"[warn] market skill extraction failed at posting {key}: {e}")
+    return results
 
 # def extract_market_skills(job_description: str) -> List[str]:
 #     """
@@ -289,76 +594,176 @@ Job Description:
 
 
 # ----------------------------
-# Skill Normalization (Purely Mechanical)
+# Market Skill Aggregation
 # ----------------------------
 
-GENERIC_SUFFIXES = {
-    "programming",
-    "models",
-    "systems",
-    "tools",
-    "methods",
-}
-
-ACRONYMS = {
-    "SQL",
-    "API",
-    "APIS",
-    "AWS",
-    "ETL",
-    "REST",
-    "CI",
-    "CD",
-    "CI/CD",
-    "HTTP",
-}
-
-
-def normalize_skill_name(skill: str) -> str:
+class SkillAggregator:
     """
-    Normalize skill names WITHOUT injecting domain knowledge.
+    Running per-skill posting counts and first evidence link. State is plain
+    JSON so partial aggregates can be checkpointed and resumed.
     """
 
-    if not skill:
-        return skill
-
-    s = skill.strip().lower()
-
-    # Remove punctuation
-    s = re.sub(r"[^\w\s]", "", s)
-
-    # Normalize whitespace
-    s = re.sub(r"\s+", " ", s)
-
-    # Do not singularize 'series'
-    if s.endswith("series"):
-        return s.title()
-
-    # Conservative plural handling
-    if s.endswith("ies"):
-        s = s[:-3] + "y"
-    elif s.endswith("s") and len(s.split()) > 1:
-        s = s[:-1]
-
-    words = s.split()
-
-    # Strip generic suffixes only if phrase remains meaningful
-    if len(words) > 2 and words[-1] in GENERIC_SUFFIXES:
-        words = words[:-1]
-
-    s = " ".join(words)
-
-    # Acronym handling
-    compact = s.replace(" ", "").upper()
-    if compact in ACRONYMS:
-        return compact
-
-    return s.title()
-
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        self.skill_data = defaultdict(lambda: {
+            "count": 0,
+            "evidence": None
+        })
+        for skill, info in (state or {}).items():
+            self.skill_data[skill] = {"count": info["count"], "evidence": info["evidence"]}
+
+    def add(self, skills: List[str], link: str = "", weight: int = 1) -> None:
+        for key in normalize_many(skills, intern=True):
+            if not key:
+                continue
+
+            self.skill_data[key]["count"] += weight
+
+            if self.skill_data[key]["evidence"] is None and link:
+                self.skill_data[key]["evidence"] = link
+
+    def to_state(self) -> Dict[str, Any]:
+        return {k: dict(v) for k, v in self.skill_data.items()}
+
+    def to_rows(
+        self,
+        *,
+        user_id: str,
+        dream_role: str,
+        source: str = "market",
+        limit: int = MAX_OUTPUT_SKILLS,
+    ) -> List[Dict[str, Any]]:
+        if not self.skill_data:
+            return []
+
+        max_count = max(v["count"] for v in self.skill_data.values()) or 1
+
+        rows = []
+        for skill, info in self.skill_data.items():
+            rows.append({
+                "user_id": user_id,
+                "source": source,
+                "dream_role": dream_role,
+                "skill_name": skill,
+                "score": round(info["count"] / max_count, 3),
+                "evidence": info["evidence"],
+            })
+
+        rows.sort(key=lambda r: r["score"], reverse=True)
+        return rows[:limit]
+
+
+def iter_extracted_postings(
+    candidates: Iterable[Tuple[int, str, str]],
+    model,
+    cache: Optional[ExtractionCache],
+    limiter: Optional[TokenBucket],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    max_jobs: Optional[int] = None,
+    stream: bool = False,
+) -> Iterator[Tuple[int, str, List[str]]]:
+    """
+    One request per posting on a bounded pool. Lazily consumes candidates
+    (index, description, link) and yields (index, link, skills) for the first
+    max_jobs successful postings, in posting order. At most max_workers
+    postings are held in memory or in flight at a time. With stream, replies
+    are streamed (see extract_market_skills).
+    """
+    candidates = iter(candidates)
+    pending = deque()
+    exhausted = False
+    yielded = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while True:
+            # Keep the window full, but never in flight more than still needed
+            remaining = None if max_jobs is None else max_jobs - yielded
+            while (
+                not exhausted
+                and len(pending) < max_workers
+                and (remaining is None or len(pending) < remaining)
+            ):
+                candidate = next(candidates, None)
+                if candidate is None:
+                    exhausted = True
+                    break
+                i, desc, link = candidate
+                future = pool.submit(_extract_with_cache, desc, model, cache, limiter, stream)
+                pending.append((i, link, future))
+
+            if not pending:
+                break
+
+            i, link, future = pending.popleft()
+            try:
+                skills, _ = future.result()
+            except Exception as e:
+                metrics.inc("failures_total", pipeline="market", stage="extract")
+                print(f"[warn] market skill extraction failed at posting {i}: {e}")
+                continue
+            yielded += 1
+            yield i, link, skills
+
+
+def _extract_postings_batched(
+    candidates: List[Tuple[int, str, str]],
+    model,
+    cache: Optional[ExtractionCache],
+    limiter: Optional[TokenBucket],
+    max_workers: int,
+    max_jobs: Optional[int],
+    token_budget: int,
+) -> List[Tuple[int, str, List[str]]]:
+    """
+    Multi-posting requests sized to token_budget. Works in rounds: each round
+    takes just enough of the next postings to reach max_jobs, serves cache
+    hits, and extracts the misses in concurrent batches.
+    """
+    found: Dict[int, List[str]] = {}
+    links = {i: link for i, _, link in candidates}
+    next_candidate = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while next_candidate < len(candidates):
+            needed = len(candidates) if max_jobs is None else max_jobs - len(found)
+            if needed <= 0:
+                break
+            round_ = candidates[next_candidate:next_candidate + needed]
+            next_candidate += len(round_)
+
+            misses = []
+            for i, desc, _ in round_:
+                cached = None
+                if cache is not None:
+                    cached = cache.get(make_cache_key(desc, PROMPT_VERSION, _model_name(model)))
+                    metrics.record_cache("extraction", "hit" if cached is not None else "miss")
+                if cached is not None:
+                    found[i] = cached
+                else:
+                    misses.append((str(i), desc))
+
+            futures = [
+                pool.submit(_extract_batch_with_fallback, batch, model, cache, limiter)
+                for batch in _plan_batches(misses, token_budget)
+            ]
+            for future in futures:
+                for key, skills in future.result().items():
+                    found[int(key)] = skills
+
+    ordered = sorted(found.items())
+    if max_jobs is not None:
+        ordered = ordered[:max_jobs]
+    return [(i, links[i], skills) for i, skills in ordered]
+
+
+def make_rate_limiter(
+    requests_per_minute: Optional[float],
+    sleep_s: float = 0.0,
+) -> Optional[TokenBucket]:
+    """Token bucket for requests_per_minute, else one request per sleep_s."""
+    if requests_per_minute is None and sleep_s > 0:
+        requests_per_minute = 60.0 / sleep_s
+    return TokenBucket(requests_per_minute) if requests_per_minute else None
 
-# ----------------------------
-# Market Skill Aggregation
-# ----------------------------
 
 def build_market_skill_rows(
     job_postings: List[Dict[str, Any]],
@@ -369,66 +774,75 @@ def build_market_skill_rows(
     source: str = "market",
     sleep_s: float = 12.0,
     max_jobs: Optional[int] = None,
+    cache: Optional[ExtractionCache] = None,
+    requests_per_minute: Optional[float] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    rate_limiter: Optional[TokenBucket] = None,
+    batch_token_budget: Optional[int] = None,
+    dedupe: bool = False,
+    weight_duplicates: bool = False,
+    compact: bool = True,
+    jd_token_budget: Optional[int] = DEFAULT_JD_TOKEN_BUDGET,
+    stream: bool = False,
 ) -> List[Dict[str, Any]]:
     """
     Build normalized, aggregated market skill rows for storage.
-    """
-
-    skill_data = defaultdict(lambda: {
-        "count": 0,
-        "evidence": None
-    })
-
-    processed = 0
-
-    for i, job in enumerate(job_postings):
-        if max_jobs is not None and processed >= max_jobs:
-            break
 
-        desc = job.get("description") or ""
-        link = job.get("redirect_url") or ""
+    Postings are extracted concurrently on up to max_workers threads, paced
+    by a token bucket of requests_per_minute (defaults to one request per
+    sleep_s seconds). Pass rate_limiter to share one quota across calls.
+    Only real 429 / quota errors back off. With a cache, postings seen before
+    skip both the LLM call and the rate limiter.
 
-        if not desc.strip():
-            continue
+    With batch_token_budget set, several postings share one request (sized
+    to that many prompt tokens); postings the batch reply misses are retried
+    one at a time.
 
-        try:
-            skills = extract_market_skills(desc, model)
-            #skills = extract_market_skills(desc)
+    With dedupe, HTML/boilerplate is stripped and near-duplicate postings are
+    collapsed to one representative before extraction; weight_duplicates then
+    counts each representative's skills once per posting in its cluster.
 
+    With compact, benefits/legal/company sections are dropped from each
+    description and it is cut to jd_token_budget tokens before prompting
+    (see util.prompt_compaction).
 
-            for skill in skills:
-                key = normalize_skill_name(skill)
-                if not key:
-                    continue
+    With stream, single-posting replies are parsed as they arrive and each
+    request ends at the closing bracket of the skill array. Batched
+    requests (a JSON object per batch) are not streamed.
 
-                skill_data[key]["count"] += 1
-
-                if skill_data[key]["evidence"] is None and link:
-                    skill_data[key]["evidence"] = link
+    Results are aggregated in posting order, so rows are the same as with
+    sequential processing.
+    """
 
-            processed += 1
-            time.sleep(sleep_s)
+    if dedupe:
+        before = len(job_postings)
+        job_postings = dedupe_postings(job_postings)
+        if len(job_postings) < before:
+            print(f"[info] dedupe: {before} postings -> {len(job_postings)} unique")
 
-        except Exception as e:
-            print(f"[warn] market skill extraction failed at posting {i}: {e}")
-            time.sleep(max(5.0, sleep_s))
-
-    if not skill_data:
-        return []
-
-    max_count = max(v["count"] for v in skill_data.values()) or 1
-
-    rows = []
-    for skill, info in skill_data.items():
-        rows.append({
-            "user_id": user_id,
-            "source": source,
-            "dream_role": dream_role,
-            "skill_name": skill,
-            "score": round(info["count"] / max_count, 3),
-            "evidence": info["evidence"],
-        })
-
-    rows.sort(key=lambda r: r["score"], reverse=True)
-    return rows[:MAX_OUTPUT_SKILLS]
+    if rate_limiter is None:
+        rate_limiter = make_rate_limiter(requests_per_minute, sleep_s)
 
+    candidates = []
+    for i, job in enumerate(job_postings):
+        desc = job.get("description") or ""
+        if compact:
+            desc = compact_job_description(desc, max_tokens=jd_token_budget)
+        if desc.strip():
+            candidates.append((i, desc, job.get("redirect_url") or ""))
+
+    if batch_token_budget:
+        extracted = _extract_postings_batched(
+            candidates, model, cache, rate_limiter, max_workers, max_jobs, batch_token_budget
+        )
+    else:
+        extracted = iter_extracted_postings(
+            candidates, model, cache, rate_limiter, max_workers, max_jobs, stream
+        )
+
+    aggregator = SkillAggregator()
+    for i, link, skills in extracted:
+        weight = job_postings[i].get("cluster_size", 1) if weight_duplicates else 1
+        aggregator.add(skills, link, weight)
+
+    return aggregator.to_rows(user_id=user_id, dream_role=dream_role, source=source)
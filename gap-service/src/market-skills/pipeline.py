@@ -0,0 +1,212 @@
+"""
+Streaming market skills pipeline.
+
+Fetch → extract → aggregate run as a chain of generators, so only a window
+of postings is held in memory. Processed posting ids and the running
+aggregate are checkpointed, and partial aggregates are upserted every few
+postings: users see skills after the first postings instead of after the
+whole run, and an interrupted run resumes where it stopped.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from dedup import NearDuplicateIndex, clean_description
+from extraction_cache import ExtractionCache
+from job_fetcher import posting_id
+from market_agent import (
+    DEFAULT_JD_TOKEN_BUDGET,
+    DEFAULT_MAX_WORKERS,
+    SkillAggregator,
+    iter_extracted_postings,
+)
+from rate_limit import TokenBucket
+from util.prompt_compaction import compact_job_description
+
+DEFAULT_FLUSH_EVERY = 2
+
+
+class PipelineCheckpoint:
+    """
+    SQLite record of processed posting ids, the partial aggregate and the
+    skill names upserted so far per (user, role).
+    """
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                user_id TEXT NOT NULL,
+                dream_role TEXT NOT NULL,
+                processed TEXT NOT NULL,
+                aggregate TEXT NOT NULL,
+                written TEXT NOT NULL DEFAULT '[]',
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (user_id, dream_role)
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(checkpoints)")}
+        if "written" not in columns:   # checkpoint files from before the column existed
+            self._conn.execute("ALTER TABLE checkpoints ADD COLUMN written TEXT NOT NULL DEFAULT '[]'")
+        self._conn.commit()
+
+    def load(
+        self, user_id: str, dream_role: str
+    ) -> Optional[Tuple[Set[str], Dict[str, Any], Set[str]]]:
+        """(processed posting ids, aggregate state, written skill names), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT processed, aggregate, written FROM checkpoints WHERE user_id = ? AND dream_role = ?",
+                (user_id, dream_role),
+            ).fetchone()
+        if row is None:
+            return None
+        return set(json.loads(row[0])), json.loads(row[1]), set(json.loads(row[2]))
+
+    def save(
+        self,
+        user_id: str,
+        dream_role: str,
+        processed: Set[str],
+        aggregate: Dict[str, Any],
+        written: Set[str] = frozenset(),
+    ) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(user_id, dream_role, processed, aggregate, written, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    user_id,
+                    dream_role,
+                    json.dumps(sorted(processed)),
+                    json.dumps(aggregate),
+                    json.dumps(sorted(written)),
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+
+    def clear(self, user_id: str, dream_role: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE user_id = ? AND dream_role = ?",
+                (user_id, dream_role),
+            )
+            self._conn.commit()
+
+
+def run_streaming_pipeline(
+    jobs: Iterable[Dict[str, Any]],
+    *,
+    user_id: str,
+    dream_role: str,
+    model,
+    upsert: Callable[[List[Dict[str, Any]]], None],
+    prune: Optional[Callable[[List[str]], None]] = None,
+    checkpoint: Optional[PipelineCheckpoint] = None,
+    cache: Optional[ExtractionCache] = None,
+    rate_limiter: Optional[TokenBucket] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    max_jobs: Optional[int] = None,
+    flush_every: int = DEFAULT_FLUSH_EVERY,
+    dedupe: bool = False,
+    source: str = "market",
+    compact: bool = True,
+    jd_token_budget: Optional[int] = DEFAULT_JD_TOKEN_BUDGET,
+    stream: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Stream postings through extraction and aggregation.
+
+    Every flush_every extracted postings the current top rows are passed to
+    upsert and the checkpoint is saved (in that order, so a resumed run never
+    lags what was written). Postings already recorded in the checkpoint are
+    skipped and count toward max_jobs; failed postings are not recorded and
+    are retried on the next run. The checkpoint is cleared on completion.
+    Partial upserts can leave skills that later drop out of the top rows:
+    after the final upsert, prune(names) is called with the skill names a
+    partial upsert of this run (or of the interrupted run it resumes) wrote
+    that are not in the final rows. Rows the pipeline did not write are
+    never passed to prune.
+    Descriptions are compacted, and replies streamed, as in
+    build_market_skill_rows.
+
+    Returns the final rows (also upserted).
+    """
+    processed: Set[str] = set()
+    written: Set[str] = set()   # skill names upserted so far
+    aggregator = SkillAggregator()
+    if checkpoint is not None:
+        saved = checkpoint.load(user_id, dream_role)
+        if saved is not None:
+            processed, state, written = saved
+            aggregator = SkillAggregator(state)
+            print(f"[info] resuming market pipeline: {len(processed)} postings already processed")
+
+    remaining = None if max_jobs is None else max(0, max_jobs - len(processed))
+    ids_by_index: Dict[int, str] = {}
+    index = NearDuplicateIndex() if dedupe else None
+
+    def candidates() -> Iterator[Tuple[int, str, str]]:
+        for i, job in enumerate(jobs):
+            pid = posting_id(job)
+            if pid in processed:
+                continue
+            desc = job.get("description") or ""
+            if dedupe:
+                desc = clean_description(desc)
+            if compact:
+                desc = compact_job_description(desc, max_tokens=jd_token_budget)
+            if not desc.strip():
+                continue
+            if index is not None and index.find_or_add(desc) is not None:
+                continue
+            ids_by_index[i] = pid
+            yield i, desc, job.get("redirect_url") or ""
+
+    def rows() -> List[Dict[str, Any]]:
+        return aggregator.to_rows(user_id=user_id, dream_role=dream_role, source=source)
+
+    upserted = False
+
+    def flush() -> None:
+        nonlocal upserted
+        current = rows()
+        if current:
+            upsert(current)
+            upserted = True
+            written.update(row["skill_name"] for row in current)
+        if checkpoint is not None:
+            checkpoint.save(user_id, dream_role, processed, aggregator.to_state(), written)
+
+    since_flush = 0
+    if remaining != 0:
+        for i, link, skills in iter_extracted_postings(
+            candidates(), model, cache, rate_limiter, max_workers, remaining, stream
+        ):
+            aggregator.add(skills, link)
+            processed.add(ids_by_index.pop(i))
+            since_flush += 1
+            if since_flush >= flush_every:
+                flush()
+                since_flush = 0
+
+    final = rows()
+    if final and (since_flush or not upserted):
+        upsert(final)
+    stale = written - {row["skill_name"] for row in final}
+    if stale and prune is not None:
+        prune(sorted(stale))
+    if checkpoint is not None:
+        checkpoint.clear(user_id, dream_role)
+    return final
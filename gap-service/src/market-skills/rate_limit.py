@@ -0,0 +1,132 @@
+"""
+Rate limiting for LLM extraction calls.
+
+A thread-safe token bucket configured in requests per minute replaces the
+fixed per-posting sleeps: workers only wait when they would exceed the
+provider quota. Real 429 / quota errors pause the whole bucket with an
+exponential backoff (or the server's Retry-After) and are retried.
+"""
+
+import re
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+from util import metrics
+
+T = TypeVar("T")
+
+MAX_RATE_LIMIT_RETRIES = 3
+BASE_BACKOFF_S = 2.0
+MAX_BACKOFF_S = 60.0
+
+# SDK exception types for 429 / quota errors (google.api_core, groq, openai-style)
+_RATE_LIMIT_TYPES = ("ResourceExhausted", "TooManyRequests", "RateLimitError")
+
+# Fallback for errors that carry no status code or known type; specific
+# phrases only, so e.g. "model 4290" or a "sales quota" does not match
+_RATE_LIMIT_RE = re.compile(
+    r"\b429\b|resource[ _]?exhausted|rate[ _-]?limit(ed)?\b|too many requests|"
+    r"quota (exceeded|exhausted)|exceeded (your |the )?(current )?quota",
+    re.I,
+)
+
+
+class TokenBucket:
+    def __init__(self, requests_per_minute: float, burst: Optional[int] = None):
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be > 0")
+        self.rate_per_s = requests_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Block until a request may be sent. Returns seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        metrics.observe("stage_seconds", waited, pipeline="market", stage="rate_limit_wait")
+                        return waited
+                    delay = (1.0 - self._tokens) / self.rate_per_s
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, delay_s: float) -> None:
+        """Hold back every caller for delay_s (used after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay_s)
+            self._tokens = 0.0
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """
+    Whether exc is a provider 429 / quota error. Parse errors (ValueError,
+    including MalformedReply) never are: they get their own corrective retry.
+    """
+    if isinstance(exc, ValueError):
+        return False
+    response = getattr(exc, "response", None)
+    for status in (
+        getattr(exc, "status_code", None),
+        getattr(exc, "code", None),
+        getattr(response, "status_code", None),
+    ):
+        if status == 429:
+            return True
+    if any(cls.__name__ in _RATE_LIMIT_TYPES for cls in type(exc).__mro__):
+        return True
+    return bool(_RATE_LIMIT_RE.search(str(exc)))
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Server-suggested delay, if the error carries one."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    if value is None:
+        match = re.search(r"retry[ _-]?(?:after|delay)\D{0,20}(\d+(?:\.\d+)?)", str(exc), re.I)
+        value = match.group(1) if match else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def call_rate_limited(fn: Callable[[], T], limiter: Optional[TokenBucket]) -> T:
+    """
+    Run fn under the limiter, retrying only on rate-limit / quota errors.
+    Any other exception propagates immediately.
+    """
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn()
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt >= MAX_RATE_LIMIT_RETRIES:
+                raise
+            delay = retry_after_seconds(e) or min(MAX_BACKOFF_S, BASE_BACKOFF_S * (2 ** attempt))
+            print(f"[warn] rate limited, backing off {delay:.1f}s: {e}")
+            metrics.inc("retries_total", reason="rate_limit")
+            if limiter is not None:
+                # The wait itself is counted as rate_limit_wait in acquire()
+                limiter.pause(delay)
+            else:
+                with metrics.stage("market", "backoff"):
+                    time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,175 @@
+"""
+Shared market skill profiles per dream role.
+
+Many students share a dream role, and the Adzuna fetch plus Gemini
+extraction for a role does not depend on the student. A role profile is
+built once per normalized role and TTL window, stored in SQLite, and each
+user's market skills are a copy of it (fan_out). Work then scales with the
+number of distinct roles rather than the number of users. The market agent
+uses profiles only with MARKET_ROLE_PROFILES=1. Storing a profile evicts
+those older than the TTL, so the file holds at most one TTL window of roles.
+
+Concurrent requests for the same role in one process wait for a single
+build instead of each running their own.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from util import metrics
+
+DEFAULT_TTL_S = 6 * 3600
+
+# Fields of a market skill row that belong to the role, not the user
+PROFILE_FIELDS = ("skill_name", "score", "evidence")
+
+_ROLE_RE = re.compile(r"[^\w+#]+")
+
+
+def normalize_role(dream_role: str) -> str:
+    """Role key: case, punctuation and spacing differences map to one profile."""
+    return _ROLE_RE.sub(" ", (dream_role or "").lower()).strip()
+
+
+def profile_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Strip the user-specific fields from built market skill rows."""
+    return [{k: row[k] for k in PROFILE_FIELDS if k in row} for row in rows]
+
+
+def fan_out(
+    profile: List[Dict[str, Any]],
+    *,
+    user_id: str,
+    dream_role: str,
+    source: str = "market",
+) -> List[Dict[str, Any]]:
+    """One user's skills rows, copied from a role profile."""
+    return [
+        {"user_id": user_id, "source": source, "dream_role": dream_role, **row}
+        for row in profile
+    ]
+
+
+class RoleProfileStore:
+    def __init__(self, path: str, *, ttl_s: float = DEFAULT_TTL_S):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.builds = 0
+        self._lock = threading.Lock()
+        self._role_locks: Dict[str, threading.Lock] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS role_profiles (
+                role_key TEXT PRIMARY KEY,
+                dream_role TEXT NOT NULL,
+                rows TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, dream_role: str) -> Optional[Dict[str, Any]]:
+        """Fresh profile for the role ({dream_role, rows, created_at}), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dream_role, rows, created_at FROM role_profiles WHERE role_key = ?",
+                (normalize_role(dream_role),),
+            ).fetchone()
+        if row is None or time.time() - row[2] > self.ttl_s:
+            return None
+        return {"dream_role": row[0], "rows": json.loads(row[1]), "created_at": row[2]}
+
+    def put(self, dream_role: str, rows: List[Dict[str, Any]]) -> None:
+        """Store the role's profile and evict expired ones."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO role_profiles (role_key, dream_role, rows, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (normalize_role(dream_role), dream_role, json.dumps(profile_rows(rows)), now),
+            )
+            self._conn.execute("DELETE FROM role_profiles WHERE created_at < ?", (now - self.ttl_s,))
+            self._conn.commit()
+
+    def get_or_build(
+        self,
+        dream_role: str,
+        build: Callable[[], List[Dict[str, Any]]],
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        The role's profile rows and whether they were built now. build()
+        returns market skill rows for the role; an empty result is not
+        stored, so the next request tries again.
+        """
+        with self._role_lock(dream_role):
+            cached = self.get(dream_role)
+            if cached is not None:
+                self.hits += 1
+                metrics.record_cache("role_profile", "hit")
+                return cached["rows"], False
+
+            metrics.record_cache("role_profile", "miss")
+            return self._build(dream_role, build), True
+
+    def refresh(self, dream_role: str, build: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Rebuild the role's profile even if it is still fresh."""
+        with self._role_lock(dream_role):
+            return self._build(dream_role, build)
+
+    def _role_lock(self, dream_role: str) -> threading.Lock:
+        with self._lock:
+            return self._role_locks.setdefault(normalize_role(dream_role), threading.Lock())
+
+    def _build(self, dream_role: str, build: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        rows = profile_rows(build())
+        self.builds += 1
+        if rows:
+            self.put(dream_role, rows)
+        return rows
+
+    def age_s(self, dream_role: str) -> Optional[float]:
+        """Seconds since the role's profile was built (expired or not), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM role_profiles WHERE role_key = ?",
+                (normalize_role(dream_role),),
+            ).fetchone()
+        return time.time() - row[0] if row else None
+
+    def freshness(self) -> List[Dict[str, Any]]:
+        """Build time and age of every stored profile, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT dream_role, created_at FROM role_profiles ORDER BY created_at"
+            ).fetchall()
+        now = time.time()
+        return [
+            {"dream_role": role, "created_at": created_at, "age_s": round(now - created_at, 1),
+             "fresh": now - created_at <= self.ttl_s}
+            for role, created_at in rows
+        ]
+
+    def purge_expired(self) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM role_profiles WHERE created_at < ?", (time.time() - self.ttl_s,)
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM role_profiles").fetchone()
+        return {"hits": self.hits, "builds": self.builds, "size": size}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
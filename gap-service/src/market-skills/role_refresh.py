@@ -0,0 +1,201 @@
+"""
+Scheduled precomputation of role market profiles.
+
+Reads the most common dream_role values from profiles and rebuilds their
+shared role profiles (role_profiles.RoleProfileStore) ahead of expiry, so
+interactive market runs for popular roles copy precomputed rows instead of
+fetching and extracting on the request path. Rare roles are still built on
+demand by the first user who asks.
+
+A refresh run is bounded by an LLM call budget. Every request, including
+rate-limit and parse retries, takes a call from the budget before it is
+sent (BudgetLimiter wraps the rate limiter), so the cap is never exceeded:
+a role whose build runs out of budget is abandoned and keeps its previous
+profile (extractions that did complete stay in the extraction cache for
+the next run). A role is not started unless its usual cost (one call per
+posting) still fits. Each profile's build time is its freshness timestamp
+(RoleProfileStore.freshness).
+"""
+
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from rate_limit import TokenBucket
+from role_profiles import RoleProfileStore, normalize_role
+from util import metrics
+
+DEFAULT_TOP_ROLES = 20
+PROFILES_PAGE_SIZE = 1000
+
+
+# ----------------------------
+# Popular roles
+# ----------------------------
+
+def popular_roles(supabase, *, top: int = DEFAULT_TOP_ROLES) -> List[Tuple[str, int]]:
+    """
+    (dream_role, user count) for the top most common normalized roles, most
+    common first. Each role is reported in its most common spelling.
+    """
+    counts: Counter = Counter()
+    spellings: Dict[str, Counter] = {}
+    start = 0
+    while True:
+        resp = (
+            supabase
+            .table("profiles")
+            .select("dream_role")
+            .range(start, start + PROFILES_PAGE_SIZE - 1)
+            .execute()
+        )
+        page = resp.data or []
+        for row in page:
+            role = (row.get("dream_role") or "").strip()
+            key = normalize_role(role)
+            if not key:
+                continue
+            counts[key] += 1
+            spellings.setdefault(key, Counter())[role] += 1
+        if len(page) < PROFILES_PAGE_SIZE:
+            break
+        start += PROFILES_PAGE_SIZE
+
+    return [
+        (spellings[key].most_common(1)[0][0], n)
+        for key, n in counts.most_common(top)
+    ]
+
+
+# ----------------------------
+# LLM budget
+# ----------------------------
+
+class LLMBudgetExhausted(RuntimeError):
+    """The refresh run's LLM call budget is spent."""
+
+
+class BudgetLimiter:
+    """
+    Rate limiter (TokenBucket interface) that also caps the number of LLM
+    requests: acquire() takes one call from the budget, or raises
+    LLMBudgetExhausted once it is spent, before the wrapped limiter paces it.
+    """
+
+    def __init__(self, max_calls: int, inner: Optional[TokenBucket] = None):
+        self.max_calls = max_calls
+        self.inner = inner
+        self.used = 0
+        self.exhausted = False
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return max(0, self.max_calls - self.used)
+
+    def acquire(self) -> float:
+        with self._lock:
+            if self.used >= self.max_calls:
+                self.exhausted = True
+                raise LLMBudgetExhausted(f"LLM call budget of {self.max_calls} spent")
+            self.used += 1
+            delay = max(0.0, self._paused_until - time.monotonic())
+        if self.inner is not None:
+            return self.inner.acquire()
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def pause(self, delay_s: float) -> None:
+        if self.inner is not None:
+            self.inner.pause(delay_s)
+            return
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay_s)
+
+
+# ----------------------------
+# Refresh
+# ----------------------------
+
+def refresh_roles(
+    roles: List[Tuple[str, int]],
+    build: Callable[[str, BudgetLimiter], List[Dict[str, Any]]],
+    *,
+    store: RoleProfileStore,
+    llm_budget: int,
+    calls_per_role: int,
+    min_age_s: float,
+    rate_limiter: Optional[TokenBucket] = None,
+) -> Dict[str, Any]:
+    """
+    Rebuild the profiles of roles (most important first) that are missing or
+    older than min_age_s, while the LLM budget allows. build(dream_role,
+    limiter) returns the role's market skill rows and must send every LLM
+    request through limiter (it wraps rate_limiter).
+
+    Returns a summary: refreshed / fresh / over_budget / failed role lists
+    and the LLM calls used.
+    """
+    summary: Dict[str, Any] = {"refreshed": [], "fresh": [], "over_budget": [], "failed": []}
+    budget = BudgetLimiter(llm_budget, rate_limiter)
+
+    def build_within_budget(dream_role: str) -> List[Dict[str, Any]]:
+        rows = build(dream_role, budget)
+        if budget.exhausted:
+            # Postings refused by the budget are missing: do not store a partial profile
+            raise LLMBudgetExhausted(f"LLM call budget spent while building {dream_role!r}")
+        return rows
+
+    for dream_role, users in roles:
+        age = store.age_s(dream_role)
+        if age is not None and age < min_age_s:
+            summary["fresh"].append(dream_role)
+            metrics.inc("role_refreshes_total", result="fresh")
+            continue
+        if budget.remaining < calls_per_role:
+            summary["over_budget"].append(dream_role)
+            metrics.inc("role_refreshes_total", result="over_budget")
+            continue
+
+        started = time.perf_counter()
+        used_before = budget.used
+        try:
+            rows = store.refresh(dream_role, lambda: build_within_budget(dream_role))
+        except LLMBudgetExhausted:
+            print(f"[warn] LLM budget spent during role {dream_role!r}; keeping its previous profile")
+            summary["over_budget"].append(dream_role)
+            metrics.inc("role_refreshes_total", result="over_budget")
+            continue
+        except Exception as e:
+            print(f"[warn] refresh failed for role {dream_role!r}: {e}")
+            summary["failed"].append(dream_role)
+            metrics.inc("role_refreshes_total", result="failed")
+            continue
+
+        summary["refreshed"].append(dream_role)
+        metrics.inc("role_refreshes_total", result="refreshed")
+        print(
+            f"[info] refreshed role {dream_role!r} ({users} users): {len(rows)} skills, "
+            f"{budget.used - used_before} LLM calls, {time.perf_counter() - started:.1f}s"
+        )
+
+    summary["llm_calls"] = budget.used
+    return summary
+
+
+def in_hours(window: Optional[str], now: Optional[float] = None) -> bool:
+    """
+    Whether the local hour is inside window ("start-end", e.g. "1-5" or
+    "22-4"; hours 0-24, end exclusive). An empty window means any time.
+    """
+    if not window:
+        return True
+    start, end = (int(h) for h in window.split("-", 1))
+    hour = time.localtime(now).tm_hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
@@ -1,7 +1,7 @@
+import atexit
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
-from supabase import create_client
-import google.generativeai as genai
 
 
 load_dotenv()
@@ -11,28 +11,163 @@ load_dotenv()
 # ----------------------------
 
 MAX_JOBS = int(os.getenv("MAX_JOBS", 10))      # how many jobs to process
-SLEEP_S = float(os.getenv("SLEEP_S", 5.0))   # rate limiting between LLM calls
+SLEEP_S = float(os.getenv("SLEEP_S", 5.0))   # default pacing if MARKET_RPM is unset
+MARKET_RPM = float(os.getenv("MARKET_RPM", 0)) or None   # LLM requests per minute (provider quota)
+MARKET_WORKERS = int(os.getenv("MARKET_WORKERS", 4))      # concurrent extractions
+MARKET_BATCH_TOKENS = int(os.getenv("MARKET_BATCH_TOKENS", 0)) or None   # >0 enables multi-posting prompts
+MARKET_DEDUPE = os.getenv("MARKET_DEDUPE", "0") == "1"   # collapse near-duplicate postings (changes skill counts)
+MARKET_WEIGHT_DUPLICATES = os.getenv("MARKET_WEIGHT_DUPLICATES", "0") == "1"
+MARKET_STREAMING = os.getenv("MARKET_STREAMING", "0") == "1"   # incremental upserts + resumable checkpoints
+MARKET_FLUSH_EVERY = int(os.getenv("MARKET_FLUSH_EVERY", 2))    # postings between partial upserts
+MARKET_COMPACT = os.getenv("MARKET_COMPACT", "1") == "1"   # drop benefits/legal/company text from prompts
+MARKET_LLM_STREAM = os.getenv("MARKET_LLM_STREAM", "0") == "1"   # stream replies, stop at the closing bracket
 
 
 
 #from market_agent import build_market_skill_rows
-from src.market_agent import build_market_skill_rows
+from market_agent import DEFAULT_JD_TOKEN_BUDGET, build_market_skill_rows, make_rate_limiter
 #from run_local_test import fetch_jobs  # reuse existing fetch logic
-from src.job_fetcher import fetch_jobs
+from job_fetcher import (
+    DEFAULT_MAX_AGE_S as DEFAULT_PAGE_MAX_AGE_S,
+    DEFAULT_MAX_PAGES,
+    PostingCache,
+    fetch_jobs,
+    iter_jobs,
+)
+from pipeline import PipelineCheckpoint, run_streaming_pipeline
+from role_profiles import DEFAULT_TTL_S as DEFAULT_PROFILE_TTL_S, RoleProfileStore, fan_out
+from role_refresh import DEFAULT_TOP_ROLES, popular_roles, refresh_roles
+from extraction_cache import ExtractionCache, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_S
+from util import clients, metrics, singleflight
+from util.write_behind import DEFAULT_MAX_DELAY_S, DEFAULT_MAX_ROWS, WriteBehindBuffer
+
+# Per-posting extraction cache (shared by every user with the same dream_role)
+MARKET_CACHE_PATH = os.getenv("MARKET_CACHE_PATH", ".cache/market_extractions.sqlite3")
+MARKET_CACHE_TTL_S = float(os.getenv("MARKET_CACHE_TTL_S", DEFAULT_TTL_S))
+MARKET_CACHE_MAX_ENTRIES = int(os.getenv("MARKET_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+
+# Adzuna postings cache (repeated role queries are served locally or revalidated)
+ADZUNA_CACHE_PATH = os.getenv("ADZUNA_CACHE_PATH", ".cache/adzuna_postings.sqlite3")
+ADZUNA_CACHE_TTL_S = float(os.getenv("ADZUNA_CACHE_TTL_S", 6 * 3600))
+ADZUNA_CACHE_MAX_AGE_S = float(os.getenv("ADZUNA_CACHE_MAX_AGE_S", DEFAULT_PAGE_MAX_AGE_S))   # kept to revalidate
+ADZUNA_CACHE_MAX_PAGES = int(os.getenv("ADZUNA_CACHE_MAX_PAGES", DEFAULT_MAX_PAGES))
+ADZUNA_PAGES = int(os.getenv("ADZUNA_PAGES", 1))
+
+# Streaming pipeline checkpoints (processed posting ids + partial aggregates)
+MARKET_CHECKPOINT_PATH = os.getenv("MARKET_CHECKPOINT_PATH", ".cache/market_checkpoints.sqlite3")
+
+# Shared per-role market profiles (one fetch + extraction per role and TTL window)
+MARKET_ROLE_PROFILES = os.getenv("MARKET_ROLE_PROFILES", "0") == "1"
+ROLE_PROFILE_PATH = os.getenv("ROLE_PROFILE_PATH", ".cache/role_profiles.sqlite3")
+ROLE_PROFILE_TTL_S = float(os.getenv("ROLE_PROFILE_TTL_S", DEFAULT_PROFILE_TTL_S))
+
+# Scheduled refresh of popular roles' profiles (run_role_refresh.py / worker)
+ROLE_REFRESH_TOP = int(os.getenv("ROLE_REFRESH_TOP", DEFAULT_TOP_ROLES))
+ROLE_REFRESH_LLM_BUDGET = int(os.getenv("ROLE_REFRESH_LLM_BUDGET", 200))   # LLM calls per refresh run
+ROLE_REFRESH_MIN_AGE_S = float(os.getenv("ROLE_REFRESH_MIN_AGE_S", ROLE_PROFILE_TTL_S / 2))
+
+# Write-behind skills upserts (coalesced across runs, flushed by size/time/exit)
+MARKET_WRITE_BEHIND = os.getenv("MARKET_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_MAX_ROWS = int(os.getenv("WRITE_BEHIND_MAX_ROWS", DEFAULT_MAX_ROWS))
+WRITE_BEHIND_MAX_DELAY_S = float(os.getenv("WRITE_BEHIND_MAX_DELAY_S", DEFAULT_MAX_DELAY_S))
+
+SKILLS_CONFLICT_KEY = "user_id,source,skill_name"
+SKILL_TOMBSTONE = "_delete"   # marks a skills write as a delete of that key
+
+# Per-description prompt budget after compaction (0 = no limit)
+MARKET_JD_TOKENS = int(os.getenv("MARKET_JD_TOKENS", DEFAULT_JD_TOKEN_BUDGET)) or None
 
 
 
 # ----------------------------
-# Setup
+# Setup (lazy: nothing connects or opens files until the first run)
 # ----------------------------
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+@lru_cache(maxsize=None)
+def _extraction_cache() -> ExtractionCache:
+    return ExtractionCache(
+        MARKET_CACHE_PATH,
+        max_entries=MARKET_CACHE_MAX_ENTRIES,
+        ttl_s=MARKET_CACHE_TTL_S,
+    )
+
+
+@lru_cache(maxsize=None)
+def _posting_cache() -> PostingCache:
+    return PostingCache(
+        ADZUNA_CACHE_PATH,
+        ttl_s=ADZUNA_CACHE_TTL_S,
+        max_age_s=ADZUNA_CACHE_MAX_AGE_S,
+        max_pages=ADZUNA_CACHE_MAX_PAGES,
+    )
+
+
+@lru_cache(maxsize=None)
+def _pipeline_checkpoint() -> PipelineCheckpoint:
+    return PipelineCheckpoint(MARKET_CHECKPOINT_PATH)
+
+
+@lru_cache(maxsize=None)
+def _role_profiles() -> RoleProfileStore:
+    return RoleProfileStore(ROLE_PROFILE_PATH, ttl_s=ROLE_PROFILE_TTL_S)
+
+
+def _write_skills(rows, retry=False):
+    # Upserts on the conflict key are idempotent, and so are deletes, so
+    # retries need no clean-up
+    supabase = clients.supabase_client()
+    upserts = [row for row in rows if not row.get(SKILL_TOMBSTONE)]
+    deletes = {}
+    for row in rows:
+        if row.get(SKILL_TOMBSTONE):
+            deletes.setdefault((row["user_id"], row["source"]), []).append(row["skill_name"])
+    with metrics.stage("market", "upsert"):
+        for start in range(0, len(upserts), WRITE_BEHIND_MAX_ROWS):
+            supabase.table("skills").upsert(
+                upserts[start:start + WRITE_BEHIND_MAX_ROWS],
+                on_conflict=SKILLS_CONFLICT_KEY
+            ).execute()
+        for (user_id, source), names in deletes.items():
+            for start in range(0, len(names), WRITE_BEHIND_MAX_ROWS):
+                (
+                    supabase.table("skills")
+                    .delete()
+                    .eq("user_id", user_id)
+                    .eq("source", source)
+                    .in_("skill_name", names[start:start + WRITE_BEHIND_MAX_ROWS])
+                    .execute()
+                )
+
+
+@lru_cache(maxsize=None)
+def _skills_writer() -> WriteBehindBuffer:
+    writer = WriteBehindBuffer(
+        _write_skills,
+        name="skills",
+        key=lambda row: tuple(row[k] for k in SKILLS_CONFLICT_KEY.split(",")),
+        max_rows=WRITE_BEHIND_MAX_ROWS,
+        max_delay_s=WRITE_BEHIND_MAX_DELAY_S,
+    )
+    atexit.register(writer.close)
+    return writer
+
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+def _upsert_skills(rows):
+    if MARKET_WRITE_BEHIND:
+        _skills_writer().add(rows)
+    else:
+        _write_skills(rows)
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.5-flash")
+
+def _prune_skills(user_id, skill_names, source="market"):
+    # Delete rows a streaming run upserted as partial results but dropped
+    # from its final rows. Through the write-behind buffer the deletes are
+    # keyed like the upserts, so they replace a still-queued partial row or
+    # are written after it, never before.
+    _upsert_skills([
+        {"user_id": user_id, "source": source, "skill_name": name, SKILL_TOMBSTONE: True}
+        for name in skill_names
+    ])
 
 
 # ----------------------------
@@ -40,38 +175,125 @@ model = genai.GenerativeModel("gemini-2.5-flash")
 # ----------------------------
 
 def run_market_skills_agent(user_id: str):
-    # 1. Fetch dream role
-    profile = (
-        supabase
-        .table("profiles")
-        .select("dream_role")
-        .eq("user_id", user_id)
-        .single()
-        .execute()
-    )
+    # Concurrent runs for one user (double-clicks, retries, other workers)
+    # share a single run
+    return singleflight.do("market", user_id, lambda: _run_market_skills_agent(user_id))
 
-    dream_role = profile.data["dream_role"]
 
-    # 2. Fetch jobs
-    jobs = fetch_jobs(dream_role)
+def _run_market_skills_agent(user_id: str):
+    supabase = clients.supabase_client()
+    model = clients.gemini_model()
+    extraction_cache = _extraction_cache()
 
+    # 1. Fetch dream role
+    with metrics.stage("market", "supabase_fetch"):
+        profile = (
+            supabase
+            .table("profiles")
+            .select("dream_role")
+            .eq("user_id", user_id)
+            .single()
+            .execute()
+        )
 
-    # 3. Build skill rows
-    rows = build_market_skill_rows(
-    job_postings=jobs[:MAX_JOBS],
-    user_id=user_id,
-    dream_role=dream_role,
-    model=model,
-    sleep_s=SLEEP_S,
-)
+    dream_role = profile.data["dream_role"]
+
+    # Streaming: fetch → extract → upsert incrementally, resumable via checkpoint
+    # (per user; role profiles are not used)
+    if MARKET_STREAMING:
+        rows = run_streaming_pipeline(
+            iter_jobs(dream_role, pages=ADZUNA_PAGES, cache=_posting_cache()),
+            user_id=user_id,
+            dream_role=dream_role,
+            model=model,
+            upsert=_upsert_skills,
+            prune=lambda names: _prune_skills(user_id, names),
+            checkpoint=_pipeline_checkpoint(),
+            cache=extraction_cache,
+            rate_limiter=make_rate_limiter(MARKET_RPM, SLEEP_S),
+            max_workers=MARKET_WORKERS,
+            max_jobs=MAX_JOBS,
+            flush_every=MARKET_FLUSH_EVERY,
+            dedupe=MARKET_DEDUPE,
+            compact=MARKET_COMPACT,
+            jd_token_budget=MARKET_JD_TOKENS,
+            stream=MARKET_LLM_STREAM,
+        )
+        print(f"[info] extraction cache: {extraction_cache.stats()}")
+        return len(rows)
 
+    # 2-3. Fetch jobs and build skill rows, once per role when profiles are shared
+    if MARKET_ROLE_PROFILES:
+        profile_rows, built = _role_profiles().get_or_build(
+            dream_role,
+            lambda: _build_rows(dream_role, user_id=user_id, model=model, cache=extraction_cache),
+        )
+        rows = fan_out(profile_rows, user_id=user_id, dream_role=dream_role)
+        print(f"[info] role profile for {dream_role!r}: {'built' if built else 'shared'}")
+    else:
+        rows = _build_rows(dream_role, user_id=user_id, model=model, cache=extraction_cache)
 
     # 4. Insert into Supabase
     if rows:
-        supabase.table("skills").upsert(
-    rows,
-    on_conflict="user_id,source,skill_name"
-).execute()
+        _upsert_skills(rows)
+
+    print(f"[info] extraction cache: {extraction_cache.stats()}")
 
 
     return len(rows)
+
+
+def _build_rows(dream_role, *, user_id, model, cache, rate_limiter=None):
+    jobs = fetch_jobs(dream_role, pages=ADZUNA_PAGES, cache=_posting_cache())
+
+    return build_market_skill_rows(
+        job_postings=jobs[:MAX_JOBS],
+        user_id=user_id,
+        dream_role=dream_role,
+        model=model,
+        sleep_s=SLEEP_S,
+        cache=cache,
+        requests_per_minute=MARKET_RPM,
+        rate_limiter=rate_limiter,
+        max_workers=MARKET_WORKERS,
+        batch_token_budget=MARKET_BATCH_TOKENS,
+        dedupe=MARKET_DEDUPE,
+        weight_duplicates=MARKET_WEIGHT_DUPLICATES,
+        compact=MARKET_COMPACT,
+        jd_token_budget=MARKET_JD_TOKENS,
+        stream=MARKET_LLM_STREAM,
+    )
+
+
+# ----------------------------
+# Scheduled Refresh
+# ----------------------------
+
+def refresh_popular_roles(top: int = None, llm_budget: int = None):
+    """
+    Rebuild the role profiles of the most common dream roles that are
+    missing or older than ROLE_REFRESH_MIN_AGE_S, within an LLM call budget.
+    """
+    if not MARKET_ROLE_PROFILES:
+        print("[warn] MARKET_ROLE_PROFILES is off; refreshed profiles will not be used")
+
+    supabase = clients.supabase_client()
+    model = clients.gemini_model()
+    extraction_cache = _extraction_cache()
+
+    with metrics.stage("market", "supabase_fetch"):
+        roles = popular_roles(supabase, top=top or ROLE_REFRESH_TOP)
+
+    summary = refresh_roles(
+        roles,
+        lambda dream_role, limiter: _build_rows(
+            dream_role, user_id="", model=model, cache=extraction_cache, rate_limiter=limiter
+        ),
+        store=_role_profiles(),
+        llm_budget=llm_budget if llm_budget is not None else ROLE_REFRESH_LLM_BUDGET,
+        calls_per_role=MAX_JOBS,
+        min_age_s=ROLE_REFRESH_MIN_AGE_S,
+        rate_limiter=make_rate_limiter(MARKET_RPM, SLEEP_S),
+    )
+    print(f"[info] extraction cache: {extraction_cache.stats()}")
+    return summary
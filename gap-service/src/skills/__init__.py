@@ -1,4 +1,4 @@
 # Skill gap analysis package
-from .gap_analysis import analyze_skill_gaps
+from .gap_analysis import analyze_skill_gaps, analyze_skill_gaps_batch, cohort_gap_report
 
-__all__ = ["analyze_skill_gaps"]
+__all__ = ["analyze_skill_gaps", "analyze_skill_gaps_batch", "cohort_gap_report"]
@@ -2,17 +2,40 @@
 LLM-powered skill gap analysis.
 
 Fetches resume and market skills from Supabase, uses Groq to identify
-missing skills, and persists results to the gap_skills table.
+missing skills, and persists results to the gap_skills table. With
+GAP_MATCH_MODE=offline (or, with fallback, when a Groq call fails) the local
+n-gram matcher in semantic_match is used instead. Prompts are kept within
+GAP_PROMPT_TOKENS by splitting the market skills across several requests.
+With GAP_LLM_STREAM=1 completions are streamed and parsed incrementally,
+and reading stops at the closing bracket of the answer. Groq's JSON mode is
+used unless GAP_STRUCTURED_OUTPUT=0; malformed replies are repaired locally
+before a single corrective retry.
 """
 
-import json
+from __future__ import annotations
+
+import atexit
 import logging
 import os
+import threading
+import time
 import uuid
-from typing import Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator
+
+from util import clients, metrics, singleflight
+from util.llm_json import MalformedReply, iter_json_array, parse_json_lenient
+from util.prompt_compaction import chunk_to_budget, dedupe, estimate_tokens
+from util.write_behind import DEFAULT_MAX_DELAY_S, WriteBehindBuffer
 
-from groq import Groq
-from supabase import Client, create_client
+from .matching import prematch_skills, skill_key
+from .run_store import GapRunStore, skills_fingerprint
+
+# SDKs are imported lazily by util.clients; these are for annotations only
+if TYPE_CHECKING:
+    from groq import Groq
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
@@ -20,24 +43,57 @@ logger = logging.getLogger(__name__)
 # Environment & clients
 # ---------------------------------------------------------------------------
 
-def _get_env(name: str) -> str:
-    value = os.environ.get(name)
-    if not value or not value.strip():
-        raise ValueError(f"Missing or empty environment variable: {name}")
-    return value.strip()
-
-
 def _supabase_client() -> Client:
-    url = _get_env("SUPABASE_URL")
-    key = os.environ.get("SUPABASE_KEY") or os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-    if not key or not key.strip():
-        raise ValueError("Missing or empty: set SUPABASE_KEY or SUPABASE_SERVICE_ROLE_KEY")
-    return create_client(url, key.strip())
+    return clients.supabase_client()
 
 
 def _groq_client() -> Groq:
-    api_key = _get_env("GROQ_API_KEY")
-    return Groq(api_key=api_key)
+    return clients.groq_client()
+
+
+_run_store_lock = threading.Lock()
+_run_store: GapRunStore | None = None
+
+
+def _get_run_store() -> GapRunStore | None:
+    """Shared run store; GAP_RUN_STORE_PATH=off disables memoization."""
+    global _run_store
+    path = os.environ.get("GAP_RUN_STORE_PATH", ".cache/gap_runs.sqlite3").strip()
+    if not path or path.lower() == "off":
+        return None
+    with _run_store_lock:
+        if _run_store is None:
+            _run_store = GapRunStore(path)
+        return _run_store
+
+
+_gap_writer_lock = threading.Lock()
+_gap_writer: WriteBehindBuffer | None = None
+
+
+def _get_gap_writer() -> WriteBehindBuffer | None:
+    """Shared gap_skills write-behind buffer; GAP_WRITE_BEHIND=1 enables it."""
+    global _gap_writer
+    if os.environ.get("GAP_WRITE_BEHIND", "0").strip() != "1":
+        return None
+    with _gap_writer_lock:
+        if _gap_writer is None:
+            _gap_writer = WriteBehindBuffer(
+                _write_gap_rows,
+                name="gap_skills",
+                max_rows=int(os.environ.get("WRITE_BEHIND_MAX_ROWS") or BULK_INSERT_CHUNK),
+                max_delay_s=float(os.environ.get("WRITE_BEHIND_MAX_DELAY_S") or DEFAULT_MAX_DELAY_S),
+                on_failure=_forget_failed_runs,
+            )
+            atexit.register(_gap_writer.close)
+        return _gap_writer
+
+
+def _reuse_previous(previous: dict[str, Any]) -> dict[str, Any]:
+    result = dict(previous["result"])
+    result["gap_skills_inserted"] = 0
+    result["reused"] = True
+    return result
 
 
 # ---------------------------------------------------------------------------
@@ -63,6 +119,12 @@ Return ONLY a valid JSON array of missing skill names:
 If no skills are missing, return: []"""
 
 
+DEFAULT_PROMPT_TOKEN_BUDGET = 3000
+
+# Market skills per request never get less room than this, however long the resume
+MIN_MARKET_CHUNK_TOKENS = 200
+
+
 def _build_prompt(resume_skills: list[str], market_skills: list[str]) -> str:
     resume_text = "\n".join(resume_skills) if resume_skills else "(none)"
     market_text = "\n".join(market_skills) if market_skills else "(none)"
@@ -72,34 +134,228 @@ def _build_prompt(resume_skills: list[str], market_skills: list[str]) -> str:
     )
 
 
+def _prompt_token_budget() -> int:
+    value = os.environ.get("GAP_PROMPT_TOKENS", "").strip()
+    return int(value) if value else DEFAULT_PROMPT_TOKEN_BUDGET
+
+
+def _build_prompts(resume_skills: list[str], market_skills: list[str]) -> list[str]:
+    """
+    Prompts for de-duplicated skill lists, each within the token budget.
+
+    Every prompt carries the whole resume (any resume skill may cover any
+    market skill); the market skills are split across prompts as needed.
+    """
+    resume = dedupe(resume_skills, key=skill_key)
+    market = dedupe(market_skills, key=skill_key)
+    budget = _prompt_token_budget()
+    overhead = estimate_tokens(SKILL_GAP_SYSTEM) + estimate_tokens(_build_prompt(resume, []))
+    room = budget - overhead
+    if room < MIN_MARKET_CHUNK_TOKENS:
+        logger.warning(
+            "Instructions and resume skills use %d of %d prompt tokens; prompts will exceed the budget",
+            overhead,
+            budget,
+        )
+        room = MIN_MARKET_CHUNK_TOKENS
+    chunks = chunk_to_budget(market, room)
+    if len(chunks) > 1:
+        metrics.inc("prompt_chunks_total", len(chunks), kind="gap_market_skills")
+    return [_build_prompt(resume, chunk) for chunk in chunks]
+
+
 # ---------------------------------------------------------------------------
 # Supabase queries
 # ---------------------------------------------------------------------------
 
-def _fetch_resume_skills(supabase: Client, user_id: str) -> list[str]:
-    resp = supabase.table("skills").select("skill_name").eq("user_id", user_id).eq("source", "resume").execute()
-    rows = resp.data or []
-    names = [r["skill_name"] for r in rows if r.get("skill_name")]
-    return list(dict.fromkeys(names))
+def _fetch_user_skills(supabase: Client, user_id: str) -> tuple[list[str], list[str]]:
+    """Resume and market skills for one user in a single query."""
+    resp = (
+        supabase.table("skills")
+        .select("source,skill_name")
+        .eq("user_id", user_id)
+        .in_("source", ["resume", "market"])
+        .execute()
+    )
+    resume: list[str] = []
+    market: list[str] = []
+    for r in resp.data or []:
+        name = r.get("skill_name")
+        if not name:
+            continue
+        if r.get("source") == "resume":
+            resume.append(name)
+        elif r.get("source") == "market":
+            market.append(name)
+    return list(dict.fromkeys(resume)), list(dict.fromkeys(market))
 
 
-def _fetch_market_skills(supabase: Client, user_id: str) -> list[str]:
-    resp = supabase.table("skills").select("skill_name").eq("user_id", user_id).eq("source", "market").execute()
-    rows = resp.data or []
-    names = [r["skill_name"] for r in rows if r.get("skill_name")]
-    return list(dict.fromkeys(names))
+def _gap_rows(user_id: str, run_id: str, skill_names: list[str]) -> list[dict[str, Any]]:
+    return [
+        {"user_id": user_id, "skill_name": name, "run_id": run_id, "priority": None}
+        for name in skill_names
+    ]
 
 
 def _insert_gap_skills(supabase: Client, user_id: str, run_id: str, skill_names: list[str]) -> None:
     if not skill_names:
         return
-    rows = [
-        {"user_id": user_id, "skill_name": name, "run_id": run_id, "priority": None}
-        for name in skill_names
-    ]
+    rows = _gap_rows(user_id, run_id, skill_names)
+    writer = _get_gap_writer()
+    if writer is not None:
+        writer.add(rows)
+        return
     supabase.table("gap_skills").insert(rows).execute()
 
 
+# Bulk variants used by analyze_skill_gaps_batch. PostgREST caps a response at
+# 1000 rows by default, so reads are paged; user ids are chunked to keep the
+# `in.(...)` filter within URL length limits.
+BULK_USER_CHUNK = 100
+BULK_PAGE_SIZE = 1000
+BULK_INSERT_CHUNK = 500
+
+
+def _chunks(items: list[Any], size: int) -> Iterable[list[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _fetch_skills_bulk(supabase: Client, user_ids: list[str]) -> dict[str, dict[str, list[str]]]:
+    """Fetch resume and market skills for many users, keyed by user_id then source."""
+    by_user: dict[str, dict[str, list[str]]] = {
+        uid: {"resume": [], "market": []} for uid in user_ids
+    }
+    for chunk in _chunks(user_ids, BULK_USER_CHUNK):
+        offset = 0
+        while True:
+            resp = (
+                supabase.table("skills")
+                .select("user_id,source,skill_name")
+                .in_("user_id", chunk)
+                .in_("source", ["resume", "market"])
+                .order("id")
+                .range(offset, offset + BULK_PAGE_SIZE - 1)
+                .execute()
+            )
+            rows = resp.data or []
+            for r in rows:
+                name = r.get("skill_name")
+                bucket = by_user.get(r.get("user_id"), {}).get(r.get("source"))
+                if name and bucket is not None:
+                    bucket.append(name)
+            if len(rows) < BULK_PAGE_SIZE:
+                break
+            offset += BULK_PAGE_SIZE
+
+    for sources in by_user.values():
+        for source, names in sources.items():
+            sources[source] = list(dict.fromkeys(names))
+    return by_user
+
+
+def _fetch_dream_roles_bulk(supabase: Client, user_ids: list[str]) -> dict[str, str]:
+    """dream_role per user_id (users without a profile or role are omitted)."""
+    roles: dict[str, str] = {}
+    for chunk in _chunks(user_ids, BULK_USER_CHUNK):
+        resp = (
+            supabase.table("profiles")
+            .select("user_id,dream_role")
+            .in_("user_id", chunk)
+            .execute()
+        )
+        for r in resp.data or []:
+            role = (r.get("dream_role") or "").strip()
+            if role:
+                roles[r["user_id"]] = role
+    return roles
+
+
+def _runs_with_rows(supabase: Client, run_ids: list[str]) -> set[str]:
+    """The run_ids that have at least one gap_skills row."""
+    found: set[str] = set()
+    for chunk in _chunks(run_ids, BULK_USER_CHUNK):
+        offset = 0
+        while True:
+            resp = (
+                supabase.table("gap_skills")
+                .select("run_id")
+                .in_("run_id", chunk)
+                .order("id")
+                .range(offset, offset + BULK_PAGE_SIZE - 1)
+                .execute()
+            )
+            rows = resp.data or []
+            found.update(r["run_id"] for r in rows)
+            if len(rows) < BULK_PAGE_SIZE:
+                break
+            offset += BULK_PAGE_SIZE
+    return found
+
+
+def _live_runs(supabase: Client, previous: list[dict[str, Any]]) -> set[str]:
+    """
+    run_ids of the given stored runs that can still be reused: runs without
+    gaps, and runs whose gap_skills rows still exist (the profile function
+    deletes a user's gap_skills when the profile changes).
+    """
+    live = {p["run_id"] for p in previous if not p["result"].get("missing_skills")}
+    needed = [p["run_id"] for p in previous if p["run_id"] not in live]
+    if needed:
+        found = _runs_with_rows(supabase, needed)
+        writer = _get_gap_writer()
+        if writer is not None and len(found) < len(needed):
+            writer.flush()  # rows of a recent run may still be queued
+            found = _runs_with_rows(supabase, needed)
+        live |= found
+    return live
+
+
+def _insert_gap_skills_bulk(supabase: Client, rows: list[dict[str, Any]], chunk_size: int = BULK_INSERT_CHUNK) -> None:
+    for chunk in _chunks(rows, chunk_size):
+        supabase.table("gap_skills").insert(chunk).execute()
+
+
+def _write_gap_rows(rows: list[dict[str, Any]], retry: bool) -> None:
+    """Write-behind flush; a retry first clears its runs so no row is inserted twice."""
+    supabase = _supabase_client()
+    if retry:
+        run_ids = sorted({r["run_id"] for r in rows})
+        for chunk in _chunks(run_ids, BULK_USER_CHUNK):
+            supabase.table("gap_skills").delete().in_("run_id", chunk).execute()
+    _insert_gap_skills_bulk(supabase, rows)
+
+
+# run_ids whose write-behind rows were given up on, for batches to report;
+# bounded since single runs never collect theirs
+FAILED_RUNS_MAX = 10000
+_failed_runs_lock = threading.Lock()
+_failed_runs: OrderedDict[str, None] = OrderedDict()
+
+
+def _forget_failed_runs(rows: list[dict[str, Any]]) -> None:
+    """Drop runs whose rows never reached gap_skills, so they are not reused."""
+    store = _get_run_store()
+    for user_id, run_id in {(r["user_id"], r["run_id"]) for r in rows}:
+        if store:
+            store.discard(user_id, run_id)
+        with _failed_runs_lock:
+            _failed_runs[run_id] = None
+            while len(_failed_runs) > FAILED_RUNS_MAX:
+                _failed_runs.popitem(last=False)
+
+
+def _take_failed_runs(run_ids: Iterable[str]) -> set[str]:
+    """The given run_ids whose rows failed to write (each reported once)."""
+    failed = set()
+    with _failed_runs_lock:
+        for run_id in run_ids:
+            if run_id in _failed_runs:
+                del _failed_runs[run_id]
+                failed.add(run_id)
+    return failed
+
+
 # ---------------------------------------------------------------------------
 # Groq & JSON parsing
 # ---------------------------------------------------------------------------
@@ -107,47 +363,92 @@ def _insert_gap_skills(supabase: Client, user_id: str, run_id: str, skill_names:
 DEFAULT_MODEL = "llama-3.3-70b-versatile"
 
 
+def _skill_names(items: Iterable[Any]) -> list[str]:
+    result = []
+    for item in items:
+        if isinstance(item, str) and item.strip():
+            result.append(item.strip())
+        elif isinstance(item, (int, float)):
+            result.append(str(item).strip())
+    return result
+
+
 def _parse_missing_skills_json(raw: str) -> list[str]:
-    """Parse LLM response into a list of skill names. Handles markdown code blocks."""
+    """
+    Parse LLM response into a list of skill names. Handles markdown code
+    blocks, prose and the structured-output object; malformed JSON is
+    repaired locally where possible, else MalformedReply is raised.
+    """
     text = raw.strip()
     if not text:
         return []
+    return _skill_names(parse_json_lenient(text, source="groq"))
 
-    # Strip optional markdown code block
-    if text.startswith("```"):
-        lines = text.split("\n")
-        if lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].strip() == "```":
-            lines = lines[:-1]
-        text = "\n".join(lines)
 
-    try:
-        parsed: Any = json.loads(text)
-    except json.JSONDecodeError as e:
-        logger.warning("Invalid JSON from LLM: %s", e)
-        raise ValueError(f"LLM returned invalid JSON: {e}") from e
+# Groq's JSON mode only produces objects, so the array is wrapped in one
+STRUCTURED_OUTPUT_INSTRUCTION = (
+    'Respond with a JSON object of the form {"missing_skills": ["skill1", "skill2"]}.'
+)
 
-    if not isinstance(parsed, list):
-        raise ValueError("LLM response is not a JSON array")
+RETRY_INSTRUCTION = (
+    "Your previous reply could not be parsed as JSON ({error}). Reply again with "
+    "ONLY the JSON, no markdown and no other text."
+)
+
+# Models that rejected response_format; they are asked for plain text instead
+_structured_rejected: set[str] = set()
 
-    result = []
-    for item in parsed:
-        if isinstance(item, str) and item.strip():
-            result.append(item.strip())
-        elif isinstance(item, (int, float)):
-            result.append(str(item).strip())
-    return result
 
+def _structured_output(model: str) -> bool:
+    enabled = os.environ.get("GAP_STRUCTURED_OUTPUT", "1").strip() != "0"
+    return enabled and model not in _structured_rejected
 
-def _call_groq(client: Groq, prompt: str, model: str = DEFAULT_MODEL) -> str:
+
+def _request(
+    prompt: str,
+    structured: bool,
+    retry: MalformedReply | None = None,
+) -> tuple[list[dict[str, str]], dict[str, Any]]:
+    """Chat messages and extra create() arguments for one gap request."""
+    system = SKILL_GAP_SYSTEM
+    if structured:
+        system += "\n" + STRUCTURED_OUTPUT_INSTRUCTION
     messages = [
-        {"role": "system", "content": SKILL_GAP_SYSTEM},
+        {"role": "system", "content": system},
         {"role": "user", "content": prompt},
     ]
-    completion = client.chat.completions.create(
-        messages=messages,
-        model=model,
+    if retry is not None:
+        messages.append({"role": "assistant", "content": retry.text})
+        messages.append({"role": "user", "content": RETRY_INSTRUCTION.format(error=retry)})
+    kwargs = {"response_format": {"type": "json_object"}} if structured else {}
+    return messages, kwargs
+
+
+def _call_groq(
+    client: Groq,
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    *,
+    structured: bool = False,
+    retry: MalformedReply | None = None,
+) -> str:
+    messages, kwargs = _request(prompt, structured, retry)
+    try:
+        with metrics.stage("gap", "llm"):
+            completion = client.chat.completions.create(
+                messages=messages,
+                model=model,
+                **kwargs,
+            )
+    except Exception:
+        metrics.record_llm("groq", ok=False)
+        raise
+    usage = getattr(completion, "usage", None)
+    metrics.record_llm(
+        "groq",
+        ok=True,
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
     )
     if not completion.choices:
         raise ValueError("Groq API returned no choices")
@@ -157,40 +458,357 @@ def _call_groq(client: Groq, prompt: str, model: str = DEFAULT_MODEL) -> str:
     return msg.content
 
 
+def _stream_enabled() -> bool:
+    return os.environ.get("GAP_LLM_STREAM", "0").strip() == "1"
+
+
+def _stream_groq(
+    client: Groq,
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    *,
+    structured: bool = False,
+) -> Iterator[Any]:
+    """
+    Stream a completion and yield the elements of its JSON array as they
+    complete. The stream is closed at the closing bracket, so anything the
+    model would write after the array is never generated. If the reply
+    turns out malformed, the rest is read and repaired locally and the
+    remaining elements are yielded (or MalformedReply is raised).
+    """
+    messages, kwargs = _request(prompt, structured)
+    start = time.perf_counter()
+    received: list[str] = []
+    usage = None
+    stream = None
+
+    def deltas() -> Iterator[str]:
+        nonlocal usage
+        for chunk in stream:
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(x_groq, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                received.append(chunk.choices[0].delta.content)
+                yield received[-1]
+
+    try:
+        with metrics.stage("gap", "llm"):
+            stream = client.chat.completions.create(messages=messages, model=model, stream=True, **kwargs)
+            chunks = deltas()
+            yielded = 0
+            try:
+                for item in iter_json_array(chunks):
+                    if yielded == 0:
+                        metrics.observe("llm_first_item_seconds", time.perf_counter() - start, provider="groq")
+                    yielded += 1
+                    yield item
+            except ValueError:
+                for _ in chunks:
+                    pass
+                yield from parse_json_lenient("".join(received), source="groq")[yielded:]
+    except MalformedReply:
+        # The request itself succeeded; the caller decides about a retry
+        metrics.record_llm("groq", ok=True)
+        raise
+    except Exception:
+        metrics.record_llm("groq", ok=False)
+        raise
+    finally:
+        if stream is not None and hasattr(stream, "close"):
+            stream.close()
+    # Usage arrives with the last chunk, which an early stop never reads;
+    # fall back to local estimates then.
+    metrics.record_llm(
+        "groq",
+        ok=True,
+        prompt_tokens=getattr(usage, "prompt_tokens", None)
+        or sum(estimate_tokens(m["content"]) for m in messages),
+        completion_tokens=getattr(usage, "completion_tokens", None) or estimate_tokens("".join(received)),
+    )
+
+
+def _request_missing_skills(client: Groq, prompt: str, model: str) -> list[str]:
+    """
+    Missing skills for one prompt: structured output where the model
+    supports it, local repair of malformed replies, and then at most one
+    retry that shows the model its unparsable reply.
+    """
+    structured = _structured_output(model)
+    try:
+        if _stream_enabled():
+            return _skill_names(_stream_groq(client, prompt, model=model, structured=structured))
+        raw_response = _call_groq(client, prompt, model=model, structured=structured)
+        with metrics.stage("gap", "parse"):
+            return _parse_missing_skills_json(raw_response)
+    except MalformedReply as e:
+        metrics.inc("retries_total", reason="parse")
+        logger.warning("Unparsable Groq reply (%s); retrying once", e)
+        raw_response = _call_groq(client, prompt, model=model, structured=structured, retry=e)
+        with metrics.stage("gap", "parse"):
+            return _parse_missing_skills_json(raw_response)
+    except Exception as e:
+        if not structured or "response_format" not in str(e).lower():
+            raise
+        logger.warning("Groq model %s rejected response_format; using plain replies", model)
+        _structured_rejected.add(model)
+        return _request_missing_skills(client, prompt, model)
+
+
+# ---------------------------------------------------------------------------
+# Matching modes
+# ---------------------------------------------------------------------------
+
+# llm: Groq decides ambiguous matches; errors propagate.
+# fallback: as llm, but failed Groq calls fall back to the local matcher;
+#   configuration and auth errors (no API key, rejected key, unknown model)
+#   still propagate.
+# offline: local matcher only, no network calls besides Supabase.
+MATCH_MODES = ("llm", "fallback", "offline")
+DEFAULT_MATCH_MODE = "llm"
+
+# Groq errors that a local guess must not hide: bad key, no access, bad model
+_CONFIG_ERROR_STATUS = (401, 403, 404)
+_CONFIG_ERROR_TYPES = ("AuthenticationError", "PermissionDeniedError", "NotFoundError")
+
+
+def _match_mode() -> str:
+    mode = os.environ.get("GAP_MATCH_MODE", DEFAULT_MATCH_MODE).strip().lower() or DEFAULT_MATCH_MODE
+    if mode not in MATCH_MODES:
+        raise ValueError(f"GAP_MATCH_MODE must be one of {', '.join(MATCH_MODES)}, got {mode!r}")
+    return mode
+
+
+def _match_threshold() -> float | None:
+    value = os.environ.get("GAP_MATCH_THRESHOLD", "").strip()
+    return float(value) if value else None
+
+
+def _is_config_error(exc: BaseException) -> bool:
+    if getattr(exc, "status_code", None) in _CONFIG_ERROR_STATUS:
+        return True
+    return any(cls.__name__ in _CONFIG_ERROR_TYPES for cls in type(exc).__mro__)
+
+
+def _offline_matcher() -> str:
+    """Name recorded for local-matcher results (part of the run fingerprint)."""
+    threshold = _match_threshold()
+    return "ngram-tfidf" if threshold is None else f"ngram-tfidf@{threshold}"
+
+
+def _offline_missing(resume_skills: list[str], market_skills: list[str]) -> list[str]:
+    # Imported here so NumPy only loads when the local matcher is used
+    from .semantic_match import DEFAULT_THRESHOLD, semantic_match
+
+    threshold = _match_threshold()
+    with metrics.stage("gap", "local_match"):
+        match = semantic_match(
+            resume_skills,
+            market_skills,
+            threshold=DEFAULT_THRESHOLD if threshold is None else threshold,
+        )
+    return match.missing
+
+
+def _compute_missing_skills(
+    groq_client: Callable[[], Groq],
+    resume_skills: list[str],
+    market_skills: list[str],
+    model: str,
+    mode: str = "llm",
+) -> tuple[list[str], str]:
+    """
+    Pre-match locally, then resolve the ambiguous market skills with Groq or
+    the local matcher depending on ``mode``.
+
+    Returns the missing skills and the matcher that produced them (the Groq
+    model or the offline matcher name).
+    """
+    matcher = _offline_matcher() if mode == "offline" else model
+    match = prematch_skills(resume_skills, market_skills)
+    logger.debug(
+        "Local pre-match: matched=%d missing=%d ambiguous=%d",
+        len(match.matched),
+        len(match.missing),
+        len(match.ambiguous),
+    )
+    if not match.ambiguous:
+        return match.missing, matcher
+
+    if mode == "offline":
+        return match.missing + _offline_missing(resume_skills, match.ambiguous), matcher
+
+    # Outside the fallback: a missing GROQ_API_KEY is a configuration error
+    client = groq_client()
+    try:
+        with metrics.stage("gap", "prompt_build"):
+            prompts = _build_prompts(resume_skills, match.ambiguous)
+        missing: list[str] = []
+        for prompt in prompts:
+            missing.extend(_request_missing_skills(client, prompt, model))
+        return match.missing + dedupe(missing, key=skill_key), matcher
+    except Exception as e:
+        metrics.inc("failures_total", pipeline="gap", stage="llm")
+        if mode != "fallback" or _is_config_error(e):
+            raise
+        logger.warning("Groq matching failed; falling back to local matcher", exc_info=True)
+        return match.missing + _offline_missing(resume_skills, match.ambiguous), _offline_matcher()
+
+
+def _groq_model() -> str:
+    return os.environ.get("GROQ_MODEL", DEFAULT_MODEL).strip() or DEFAULT_MODEL
+
+
+# ---------------------------------------------------------------------------
+# Incremental runs
+# ---------------------------------------------------------------------------
+
+# Above this share of changed skills a full run is cheaper to reason about
+# than a delta, and is done instead.
+INCREMENTAL_MAX_DELTA_RATIO = 0.5
+
+
+def _incremental_enabled() -> bool:
+    return os.environ.get("GAP_INCREMENTAL", "1").strip().lower() not in ("0", "false", "off")
+
+
+def _keys(skills: list[str]) -> set[str]:
+    return {k for k in map(skill_key, skills) if k}
+
+
+def _incremental_missing_skills(
+    previous: dict[str, Any],
+    resume_skills: list[str],
+    market_skills: list[str],
+    model: str,
+    mode: str,
+    matcher: str,
+) -> tuple[list[str], str] | None:
+    """
+    Derive the missing skills from the previous run and the skill deltas.
+
+    - market skills added since the previous run are checked against the
+      whole resume;
+    - previously missing skills still in the market set are re-checked only
+      against resume skills added since, since the older ones did not cover
+      them;
+    - removed market skills simply drop out.
+
+    Returns None when a full run is needed instead: no usable previous run,
+    a different matcher, resume skills removed (a previously matched skill
+    may have lost its only cover), or too large a delta.
+    """
+    prev_result = previous.get("result") or {}
+    if prev_result.get("matcher") != matcher or "missing_skills" not in prev_result:
+        return None
+
+    prev_resume = _keys(previous.get("resume_skills") or [])
+    prev_market = _keys(previous.get("market_skills") or [])
+    resume_keys = _keys(resume_skills)
+    if prev_resume - resume_keys:
+        return None
+
+    added_resume = [s for s in resume_skills if skill_key(s) not in prev_resume]
+    added_market = [s for s in market_skills if skill_key(s) not in prev_market]
+    changed = len(added_resume) + len(added_market) + len(prev_market - _keys(market_skills))
+    total = len(resume_keys | prev_resume) + len(_keys(market_skills) | prev_market)
+    if changed > INCREMENTAL_MAX_DELTA_RATIO * max(total, 1):
+        return None
+
+    prev_missing = _keys(prev_result["missing_skills"])
+    still_missing = [s for s in market_skills if skill_key(s) in prev_missing]
+    logger.debug(
+        "Incremental run: +resume=%d +market=%d recheck=%d",
+        len(added_resume),
+        len(added_market),
+        len(still_missing) if added_resume else 0,
+    )
+
+    used = matcher
+    if added_resume and still_missing:
+        still_missing, used_recheck = _compute_missing_skills(
+            _groq_client, added_resume, still_missing, model, mode
+        )
+        if used_recheck != matcher:
+            used = used_recheck
+
+    newly_missing: list[str] = []
+    if added_market:
+        newly_missing, used_added = _compute_missing_skills(
+            _groq_client, resume_skills, added_market, model, mode
+        )
+        if used_added != matcher:
+            used = used_added
+
+    missing = set(map(skill_key, still_missing + newly_missing))
+    return [s for s in market_skills if skill_key(s) in missing], used
+
+
 # ---------------------------------------------------------------------------
 # Main API
 # ---------------------------------------------------------------------------
 
-def analyze_skill_gaps(user_id: str) -> dict[str, Any]:
+def analyze_skill_gaps(user_id: str, *, force: bool = False) -> dict[str, Any]:
     """
     Run skill gap analysis for a user.
 
     1. Fetches resume and market skills from Supabase.
-    2. Calls Groq to identify missing market skills.
+    2. Resolves trivial matches locally, then calls Groq to identify which of
+       the remaining market skills are missing (skipped if none remain).
+       GAP_MATCH_MODE selects llm (default), fallback (local matcher when
+       a Groq call fails) or offline (local matcher only).
     3. Inserts results into gap_skills with a new run_id.
 
+    If the normalized resume and market skill sets match the user's previous
+    run and its gap_skills rows still exist, steps 2-3 are skipped and the
+    previous result is returned with reused=True (pass force=True to always
+    recompute). If they changed only
+    a little, step 2 is limited to the added skills and the result is
+    derived from the previous run (GAP_INCREMENTAL=0 disables this).
+
+    Concurrent calls for the same user and force flag, in this process or
+    another one (util.singleflight, also used by analyze_skill_gaps_batch),
+    share a single run and its result.
+
     Returns a dict with:
-        - run_id: UUID for this run
+        - run_id: UUID for this run (the previous run's id when reused)
         - resume_skills_count: number of resume skills
         - market_skills_count: number of market skills
         - missing_skills: list of missing skill names
-        - gap_skills_inserted: number of rows inserted
+        - gap_skills_inserted: number of rows inserted (queued when
+          GAP_WRITE_BEHIND=1 defers writes to a background buffer)
+        - reused: whether the previous run's result was returned
+        - matcher: Groq model or local matcher that decided the matches
+        - parent_run_id: run this one was derived from incrementally, or None
 
     Raises:
         ValueError: missing env vars, invalid user_id, or invalid LLM response
-        Exception: Supabase or Groq API errors
+            (with GAP_MATCH_MODE=fallback, an invalid response falls back to
+            the local matcher instead)
+        Exception: Supabase or Groq API errors (with fallback, only
+            configuration and auth errors)
     """
     if not user_id or not str(user_id).strip():
         raise ValueError("user_id is required")
 
     user_id = str(user_id).strip()
+    return singleflight.do(
+        "gap", _flight_key(user_id, force), lambda: _analyze_skill_gaps(user_id, force=force)
+    )
+
+
+def _flight_key(user_id: str, force: bool) -> str:
+    # A forced run must not be answered by a non-forced one already in flight
+    return f"{user_id}:force" if force else user_id
+
+
+def _analyze_skill_gaps(user_id: str, *, force: bool) -> dict[str, Any]:
     run_id = str(uuid.uuid4())
 
     logger.info("Starting skill gap analysis for user_id=%s run_id=%s", user_id, run_id)
 
     supabase = _supabase_client()
-    resume_skills = _fetch_resume_skills(supabase, user_id)
-    market_skills = _fetch_market_skills(supabase, user_id)
+    with metrics.stage("gap", "supabase_fetch"):
+        resume_skills, market_skills = _fetch_user_skills(supabase, user_id)
 
     logger.debug(
         "Fetched skills: resume=%d market=%d",
@@ -207,25 +825,55 @@ def analyze_skill_gaps(user_id: str) -> dict[str, Any]:
             "market_skills_count": 0,
             "missing_skills": [],
             "gap_skills_inserted": 0,
+            "reused": False,
+            "matcher": None,
+            "parent_run_id": None,
         }
 
-    # Edge case: no resume skills → LLM can still run (all market skills are "missing")
-    prompt = _build_prompt(resume_skills, market_skills)
-    model = os.environ.get("GROQ_MODEL", DEFAULT_MODEL).strip() or DEFAULT_MODEL
+    model = _groq_model()
+    mode = _match_mode()
+    matcher = _offline_matcher() if mode == "offline" else model
+    fingerprint = skills_fingerprint(resume_skills, market_skills, matcher)
+    store = _get_run_store()
+    previous = store.latest(user_id) if store else None
+    reusable = bool(previous and previous["fingerprint"] == fingerprint and not force)
+    if reusable and previous["run_id"] not in _live_runs(supabase, [previous]):
+        logger.info("gap_skills rows of run_id=%s are gone; recomputing", previous["run_id"])
+        reusable = False
+    if store:
+        metrics.record_cache("gap_runs", "hit" if reusable else "miss")
+    if reusable:
+        logger.info(
+            "Skill sets unchanged for user_id=%s; reusing run_id=%s",
+            user_id,
+            previous["run_id"],
+        )
+        return _reuse_previous(previous)
 
+    # Trivial matches are resolved locally; Groq only sees the ambiguous rest.
+    # Edge case: no resume skills → every market skill is missing, no LLM call.
+    # With a compatible previous run only the skill delta is analyzed.
     try:
-        raw_response = _call_groq(_groq_client(), prompt, model=model)
-    except Exception as e:
-        logger.exception("Groq API call failed for user_id=%s", user_id)
-        raise
-
-    try:
-        missing_skills = _parse_missing_skills_json(raw_response)
-    except ValueError as e:
+        derived = None
+        if previous and not force and _incremental_enabled():
+            derived = _incremental_missing_skills(
+                previous, resume_skills, market_skills, model, mode, matcher
+            )
+        if derived is not None:
+            missing_skills, used = derived
+        else:
+            missing_skills, used = _compute_missing_skills(
+                _groq_client, resume_skills, market_skills, model, mode
+            )
+    except ValueError:
         logger.exception("Failed to parse LLM response for user_id=%s", user_id)
         raise
+    except Exception:
+        logger.exception("Groq API call failed for user_id=%s", user_id)
+        raise
 
-    _insert_gap_skills(supabase, user_id, run_id, missing_skills)
+    with metrics.stage("gap", "insert"):
+        _insert_gap_skills(supabase, user_id, run_id, missing_skills)
     inserted = len(missing_skills)
 
     logger.info(
@@ -236,10 +884,280 @@ def analyze_skill_gaps(user_id: str) -> dict[str, Any]:
         inserted,
     )
 
-    return {
+    result = {
         "run_id": run_id,
         "resume_skills_count": len(resume_skills),
         "market_skills_count": len(market_skills),
         "missing_skills": missing_skills,
         "gap_skills_inserted": inserted,
+        "reused": False,
+        "matcher": used,
+        "parent_run_id": previous["run_id"] if derived is not None else None,
+    }
+    if store:
+        # A fallback result is fingerprinted under the local matcher so the
+        # next run with Groq available recomputes it.
+        if used != matcher:
+            fingerprint = skills_fingerprint(resume_skills, market_skills, used)
+        store.save(user_id, fingerprint, result, resume_skills, market_skills)
+    return result
+
+
+DEFAULT_BATCH_CONCURRENCY = 4
+
+
+def analyze_skill_gaps_batch(
+    user_ids: Iterable[str],
+    *,
+    max_workers: int = DEFAULT_BATCH_CONCURRENCY,
+    insert_chunk_size: int = BULK_INSERT_CHUNK,
+    force: bool = False,
+) -> dict[str, dict[str, Any]]:
+    """
+    Run skill gap analysis for many users in one pass.
+
+    Skills for all users are fetched with a few bulk queries, Groq calls run on
+    a pool of at most ``max_workers`` threads, and gap_skills rows are written
+    in chunked bulk inserts. Each user gets its own run_id; users whose skill
+    sets are unchanged since their previous run reuse it (see analyze_skill_gaps).
+    Each user's run is coalesced with concurrent analyze_skill_gaps calls for
+    the same user (util.singleflight).
+
+    Returns a dict keyed by user_id. Successful entries have the same shape as
+    analyze_skill_gaps(); failed entries, including runs whose gap_skills rows
+    could not be written, are ``{"error": "<message>"}`` and do not abort the
+    rest of the batch. With GAP_WRITE_BEHIND=1 the shared buffer is flushed
+    before returning, so rows are written (or reported failed) by then.
+
+    Raises:
+        ValueError: missing env vars
+        Exception: Supabase errors during the bulk fetch
+    """
+    ids = list(dict.fromkeys(str(u).strip() for u in user_ids if u and str(u).strip()))
+    if not ids:
+        return {}
+    if max_workers < 1:
+        raise ValueError("max_workers must be >= 1")
+
+    logger.info("Starting batch skill gap analysis for %d users", len(ids))
+
+    supabase = _supabase_client()
+    with metrics.stage("gap", "supabase_fetch"):
+        skills_by_user = _fetch_skills_bulk(supabase, ids)
+    model = _groq_model()
+    mode = _match_mode()
+    matcher = _offline_matcher() if mode == "offline" else model
+
+    store = _get_run_store()
+
+    # Reusable candidates are checked against gap_skills in bulk up front
+    candidates = []
+    if store and not force:
+        for user_id in ids:
+            sources = skills_by_user[user_id]
+            previous = store.latest(user_id) if sources["market"] else None
+            if previous and previous["fingerprint"] == skills_fingerprint(
+                sources["resume"], sources["market"], matcher
+            ):
+                candidates.append(previous)
+    live_runs = _live_runs(supabase, candidates) if candidates else set()
+
+    def analyze_one(user_id: str) -> dict[str, Any]:
+        resume_skills = skills_by_user[user_id]["resume"]
+        market_skills = skills_by_user[user_id]["market"]
+        missing_skills: list[str] = []
+        used = matcher
+        derived = None
+        previous = None
+        if market_skills:
+            fingerprint = skills_fingerprint(resume_skills, market_skills, matcher)
+            previous = store.latest(user_id) if store else None
+            reusable = bool(
+                previous
+                and previous["fingerprint"] == fingerprint
+                and previous["run_id"] in live_runs
+                and not force
+            )
+            if store:
+                metrics.record_cache("gap_runs", "hit" if reusable else "miss")
+            if reusable:
+                return _reuse_previous(previous)
+            if previous and not force and _incremental_enabled():
+                derived = _incremental_missing_skills(
+                    previous, resume_skills, market_skills, model, mode, matcher
+                )
+            if derived is not None:
+                missing_skills, used = derived
+            else:
+                missing_skills, used = _compute_missing_skills(
+                    _groq_client, resume_skills, market_skills, model, mode
+                )
+        return {
+            "run_id": str(uuid.uuid4()),
+            "resume_skills_count": len(resume_skills),
+            "market_skills_count": len(market_skills),
+            "missing_skills": missing_skills,
+            "gap_skills_inserted": 0,
+            "reused": False,
+            "matcher": used,
+            "parent_run_id": previous["run_id"] if derived is not None else None,
+        }
+
+    # Rows go through the shared write-behind buffer if enabled, else through
+    # one local to this batch, which bulk-inserts them. Either is drained
+    # below so write failures are reported per user.
+    writer = _get_gap_writer()
+    batch_writer = None
+    if writer is None:
+        batch_writer = writer = WriteBehindBuffer(
+            _write_gap_rows,
+            name="gap_skills_batch",
+            max_rows=insert_chunk_size,
+            on_failure=_forget_failed_runs,
+        )
+
+    def run_one(user_id: str) -> dict[str, Any]:
+        result = analyze_one(user_id)
+        if result["reused"]:
+            return result
+        if result["missing_skills"]:
+            # One group per run, so a retried flush never splits a run
+            writer.add(_gap_rows(user_id, result["run_id"], result["missing_skills"]))
+        result["gap_skills_inserted"] = len(result["missing_skills"])
+        if store and result["market_skills_count"]:
+            sources = skills_by_user[user_id]
+            store.save(
+                user_id,
+                skills_fingerprint(sources["resume"], sources["market"], result["matcher"]),
+                result,
+                sources["resume"],
+                sources["market"],
+            )
+        return result
+
+    results: dict[str, dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            user_id: pool.submit(
+                singleflight.do, "gap", _flight_key(user_id, force), lambda u=user_id: run_one(u)
+            )
+            for user_id in ids
+        }
+        for user_id, future in futures.items():
+            try:
+                results[user_id] = future.result()
+            except Exception as e:
+                logger.exception("Skill gap analysis failed for user_id=%s", user_id)
+                metrics.inc("failures_total", pipeline="gap", stage="run")
+                results[user_id] = {"error": str(e)}
+
+    with metrics.stage("gap", "insert"):
+        if batch_writer is not None:
+            batch_writer.close()
+        else:
+            writer.flush()
+    failed_runs = _take_failed_runs(
+        r["run_id"] for r in results.values() if "error" not in r and not r["reused"]
+    )
+    for user_id, result in results.items():
+        if result.get("run_id") in failed_runs:
+            results[user_id] = {"error": "Failed to write gap_skills rows"}
+
+    inserted = sum(
+        r["gap_skills_inserted"] for r in results.values() if "error" not in r and not r["reused"]
+    )
+    failed = sum(1 for r in results.values() if "error" in r)
+    logger.info(
+        "Batch skill gap analysis complete users=%d failed=%d inserted=%d",
+        len(ids),
+        failed,
+        inserted,
+    )
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Cohort analytics
+# ---------------------------------------------------------------------------
+
+def cohort_gap_report(user_ids: Iterable[str], *, top: int = 20) -> dict[str, Any]:
+    """
+    Gap statistics for a whole cohort, computed on skill bitsets.
+
+    Each user's gaps are their market skills missing from their resume
+    (exact canonical-key match, no LLM). Role profiles are the union of the
+    market skills of the users targeting each dream_role, and every user is
+    also scored against every role. Nothing is written to Supabase.
+
+    Returns a dict with:
+        - users: number of users analyzed
+        - vocabulary_size: distinct canonical skills seen
+        - top_gaps: [{"skill", "users", "share"}] most common gaps
+        - mean_gap_size: average number of gaps per user with market skills
+        - roles: {dream_role: {"users", "profile_size", "mean_gap_size",
+          "top_gaps"}} where mean_gap_size is over the whole cohort
+    """
+    # Imported here so NumPy only loads for cohort analytics
+    from .vocabulary import SkillVocabulary, gap_bits, popcount, role_gap_sizes, skill_counts, top_skills
+
+    ids = list(dict.fromkeys(str(u).strip() for u in user_ids if u and str(u).strip()))
+    if not ids:
+        return {"users": 0, "vocabulary_size": 0, "top_gaps": [], "mean_gap_size": 0.0, "roles": {}}
+
+    supabase = _supabase_client()
+    skills_by_user = _fetch_skills_bulk(supabase, ids)
+    roles_by_user = _fetch_dream_roles_bulk(supabase, ids)
+
+    role_names: dict[str, str] = {}
+    role_members: dict[str, list[str]] = {}
+    for user_id in ids:
+        role = roles_by_user.get(user_id)
+        if role:
+            key = role.lower()
+            role_names.setdefault(key, role)
+            role_members.setdefault(key, []).append(user_id)
+
+    vocab = SkillVocabulary()
+    resume = vocab.encode([skills_by_user[u]["resume"] for u in ids])
+    market = vocab.encode([skills_by_user[u]["market"] for u in ids])
+    profiles = vocab.encode(
+        [
+            [name for u in members for name in skills_by_user[u]["market"]]
+            for members in role_members.values()
+        ]
+    )
+    resume, market, profiles = vocab.widen(resume), vocab.widen(market), vocab.widen(profiles)
+    size = len(vocab)
+
+    gaps = gap_bits(resume, market)
+    gap_sizes = popcount(gaps)
+    has_market = popcount(market) > 0
+    counts = skill_counts(gaps, size)
+
+    role_report: dict[str, dict[str, Any]] = {}
+    if role_members:
+        by_role = role_gap_sizes(resume, profiles, size)
+        profile_sizes = popcount(profiles)
+        index = {u: i for i, u in enumerate(ids)}
+        for r, (key, members) in enumerate(role_members.items()):
+            member_gaps = gaps[[index[u] for u in members]]
+            role_report[role_names[key]] = {
+                "users": len(members),
+                "profile_size": int(profile_sizes[r]),
+                "mean_gap_size": float(by_role[:, r].mean()),
+                "top_gaps": [
+                    {"skill": name, "users": n}
+                    for name, n in top_skills(skill_counts(member_gaps, size), vocab, top)
+                ],
+            }
+
+    return {
+        "users": len(ids),
+        "vocabulary_size": size,
+        "top_gaps": [
+            {"skill": name, "users": n, "share": n / len(ids)}
+            for name, n in top_skills(counts, vocab, top)
+        ],
+        "mean_gap_size": float(gap_sizes[has_market].mean()) if has_market.any() else 0.0,
+        "roles": role_report,
     }
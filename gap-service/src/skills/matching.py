@@ -0,0 +1,108 @@
+"""
+Deterministic skill pre-matching.
+
+Resolves trivial resume/market matches (case, punctuation, plurals, common
+aliases such as "React.js" / "ReactJS" / "React") locally so that only the
+ambiguous leftovers need to be sent to the LLM.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+from util.skill_names import normalize_skill_name
+
+# Raw spellings whose punctuation carries meaning and would otherwise be
+# stripped by normalize_skill_name ("C++" and "C#" must not collapse to "C").
+RAW_ALIASES = {
+    "c++": "cpp",
+    "c#": "csharp",
+    "f#": "fsharp",
+    ".net": "dotnet",
+    "asp.net": "aspnet",
+    "node.js": "node",
+}
+
+# Compact (lowercase, no whitespace) spellings mapped to one canonical key.
+SKILL_ALIASES = {
+    "js": "javascript",
+    "ecmascript": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "golang": "go",
+    "k8s": "kubernetes",
+    "postgres": "postgresql",
+    "mssql": "sqlserver",
+    "microsoftsqlserver": "sqlserver",
+    "amazonwebservice": "aws",
+    "gcp": "googlecloud",
+    "googlecloudplatform": "googlecloud",
+    "msazure": "azure",
+    "microsoftazure": "azure",
+    "sklearn": "scikitlearn",
+    "restapi": "rest",
+    "restfulapi": "rest",
+    "restful": "rest",
+    "cicd": "cicd",
+    "continuousintegration": "cicd",
+    "reactjs": "react",
+    "vuejs": "vue",
+    "nodejs": "node",
+    "nextjs": "next",
+    "expressjs": "express",
+    "angularjs": "angular",
+}
+
+_WS_RE = re.compile(r"[\s_]+")
+
+
+def skill_key(name: str) -> str:
+    """Canonical comparison key for a skill name ("" for blank input)."""
+    if not name or not name.strip():
+        return ""
+
+    raw = name.strip().lower()
+    if raw in RAW_ALIASES:
+        return RAW_ALIASES[raw]
+
+    key = _WS_RE.sub("", normalize_skill_name(name).lower())
+    key = SKILL_ALIASES.get(key, key)
+
+    # "Vue.js" / "VueJS" style suffixes
+    if key.endswith("js") and len(key) > 4:
+        key = key[:-2]
+
+    # Plurals: "APIs" vs "API", "Microservices" vs "Microservice"
+    if len(key) > 3 and key.endswith("s") and not key.endswith(("ss", "us")):
+        key = key[:-1]
+
+    return SKILL_ALIASES.get(key, key)
+
+
+@dataclass
+class PrematchResult:
+    matched: list[str] = field(default_factory=list)
+    missing: list[str] = field(default_factory=list)
+    ambiguous: list[str] = field(default_factory=list)
+
+
+def prematch_skills(resume_skills: list[str], market_skills: list[str]) -> PrematchResult:
+    """
+    Split market skills into locally matched, certainly missing and ambiguous.
+
+    A market skill is matched when its canonical key equals that of any resume
+    skill. With no resume skills at all every market skill is missing. The rest
+    are ambiguous: a resume skill may still cover them semantically (e.g.
+    "Python" covers "Python programming"), which only the LLM can judge.
+    """
+    result = PrematchResult()
+    resume_keys = {k for k in (skill_key(s) for s in resume_skills) if k}
+
+    for skill in market_skills:
+        key = skill_key(skill)
+        if key and key in resume_keys:
+            result.matched.append(skill)
+        elif not resume_keys:
+            result.missing.append(skill)
+        else:
+            result.ambiguous.append(skill)
+    return result
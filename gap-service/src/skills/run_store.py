@@ -0,0 +1,114 @@
+"""
+Local record of the latest gap analysis run per user.
+
+Each run is stored with a fingerprint of the user's normalized resume and
+market skill sets, so a re-analysis with unchanged inputs can return the
+previous result instead of calling the LLM and writing duplicate gap_skills
+rows. The stored skill lists also let a later run work from the delta, and
+such runs record the run they were derived from as parent_run_id. Backed by
+SQLite so no schema change is needed in Supabase.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from .matching import skill_key
+
+
+def skills_fingerprint(resume_skills: list[str], market_skills: list[str], model: str) -> str:
+    """Stable hash of the normalized, sorted skill sets plus the model name."""
+    payload = {
+        "resume": sorted({k for k in map(skill_key, resume_skills) if k}),
+        "market": sorted({k for k in map(skill_key, market_skills) if k}),
+        "model": model,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class GapRunStore:
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gap_runs (
+                user_id TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                run_id TEXT NOT NULL,
+                result TEXT NOT NULL,
+                resume_skills TEXT NOT NULL,
+                market_skills TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                parent_run_id TEXT
+            )
+            """
+        )
+        columns = {r[1] for r in self._conn.execute("PRAGMA table_info(gap_runs)")}
+        if "parent_run_id" not in columns:
+            self._conn.execute("ALTER TABLE gap_runs ADD COLUMN parent_run_id TEXT")
+        self._conn.commit()
+
+    def latest(self, user_id: str) -> Optional[dict[str, Any]]:
+        """Latest stored run for a user, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, run_id, result, resume_skills, market_skills, created_at, "
+                "parent_run_id FROM gap_runs WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "fingerprint": row[0],
+            "run_id": row[1],
+            "result": json.loads(row[2]),
+            "resume_skills": json.loads(row[3]),
+            "market_skills": json.loads(row[4]),
+            "created_at": row[5],
+            "parent_run_id": row[6],
+        }
+
+    def save(
+        self,
+        user_id: str,
+        fingerprint: str,
+        result: dict[str, Any],
+        resume_skills: list[str],
+        market_skills: list[str],
+    ) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO gap_runs "
+                "(user_id, fingerprint, run_id, result, resume_skills, market_skills, created_at, "
+                "parent_run_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    user_id,
+                    fingerprint,
+                    result["run_id"],
+                    json.dumps(result),
+                    json.dumps(resume_skills),
+                    json.dumps(market_skills),
+                    time.time(),
+                    result.get("parent_run_id"),
+                ),
+            )
+            self._conn.commit()
+
+    def discard(self, user_id: str, run_id: str) -> None:
+        """Forget a user's stored run if it is still the given one."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM gap_runs WHERE user_id = ? AND run_id = ?", (user_id, run_id)
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,123 @@
+"""
+Local semantic skill matching with character n-gram TF-IDF vectors.
+
+Resume and market skills are vectorized over a shared vocabulary of
+word-bounded character n-grams, and the full resume x market cosine
+similarity matrix is computed with one matrix product. A market skill is
+matched when its best resume skill reaches the threshold. This needs no
+network access, so it backs the offline match mode and the fallback used
+when Groq is unavailable.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .matching import RAW_ALIASES, SKILL_ALIASES, normalize_skill_name
+
+DEFAULT_NGRAM_RANGE = (3, 4)
+# Hierarchy pairs ("Python" / "Python programming", "Excel" / "Microsoft
+# Excel") score ~0.5-0.55 depending on corpus size; near misses ("Java" /
+# "JavaScript", "SQL" / "NoSQL") stay below 0.4. Sibling skills sharing a
+# word ("Deep Learning" / "Machine Learning") can still cross it.
+# Override with GAP_MATCH_THRESHOLD.
+DEFAULT_THRESHOLD = 0.5
+
+
+def _tokens(name: str) -> list[str]:
+    raw = name.strip().lower()
+    if raw in RAW_ALIASES:
+        return [RAW_ALIASES[raw]]
+    words = normalize_skill_name(name).lower().split()
+    return [SKILL_ALIASES.get(w, w) for w in words]
+
+
+def char_ngrams(name: str, ngram_range: tuple[int, int] = DEFAULT_NGRAM_RANGE) -> list[str]:
+    """Character n-grams of each word, padded with spaces at word boundaries."""
+    lo, hi = ngram_range
+    grams = []
+    for word in _tokens(name):
+        padded = f" {word} "
+        for n in range(lo, hi + 1):
+            if len(padded) < n:
+                grams.append(padded)
+                break
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+def _tfidf(docs: list[list[str]]) -> np.ndarray:
+    """L2-normalized TF-IDF rows for docs over their shared vocabulary."""
+    vocab: dict[str, int] = {}
+    rows, cols = [], []
+    for r, grams in enumerate(docs):
+        for g in grams:
+            rows.append(r)
+            cols.append(vocab.setdefault(g, len(vocab)))
+
+    tf = np.zeros((len(docs), max(len(vocab), 1)), dtype=np.float32)
+    np.add.at(tf, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log((1.0 + len(docs)) / (1.0 + df)) + 1.0
+    weights = tf * idf.astype(np.float32)
+
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return weights / norms
+
+
+def similarity_matrix(
+    resume_skills: list[str],
+    market_skills: list[str],
+    ngram_range: tuple[int, int] = DEFAULT_NGRAM_RANGE,
+) -> np.ndarray:
+    """Cosine similarity of every resume skill (rows) to every market skill (columns)."""
+    if not resume_skills or not market_skills:
+        return np.zeros((len(resume_skills), len(market_skills)), dtype=np.float32)
+    vectors = _tfidf([char_ngrams(s, ngram_range) for s in [*resume_skills, *market_skills]])
+    resume_vecs = vectors[: len(resume_skills)]
+    market_vecs = vectors[len(resume_skills):]
+    return resume_vecs @ market_vecs.T
+
+
+@dataclass
+class SemanticMatchResult:
+    matched: list[str] = field(default_factory=list)
+    missing: list[str] = field(default_factory=list)
+    # market skill -> (closest resume skill, cosine similarity)
+    best_match: dict[str, tuple[str, float]] = field(default_factory=dict)
+
+
+def semantic_match(
+    resume_skills: list[str],
+    market_skills: list[str],
+    *,
+    threshold: float = DEFAULT_THRESHOLD,
+    ngram_range: tuple[int, int] = DEFAULT_NGRAM_RANGE,
+) -> SemanticMatchResult:
+    """
+    Split market skills into matched and missing by n-gram cosine similarity.
+
+    A market skill is matched when some resume skill scores at least
+    ``threshold``; with no resume skills every market skill is missing.
+    Market skill order is preserved in both lists.
+    """
+    result = SemanticMatchResult()
+    if not resume_skills:
+        result.missing = list(market_skills)
+        return result
+    if not market_skills:
+        return result
+
+    sims = similarity_matrix(resume_skills, market_skills, ngram_range)
+    best_rows = sims.argmax(axis=0)
+    best_scores = sims[best_rows, np.arange(len(market_skills))]
+
+    for skill, row, score in zip(market_skills, best_rows.tolist(), best_scores.tolist()):
+        result.best_match[skill] = (resume_skills[row], score)
+        if score >= threshold:
+            result.matched.append(skill)
+        else:
+            result.missing.append(skill)
+    return result
@@ -0,0 +1,134 @@
+"""
+Integer-interned skill vocabulary and bitset skill matrices.
+
+Every canonical skill key (see matching.skill_key) gets a compact integer
+id. A group of skill lists — users' resumes, users' market skills, role
+profiles — becomes one packed bit matrix (one row per list, one bit per
+skill id), so cohort-wide gaps are array operations: ``market & ~resume``
+for the gaps and popcounts for the statistics.
+
+Matching here is exact on canonical keys; it does not apply the semantic
+matching used for individual gap runs.
+"""
+
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+
+from .matching import skill_key
+
+# Popcount of every byte value, for counting bits in packed rows
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Rows unpacked at a time when counting per-skill or per-role totals
+UNPACK_CHUNK = 4096
+
+
+class SkillVocabulary:
+    """Maps canonical skill keys to dense integer ids (first spelling seen is kept for display)."""
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        self._names: list[str] = []
+        # Raw spelling -> id, so repeated spellings skip skill_key
+        self._raw: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def add(self, name: str) -> int | None:
+        """Id for name, assigning the next id if it is new; None for blank names."""
+        skill_id = self._raw.get(name)
+        if skill_id is not None:
+            return skill_id
+        key = skill_key(name)
+        if not key:
+            return None
+        skill_id = self._ids.get(key)
+        if skill_id is None:
+            skill_id = self._ids[key] = len(self._names)
+            self._names.append(name.strip())
+        self._raw[name] = skill_id
+        return skill_id
+
+    def get(self, name: str) -> int | None:
+        skill_id = self._raw.get(name)
+        if skill_id is not None:
+            return skill_id
+        return self._ids.get(skill_key(name))
+
+    def name(self, skill_id: int) -> str:
+        return self._names[skill_id]
+
+    def encode(self, rows: Sequence[Iterable[str]], *, add: bool = True) -> np.ndarray:
+        """
+        Packed bit matrix with one row per skill list.
+
+        With add=False unknown skills are ignored instead of being added. The
+        matrix width is the vocabulary size once all rows are interned; use
+        ``widen`` to align matrices encoded at different sizes.
+        """
+        lookup = self.add if add else self.get
+        id_rows = [[i for i in map(lookup, names) if i is not None] for names in rows]
+
+        bits = np.zeros((len(id_rows), max(len(self), 1)), dtype=bool)
+        for r, ids in enumerate(id_rows):
+            bits[r, ids] = True
+        return np.packbits(bits, axis=1)
+
+    def decode(self, packed_row: np.ndarray) -> list[str]:
+        ids = np.flatnonzero(np.unpackbits(packed_row)[: len(self)])
+        return [self._names[i] for i in ids.tolist()]
+
+    def widen(self, packed: np.ndarray) -> np.ndarray:
+        """Pad a packed matrix with zero bytes to the current vocabulary width."""
+        width = (max(len(self), 1) + 7) // 8
+        if packed.shape[1] >= width:
+            return packed
+        return np.pad(packed, ((0, 0), (0, width - packed.shape[1])))
+
+
+def popcount(packed: np.ndarray) -> np.ndarray:
+    """Number of set bits in each row of a packed matrix."""
+    return _POPCOUNT[packed].sum(axis=1, dtype=np.int64)
+
+
+def gap_bits(resume: np.ndarray, market: np.ndarray) -> np.ndarray:
+    """Market skills not on the resume, row by row (shapes must match or broadcast)."""
+    return market & ~resume
+
+
+def skill_counts(packed: np.ndarray, vocab_size: int) -> np.ndarray:
+    """How many rows have each skill id set."""
+    counts = np.zeros(vocab_size, dtype=np.int64)
+    for start in range(0, packed.shape[0], UNPACK_CHUNK):
+        bits = np.unpackbits(packed[start:start + UNPACK_CHUNK], axis=1)[:, :vocab_size]
+        counts += bits.sum(axis=0, dtype=np.int64)
+    return counts
+
+
+def role_gap_sizes(resume: np.ndarray, roles: np.ndarray, vocab_size: int) -> np.ndarray:
+    """
+    Gap size of every user against every role profile, shape (users, roles).
+
+    |role & ~resume| = |role| - |role & resume|, and the intersection sizes
+    for a whole chunk of users come from one matrix product, so the
+    (users, roles, skills) tensor is never materialized.
+    """
+    role_bits = np.unpackbits(roles, axis=1)[:, :vocab_size].astype(np.float32)
+    role_sizes = role_bits.sum(axis=1)
+    sizes = np.empty((resume.shape[0], roles.shape[0]), dtype=np.int64)
+    for start in range(0, resume.shape[0], UNPACK_CHUNK):
+        user_bits = np.unpackbits(resume[start:start + UNPACK_CHUNK], axis=1)[:, :vocab_size]
+        overlap = user_bits.astype(np.float32) @ role_bits.T
+        sizes[start:start + len(user_bits)] = np.rint(role_sizes - overlap)
+    return sizes
+
+
+def top_skills(counts: np.ndarray, vocab: SkillVocabulary, top: int) -> list[tuple[str, int]]:
+    """The ``top`` most frequent skills with their counts (ties by id order)."""
+    order = np.argsort(-counts, kind="stable")[:top]
+    return [(vocab.name(i), int(counts[i])) for i in order.tolist() if counts[i] > 0]
@@ -0,0 +1 @@
+# Shared Python helpers for the gap and market-skills jobs
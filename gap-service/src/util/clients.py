@@ -0,0 +1,103 @@
+"""
+Shared API client registry.
+
+Clients are created lazily on first use, once per process, and reused by
+every run so HTTP connection pools and TLS sessions stay warm. Creation is
+guarded by a lock, so concurrent first calls still build a single client.
+Tests and benchmarks can swap in stand-ins with set_client().
+
+SDK packages (supabase, groq, google.generativeai) are imported inside the
+factories, so importing this module, or anything that uses it, is cheap
+and needs no credentials.
+"""
+
+import os
+import threading
+from typing import Any, Callable
+
+_lock = threading.Lock()
+_clients: dict[str, Any] = {}
+_factories: dict[str, Callable[[], Any]] = {}
+
+
+def get_env(name: str) -> str:
+    value = os.environ.get(name)
+    if not value or not value.strip():
+        raise ValueError(f"Missing or empty environment variable: {name}")
+    return value.strip()
+
+
+def register_factory(name: str, factory: Callable[[], Any]) -> None:
+    """Register how to build a named client; drops any cached instance."""
+    with _lock:
+        _factories[name] = factory
+        _clients.pop(name, None)
+
+
+def get_client(name: str) -> Any:
+    with _lock:
+        client = _clients.get(name)
+        if client is None:
+            factory = _factories.get(name)
+            if factory is None:
+                raise KeyError(f"No client factory registered for {name!r}")
+            client = factory()
+            _clients[name] = client
+        return client
+
+
+def set_client(name: str, client: Any) -> None:
+    """Use client for name (e.g. an in-process stub) instead of the factory."""
+    with _lock:
+        _clients[name] = client
+
+
+def reset_clients() -> None:
+    """Forget all cached clients; the next get_client() rebuilds them."""
+    with _lock:
+        _clients.clear()
+
+
+# ---------------------------------------------------------------------------
+# Default factories
+# ---------------------------------------------------------------------------
+
+def _create_supabase():
+    from supabase import create_client
+
+    url = get_env("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY") or os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    if not key or not key.strip():
+        raise ValueError("Missing or empty: set SUPABASE_KEY or SUPABASE_SERVICE_ROLE_KEY")
+    return create_client(url, key.strip())
+
+
+def _create_groq():
+    from groq import Groq
+
+    return Groq(api_key=get_env("GROQ_API_KEY"))
+
+
+def _create_gemini():
+    import google.generativeai as genai
+
+    genai.configure(api_key=get_env("GEMINI_API_KEY"))
+    model_name = os.environ.get("MARKET_MODEL", "gemini-2.5-flash").strip() or "gemini-2.5-flash"
+    return genai.GenerativeModel(model_name)
+
+
+register_factory("supabase", _create_supabase)
+register_factory("groq", _create_groq)
+register_factory("gemini", _create_gemini)
+
+
+def supabase_client():
+    return get_client("supabase")
+
+
+def groq_client():
+    return get_client("groq")
+
+
+def gemini_model():
+    return get_client("gemini")
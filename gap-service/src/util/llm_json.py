@@ -0,0 +1,272 @@
+"""
+Incremental parsing of JSON arrays out of LLM output.
+
+Models are asked for a bare JSON array but may wrap it in a markdown fence
+or add prose around it. JsonArrayScanner finds the first top-level array in
+a text stream in one pass: elements are returned as soon as they are
+complete, and the scanner reports done at the closing bracket so a caller
+streaming the completion can stop reading (and stop the model generating
+whatever chatter follows). repair_json recovers replies that are almost
+JSON, so they need not be thrown away or re-requested.
+"""
+
+import json
+import logging
+import re
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Characters that can change the scanner state outside / inside strings
+_STRUCTURAL_RE = re.compile(r'[\[\]{}",]')
+_STRING_RE = re.compile(r'["\\]')
+
+
+class JsonArrayScanner:
+    def __init__(self) -> None:
+        self.started = False
+        self.done = False
+        self.count = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._carry = ""
+
+    def feed(self, text: str) -> list[Any]:
+        """Scan the next piece of text; returns the elements it completed."""
+        items: list[Any] = []
+        if self.done or not text:
+            return items
+
+        i = 0
+        if not self.started:
+            i = text.find("[")
+            if i < 0:
+                return items  # text before the array is ignored
+            self.started = True
+            self._depth = 1
+            i += 1
+        start = i
+        n = len(text)
+
+        while i < n:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                m = _STRING_RE.search(text, i)
+                if m is None:
+                    break
+                i = m.start()
+                if text[i] == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                i += 1
+                continue
+
+            m = _STRUCTURAL_RE.search(text, i)
+            if m is None:
+                break
+            i = m.start()
+            c = text[i]
+            if c == '"':
+                self._in_string = True
+            elif c in "[{":
+                self._depth += 1
+            elif c in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    if c != "]":
+                        raise ValueError("Malformed JSON array: unbalanced '}'")
+                    self._emit(self._carry + text[start:i], items, final=True)
+                    self._carry = ""
+                    self.done = True
+                    return items
+            elif self._depth == 1:  # top-level comma
+                self._emit(self._carry + text[start:i], items, final=False)
+                self._carry = ""
+                start = i + 1
+            i += 1
+
+        self._carry += text[start:]
+        return items
+
+    def _emit(self, raw: str, items: list[Any], *, final: bool) -> None:
+        raw = raw.strip()
+        if not raw:
+            if final:
+                return  # "[]" or a trailing comma
+            raise ValueError("Malformed JSON array: empty element")
+        try:
+            items.append(json.loads(raw))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON array element {raw[:80]!r}: {e}") from e
+        self.count += 1
+
+    def finish(self) -> None:
+        """Raise if the text seen so far did not contain a complete array."""
+        if not self.started:
+            raise ValueError("No JSON array found in response")
+        if not self.done:
+            raise ValueError("Unterminated JSON array in response")
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """
+    Yield the elements of the first JSON array in a stream of text chunks.
+
+    Stops consuming chunks at the closing bracket; raises ValueError if the
+    stream ends first.
+    """
+    scanner = JsonArrayScanner()
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+        if scanner.done:
+            return
+    scanner.finish()
+
+
+def parse_json_array(text: str) -> list[Any]:
+    """Elements of the first JSON array in text."""
+    if not text:
+        raise ValueError("Empty model response")
+    return list(iter_json_array([text]))
+
+
+# ---------------------------------------------------------------------------
+# Local repair
+# ---------------------------------------------------------------------------
+
+_CLOSERS = {"[": "]", "{": "}"}
+
+
+def _drop_trailing_comma(out: list[str]) -> None:
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i]
+
+
+def repair_json(text: str, opener: str = "[") -> Any:
+    """
+    Parse the first JSON array (or object, with opener="{") in text, fixing
+    common model defects on the way: surrounding prose or code fences,
+    single-quoted strings, raw newlines in strings, trailing commas and a
+    reply cut off before its closing bracket. A truncated reply keeps its
+    complete top-level elements only; the element cut off is dropped and
+    logged as a warning (repair_json_status reports it to the caller).
+    Raises ValueError if it still does not parse.
+    """
+    return repair_json_status(text, opener)[0]
+
+
+def repair_json_status(text: str, opener: str = "[") -> tuple[Any, bool]:
+    """
+    repair_json, plus whether the reply was truncated: cut off before its
+    closing bracket (its open brackets were closed for it).
+    """
+    kind = "array" if opener == "[" else "object"
+    start = text.find(opener) if text else -1
+    if start < 0:
+        raise ValueError(f"No JSON {kind} found in response")
+
+    out: list[str] = []
+    stack: list[str] = []
+    quote = None
+    escape = False
+    last_boundary = None  # len(out) at the last top-level comma
+
+    for ch in text[start:]:
+        if quote:
+            if escape:
+                escape = False
+                if ch == "'":
+                    out[-1] = "'"  # \' is not a JSON escape
+                else:
+                    out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == quote:
+                quote = None
+                out.append('"')
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            else:
+                out.append(ch)
+        elif ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch in "[{":
+            stack.append(ch)
+            out.append(ch)
+        elif ch in "]}":
+            _drop_trailing_comma(out)
+            if not stack:
+                break
+            out.append(_CLOSERS[stack.pop()])
+            if not stack:
+                return _loads(out, kind), False
+        else:
+            if ch == "," and len(stack) == 1:
+                last_boundary = len(out)
+            out.append(ch)
+
+    # Truncated: close it as is, unless cut inside a string or element
+    if not quote and not escape:
+        attempt = list(out)
+        _drop_trailing_comma(attempt)
+        attempt.extend(_CLOSERS[c] for c in reversed(stack))
+        try:
+            return _loads(attempt, kind), True
+        except ValueError:
+            pass
+    kept = out[:last_boundary] if last_boundary is not None else [opener]
+    parsed = _loads(kept + [_CLOSERS[opener]], kind)
+    dropped = "".join(out[len(kept):]).lstrip(", \n")
+    logger.warning("Truncated JSON %s: dropped incomplete element %r", kind, dropped[:80])
+    return parsed, True
+
+
+def _loads(chars: list[str], kind: str) -> Any:
+    try:
+        return json.loads("".join(chars))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Unrepairable JSON {kind}: {e}") from e
+
+
+class MalformedReply(ValueError):
+    """A model reply that is not, and could not be repaired into, the expected JSON."""
+
+    def __init__(self, message: str, text: str):
+        super().__init__(message)
+        self.text = text
+
+
+def parse_json_lenient(text: str, opener: str = "[", *, source: str = "llm") -> Any:
+    """
+    Strict parse of the first JSON array (or object), falling back to
+    repair_json. Repairs are counted per source (result ok, truncated or
+    failed); raises MalformedReply.
+    """
+    try:
+        if opener == "[":
+            return parse_json_array(text)
+        return json.loads(text[text.index("{"):text.rindex("}") + 1])
+    except ValueError:
+        pass
+    try:
+        parsed, truncated = repair_json_status(text, opener)
+    except ValueError as e:
+        metrics.inc("json_repairs_total", source=source, result="failed")
+        raise MalformedReply(str(e), text) from e
+    metrics.inc("json_repairs_total", source=source, result="truncated" if truncated else "ok")
+    return parsed
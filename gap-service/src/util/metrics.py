@@ -0,0 +1,271 @@
+"""
+Process-wide metrics for the gap and market pipelines.
+
+Code records counters (tokens, retries, failures, cache lookups) and
+timings (per-stage durations) through the module-level helpers; every
+event is also passed to registered hooks, so a caller can forward them to
+another metrics system. Snapshots can be exported as JSON or in the
+Prometheus text format (for node_exporter's textfile collector).
+
+Metric names used by the pipelines:
+    stage_seconds{pipeline, stage}           timing: supabase_fetch, prompt_build,
+                                             llm, parse, insert, job_fetch,
+                                             rate_limit_wait, backoff, upsert
+    llm_requests_total{provider, outcome}    counter: ok / error
+    llm_first_item_seconds{provider}         timing: streamed request to first parsed item
+    llm_tokens_total{provider, kind}         counter: prompt / completion
+    retries_total{reason}                    counter: rate_limit, write_behind
+    failures_total{pipeline, stage}          counter
+    cache_requests_total{cache, result}      counter: hit / miss / revalidated
+    prompt_tokens_saved_total{kind}          counter: estimated tokens removed by compaction
+    prompt_truncations_total{kind}           counter: prompts cut to their token budget
+    prompt_chunks_total{kind}                counter: prompts a skill list was split into
+    json_repairs_total{source, result}       counter: ok / truncated / failed
+    singleflight_total{op, result}           counter: leader / shared / shared_process
+    role_refreshes_total{result}             counter: refreshed / fresh / over_budget / failed
+"""
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "advisemi_"
+
+# hook(kind, name, value, labels) with kind "counter" or "timing"
+Hook = Callable[[str, str, float, dict[str, str]], None]
+
+_LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, Any]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, _LabelKey], float] = {}
+        # (name, labels) -> [count, sum, max]
+        self._timings: dict[tuple[str, _LabelKey], list[float]] = {}
+        self._hooks: list[Hook] = []
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+            hooks = list(self._hooks)
+        self._emit(hooks, "counter", name, value, key[1])
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            stats = self._timings.setdefault(key, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            hooks = list(self._hooks)
+        self._emit(hooks, "timing", name, seconds, key[1])
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def add_hook(self, hook: Hook) -> None:
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        with self._lock:
+            if hook in self._hooks:
+                self._hooks.remove(hook)
+
+    def _emit(self, hooks: list[Hook], kind: str, name: str, value: float, labels: _LabelKey) -> None:
+        for hook in hooks:
+            try:
+                hook(kind, name, value, dict(labels))
+            except Exception:
+                logger.exception("Metrics hook failed")
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            timings = [
+                {"name": name, "labels": dict(labels), "count": int(s[0]), "sum": s[1], "max": s[2]}
+                for (name, labels), s in sorted(self._timings.items())
+            ]
+        return {"counters": counters, "timings": timings}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+_registry = MetricsRegistry()
+
+inc = _registry.inc
+observe = _registry.observe
+timer = _registry.timer
+add_hook = _registry.add_hook
+remove_hook = _registry.remove_hook
+snapshot = _registry.snapshot
+reset = _registry.reset
+
+
+# ---------------------------------------------------------------------------
+# Pipeline helpers
+# ---------------------------------------------------------------------------
+
+def stage(pipeline: str, name: str):
+    """Context manager timing one pipeline stage."""
+    return timer("stage_seconds", pipeline=pipeline, stage=name)
+
+
+def record_llm(provider: str, *, ok: bool, prompt_tokens: Optional[int] = None,
+               completion_tokens: Optional[int] = None) -> None:
+    inc("llm_requests_total", provider=provider, outcome="ok" if ok else "error")
+    if prompt_tokens:
+        inc("llm_tokens_total", prompt_tokens, provider=provider, kind="prompt")
+    if completion_tokens:
+        inc("llm_tokens_total", completion_tokens, provider=provider, kind="completion")
+
+
+def record_cache(cache: str, result: str) -> None:
+    inc("cache_requests_total", cache=cache, result=result)
+
+
+def cache_hit_rates(snap: Optional[dict[str, Any]] = None) -> dict[str, float]:
+    """Share of lookups per cache that avoided the upstream call (hits + revalidations)."""
+    totals: dict[str, list[float]] = {}
+    for c in (snap or snapshot())["counters"]:
+        if c["name"] != "cache_requests_total":
+            continue
+        t = totals.setdefault(c["labels"].get("cache", ""), [0.0, 0.0])
+        t[1] += c["value"]
+        if c["labels"].get("result") in ("hit", "revalidated"):
+            t[0] += c["value"]
+    return {cache: hits / total for cache, (hits, total) in totals.items() if total}
+
+
+# ---------------------------------------------------------------------------
+# Exporters
+# ---------------------------------------------------------------------------
+
+def to_json(snap: Optional[dict[str, Any]] = None) -> str:
+    snap = snap or snapshot()
+    return json.dumps({**snap, "cache_hit_rates": cache_hit_rates(snap), "timestamp": time.time()}, indent=2)
+
+
+def _prom_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def to_prometheus(snap: Optional[dict[str, Any]] = None) -> str:
+    """Prometheus text exposition: counters as-is, timings as summaries (plus _max gauges)."""
+    snap = snap or snapshot()
+    lines: list[str] = []
+    typed: set[str] = set()
+
+    # snapshot() sorts by name, so each counter family is already contiguous
+    for c in snap["counters"]:
+        name = PREFIX + c["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        value = c["value"]
+        lines.append(f"{name}{_prom_labels(c['labels'])} {int(value) if value.is_integer() else value}")
+
+    # Samples of one metric family must be contiguous, so each timing is
+    # written as a summary block followed by a separate _max gauge block.
+    by_name: dict[str, list[dict[str, Any]]] = {}
+    for t in snap["timings"]:
+        by_name.setdefault(PREFIX + t["name"], []).append(t)
+    for name, series in by_name.items():
+        lines.append(f"# TYPE {name} summary")
+        for t in series:
+            labels = _prom_labels(t["labels"])
+            lines.append(f"{name}_count{labels} {t['count']}")
+            lines.append(f"{name}_sum{labels} {t['sum']:.6f}")
+        lines.append(f"# TYPE {name}_max gauge")
+        for t in series:
+            lines.append(f"{name}_max{_prom_labels(t['labels'])} {t['max']:.6f}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_file(path: str, content: str) -> None:
+    """Atomically replace path (the textfile collector must never see a partial file)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def export_from_env() -> None:
+    """Write METRICS_TEXTFILE (Prometheus) and/or METRICS_JSON if set."""
+    snap = snapshot()
+    textfile = os.environ.get("METRICS_TEXTFILE", "").strip()
+    json_path = os.environ.get("METRICS_JSON", "").strip()
+    try:
+        if textfile:
+            write_file(textfile, to_prometheus(snap))
+        if json_path:
+            write_file(json_path, to_json(snap))
+    except OSError:
+        logger.exception("Failed to export metrics")
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install_exporters_from_env() -> None:
+    """
+    Export on exit, and every METRICS_EXPORT_INTERVAL_S seconds if set, to the
+    paths in METRICS_TEXTFILE / METRICS_JSON. No-op when neither is set.
+    """
+    global _installed
+    if not (os.environ.get("METRICS_TEXTFILE") or os.environ.get("METRICS_JSON")):
+        return
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+
+    atexit.register(export_from_env)
+    interval = float(os.environ.get("METRICS_EXPORT_INTERVAL_S") or 0)
+    if interval > 0:
+        def loop() -> None:
+            while True:
+                time.sleep(interval)
+                export_from_env()
+
+        threading.Thread(target=loop, name="metrics-export", daemon=True).start()
@@ -0,0 +1,227 @@
+"""
+Token-budgeted prompt compaction.
+
+Job descriptions are split into sections by their headings. Sections about
+requirements and responsibilities are kept; benefits, compensation,
+company blurbs, location and legal/EEO text are dropped, as are individual
+boilerplate lines anywhere in the text. If what is left still exceeds the
+token budget, unclassified sections are dropped from the end and then the
+text is cut at a line (or word) boundary, so a very long posting still
+yields a prompt of bounded size instead of failing upstream.
+
+Skill lists are de-duplicated and split into chunks that each fit a
+budget, so no skill is silently left out of a prompt.
+
+Token counts are estimated locally (no tokenizer download): words are
+counted at one token per four characters, punctuation at one token each,
+which tracks BPE tokenizers closely enough for budgeting.
+"""
+
+import html
+import logging
+import re
+from collections.abc import Callable, Iterable
+from typing import Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count of text."""
+    count = 0
+    for piece in _TOKEN_RE.findall(text):
+        count += (len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == "_" else 1
+    return count
+
+
+# ---------------------------------------------------------------------------
+# Job descriptions
+# ---------------------------------------------------------------------------
+
+_BLOCK_TAG_RE = re.compile(r"<\s*(br|p|/p|li|/li|div|/div|h\d|/h\d|ul|/ul)\b[^>]*>", re.I)
+_TAG_RE = re.compile(r"<[^>]+>")
+_WS_RE = re.compile(r"[ \t\r\f\v]+")
+_BULLET_RE = re.compile(r"^[-*•·▪◦]\s*")
+_LABEL_RE = re.compile(r"^([A-Za-z][\w &'’/-]{1,60}):\s*(.*)$")
+
+_KEEP_HEADINGS = re.compile(
+    r"responsibilit|requirement|qualification|what you('| wi)ll (do|need|bring)|"
+    r"what we('re| are) looking for|you (have|bring|will)|skills|experience|duties|"
+    r"about the (role|job|position)|the role|tech(nology)? stack|tools|nice to have|"
+    r"preferred|must have|day to day|key tasks",
+    re.I,
+)
+_DROP_HEADINGS = re.compile(
+    r"benefit|perks|what we offer|we offer|compensation|salary|\bpay\b|pay range|"
+    r"about (us|the company|our)|who we are|our (company|mission|culture|story|values)|"
+    r"why (join|work)|life at|equal (employment )?opportunity|\beeo\b|diversity|"
+    r"legal|disclaimer|location|work environment|physical (demands|requirements)|"
+    r"how to apply|application process|privacy",
+    re.I,
+)
+_DROP_LINES = [
+    re.compile(p, re.I)
+    for p in (
+        r"equal (employment )?opportunity",
+        r"\beeo\b",
+        r"without regard to (race|age|sex|gender|religion)",
+        r"reasonable accommodation",
+        r"e-?verify",
+        r"click (here|apply)|apply now|to apply,",
+        r"recruitment agenc(y|ies)",
+        r"privacy (notice|policy)",
+        r"401\(?k\)?|paid time off|\bpto\b|(health|dental|vision|medical|life) insurance",
+        r"(salary|pay) range|\$\s?\d[\d,]*(k|\.\d+)?\s*(-|–|to)\s*\$?\s?\d",
+    )
+]
+
+KEEP, NEUTRAL, DROP = 2, 1, 0
+
+
+def _to_lines(text: str) -> list[str]:
+    text = _BLOCK_TAG_RE.sub("\n", text)
+    text = html.unescape(_TAG_RE.sub(" ", text))
+    lines = (_WS_RE.sub(" ", line).strip() for line in text.split("\n"))
+    return [line for line in lines if line]
+
+
+def _heading(line: str) -> Optional[str]:
+    """Heading text if the line looks like a section heading."""
+    bare = line.lstrip("#").strip()
+    if not bare or len(bare) > 60 or len(bare.split()) > 8:
+        return None
+    if line.startswith("#") or bare.endswith(":"):
+        return bare.rstrip(":").strip()
+    letters = [c for c in bare if c.isalpha()]
+    if len(letters) > 3 and all(c.isupper() for c in letters):
+        return bare
+    return None
+
+
+def _classify(heading: str) -> int:
+    if _KEEP_HEADINGS.search(heading):
+        return KEEP
+    if _DROP_HEADINGS.search(heading):
+        return DROP
+    return NEUTRAL
+
+
+def _sections(lines: list[str]) -> list[tuple[int, list[str]]]:
+    """(priority, lines) per section; text before the first heading is neutral."""
+    sections: list[tuple[int, list[str]]] = [(NEUTRAL, [])]
+    for line in lines:
+        heading = _heading(line)
+        if heading is not None:
+            sections.append((_classify(heading), [line]))
+            continue
+        # "Benefits: health, dental" style one-line sections
+        label = _LABEL_RE.match(_BULLET_RE.sub("", line))
+        if label and _classify(label.group(1)) == DROP:
+            continue
+        if any(p.search(line) for p in _DROP_LINES):
+            continue
+        sections[-1][1].append(line)
+    return [(priority, body) for priority, body in sections if body]
+
+
+def truncate_to_budget(text: str, max_tokens: int) -> str:
+    """Longest prefix of text within max_tokens, cut at a line or word boundary."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept: list[str] = []
+    used = 0
+    for line in text.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if used + cost <= max_tokens:
+            kept.append(line)
+            used += cost
+            continue
+        words: list[str] = []
+        for word in line.split():
+            cost = estimate_tokens(word)
+            if used + cost > max_tokens:
+                break
+            words.append(word)
+            used += cost
+        if words:
+            kept.append(" ".join(words))
+        break
+    return "\n".join(kept)
+
+
+def compact_job_description(text: str, *, max_tokens: Optional[int] = None) -> str:
+    """
+    Job description with low-signal sections and boilerplate removed and,
+    if max_tokens is set, cut to fit it. Falls back to the cleaned full text
+    when every section would be dropped.
+    """
+    if not text or not text.strip():
+        return ""
+    lines = _to_lines(text)
+    sections = [s for s in _sections(lines) if s[0] != DROP] or [(NEUTRAL, lines)]
+
+    if max_tokens:
+        costs = [estimate_tokens("\n".join(body)) + 1 for _, body in sections]
+        total = sum(costs)
+        # Unclassified sections go first, last ones first, while others remain
+        for i in reversed(range(len(sections))):
+            if total <= max_tokens or len(sections) == 1:
+                break
+            if sections[i][0] == NEUTRAL and any(p == KEEP for p, _ in sections):
+                total -= costs[i]
+                del sections[i], costs[i]
+
+    compacted = "\n".join(line for _, body in sections for line in body)
+    if max_tokens and estimate_tokens(compacted) > max_tokens:
+        metrics.inc("prompt_truncations_total", kind="job_description")
+        logger.debug("Job description over %d tokens after compaction; truncating", max_tokens)
+        compacted = truncate_to_budget(compacted, max_tokens)
+
+    saved = estimate_tokens(text) - estimate_tokens(compacted)
+    if saved > 0:
+        metrics.inc("prompt_tokens_saved_total", saved, kind="job_description")
+    return compacted
+
+
+# ---------------------------------------------------------------------------
+# Skill lists
+# ---------------------------------------------------------------------------
+
+def _casefold(item: str) -> str:
+    return item.strip().casefold()
+
+
+def dedupe(items: Iterable[str], key: Callable[[str], str] = _casefold) -> list[str]:
+    """First occurrence of every distinct key, in order; blank keys are dropped."""
+    seen: set[str] = set()
+    result: list[str] = []
+    for item in items:
+        k = key(item)
+        if k and k not in seen:
+            seen.add(k)
+            result.append(item)
+    return result
+
+
+def chunk_to_budget(items: list[str], max_tokens: int) -> list[list[str]]:
+    """
+    Split items (one per prompt line) into consecutive chunks of at most
+    max_tokens each. An item larger than the budget forms its own chunk.
+    """
+    chunks: list[list[str]] = []
+    current: list[str] = []
+    used = 0
+    for item in items:
+        cost = estimate_tokens(item) + 1
+        if current and used + cost > max_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
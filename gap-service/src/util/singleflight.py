@@ -0,0 +1,177 @@
+"""
+Coalescing of concurrent identical runs.
+
+A double-click, a retry or a second browser tab can start the same run for
+the same user while the first is still going. SingleFlight.do(op, key, fn)
+runs fn once per (op, key) at a time: callers that arrive while it is in
+flight wait and get the same result (or exception) instead of making their
+own LLM calls and writes.
+
+Across processes (several workers, or the CLI next to a worker) an advisory
+fcntl lock file per (op, key) serializes the runs. The process that runs fn
+writes its JSON result into the lock file and unlinks it before unlocking,
+so processes that were waiting on that file read the result from their open
+handle, and nothing is left on disk once the last of them closes it. If the
+run failed or its result is not JSON-serializable, a waiting process runs
+fn itself. Without fcntl (Windows) only in-process calls are coalesced.
+
+SINGLEFLIGHT_DIR sets the lock directory (default .cache/singleflight);
+"off" keeps coalescing in-process.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Optional, TypeVar
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_LOCK_DIR = ".cache/singleflight"
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, lock_dir: Optional[str] = None):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, mode=0o700, exist_ok=True)
+        self._lock = threading.Lock()
+        self._calls: dict[tuple[str, str], _Call] = {}
+
+    def do(self, op: str, key: str, fn: Callable[[], T]) -> T:
+        """fn(), shared with every concurrent caller for the same (op, key)."""
+        with self._lock:
+            call = self._calls.get((op, key))
+            leader = call is None
+            if leader:
+                call = self._calls[(op, key)] = _Call()
+
+        if not leader:
+            metrics.inc("singleflight_total", op=op, result="shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(op, key, fn)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[(op, key)]
+            call.done.set()
+
+    # -----------------------------------------------------------------------
+    # Cross-process
+    # -----------------------------------------------------------------------
+
+    def _run(self, op: str, key: str, fn: Callable[[], T]) -> T:
+        if not self.lock_dir:
+            metrics.inc("singleflight_total", op=op, result="leader")
+            return fn()
+
+        digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+        path = os.path.join(self.lock_dir, f"{op}-{digest}.lock")
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                os.close(fd)
+                raise
+            if _is_current(fd, path):
+                break
+            # The file we waited on was finished and unlinked by its owner
+            shared = _read_result(fd)
+            os.close(fd)
+            if shared is not None:
+                metrics.inc("singleflight_total", op=op, result="shared_process")
+                return shared["result"]
+            # That run failed; retry on a fresh lock file
+
+        try:
+            os.ftruncate(fd, 0)  # left over if a previous owner crashed
+            metrics.inc("singleflight_total", op=op, result="leader")
+            result = fn()
+            _write_result(fd, result)
+            return result
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def _is_current(fd: int, path: str) -> bool:
+    """Whether fd is still the file at path (not unlinked or replaced)."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    own = os.fstat(fd)
+    return (st.st_dev, st.st_ino) == (own.st_dev, own.st_ino)
+
+
+def _read_result(fd: int) -> Optional[dict[str, Any]]:
+    os.lseek(fd, 0, os.SEEK_SET)
+    chunks = []
+    while chunk := os.read(fd, 65536):
+        chunks.append(chunk)
+    try:
+        return json.loads(b"".join(chunks)) if chunks else None
+    except ValueError:
+        return None
+
+
+def _write_result(fd: int, result: Any) -> None:
+    try:
+        payload = json.dumps({"result": result}).encode()
+    except (TypeError, ValueError):
+        logger.debug("Result is not JSON-serializable; waiting processes will rerun")
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    while payload:
+        payload = payload[os.write(fd, payload):]
+
+
+# ---------------------------------------------------------------------------
+# Process-wide instance
+# ---------------------------------------------------------------------------
+
+_default_lock = threading.Lock()
+_default: Optional[SingleFlight] = None
+
+
+def get_default() -> SingleFlight:
+    """Shared instance configured from SINGLEFLIGHT_DIR."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            path = os.environ.get("SINGLEFLIGHT_DIR", DEFAULT_LOCK_DIR).strip()
+            _default = SingleFlight(None if not path or path.lower() == "off" else path)
+        return _default
+
+
+def do(op: str, key: str, fn: Callable[[], T]) -> T:
+    return get_default().do(op, key, fn)
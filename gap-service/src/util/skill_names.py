@@ -0,0 +1,97 @@
+"""
+Mechanical skill name normalization, shared by the market-skills jobs and
+the gap analysis matcher.
+
+normalize_skill_name canonicalizes case, punctuation, whitespace, simple
+plurals, generic suffixes ("Python Programming") and a few acronyms
+without injecting domain knowledge; skills.matching layers its alias
+tables on top for comparisons.
+"""
+
+import re
+import sys
+from collections.abc import Iterable
+from functools import lru_cache
+
+GENERIC_SUFFIXES = {
+    "programming",
+    "models",
+    "systems",
+    "tools",
+    "methods",
+}
+
+ACRONYMS = {
+    "SQL",
+    "API",
+    "APIS",
+    "AWS",
+    "ETL",
+    "REST",
+    "CI",
+    "CD",
+    "CI/CD",
+    "HTTP",
+}
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+# Raw skill strings repeat heavily across postings, so canonical names are
+# memoized; the bound keeps memory flat when re-normalizing history.
+NORMALIZE_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_skill_name(skill: str) -> str:
+    """
+    Normalize skill names WITHOUT injecting domain knowledge.
+    """
+
+    if not skill:
+        return skill
+
+    s = skill.strip().lower()
+
+    # Remove punctuation
+    s = _PUNCT_RE.sub("", s)
+
+    # Normalize whitespace
+    s = _SPACE_RE.sub(" ", s)
+
+    # Do not singularize 'series'
+    if s.endswith("series"):
+        return s.title()
+
+    # Conservative plural handling
+    if s.endswith("ies"):
+        s = s[:-3] + "y"
+    elif s.endswith("s") and len(s.split()) > 1:
+        s = s[:-1]
+
+    words = s.split()
+
+    # Strip generic suffixes only if phrase remains meaningful
+    if len(words) > 2 and words[-1] in GENERIC_SUFFIXES:
+        words = words[:-1]
+
+    s = " ".join(words)
+
+    # Acronym handling
+    compact = s.replace(" ", "").upper()
+    if compact in ACRONYMS:
+        return compact
+
+    return s.title()
+
+
+def normalize_many(skills: Iterable[str], *, intern: bool = False) -> list[str]:
+    """
+    Normalize an iterable of raw skill names, in order.
+
+    With intern=True the canonical names are interned, so duplicates share
+    one string object even after they fall out of the memo.
+    """
+    if not intern:
+        return [normalize_skill_name(s) for s in skills]
+    return [sys.intern(n) if n else n for n in map(normalize_skill_name, skills)]
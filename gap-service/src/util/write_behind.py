@@ -0,0 +1,220 @@
+"""
+Write-behind buffer for Supabase row writes.
+
+Callers add rows and return immediately; a background thread coalesces
+rows from many runs into chunked bulk writes. A batch is written once
+max_rows are pending, once the oldest pending row is max_delay_s old, or
+on flush()/close() (close is registered with atexit by the owners).
+
+Writes are retried with exponential backoff. The write function receives
+retry=True on retries so it can make them idempotent: gap_skills writes
+delete the batch's run_ids first, skills upserts rely on their conflict
+key. Rows added in one add() call are never split across batches, so a
+retry always covers whole runs. With a key function, pending rows with the
+same key are coalesced and the latest one wins.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ROWS = 500
+DEFAULT_MAX_DELAY_S = 2.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_S = 1.0
+
+Row = dict[str, Any]
+
+
+class WriteBehindBuffer:
+    def __init__(
+        self,
+        write: Callable[[list[Row], bool], None],
+        *,
+        name: str,
+        key: Optional[Callable[[Row], Hashable]] = None,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        max_delay_s: float = DEFAULT_MAX_DELAY_S,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_s: float = DEFAULT_BACKOFF_S,
+        on_failure: Optional[Callable[[list[Row]], None]] = None,
+    ):
+        if max_rows < 1:
+            raise ValueError("max_rows must be >= 1")
+        self.name = name
+        self._write = write
+        self._key = key
+        self.max_rows = max_rows
+        self.max_delay_s = max_delay_s
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self._on_failure = on_failure
+
+        self._cond = threading.Condition()
+        # key -> row when coalescing, else a list of row groups (one per add)
+        self._keyed: "OrderedDict[Hashable, Row]" = OrderedDict()
+        self._groups: list[list[Row]] = []
+        self._pending_rows = 0
+        self._oldest: Optional[float] = None
+        self._in_flight = False
+        self._flush_requested = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.batches = 0
+        self.rows_written = 0
+        self.rows_coalesced = 0
+        self.retries = 0
+        self.rows_failed = 0
+
+    # ----------------------------
+    # Producer side
+    # ----------------------------
+
+    def add(self, rows: list[Row]) -> None:
+        """Queue rows for writing; returns without waiting for the database."""
+        if not rows:
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"write-behind buffer {self.name!r} is closed")
+            if self._key is not None:
+                for row in rows:
+                    k = self._key(row)
+                    if k in self._keyed:
+                        self.rows_coalesced += 1
+                    else:
+                        self._pending_rows += 1
+                    self._keyed[k] = row
+            else:
+                self._groups.append(list(rows))
+                self._pending_rows += len(rows)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"write-behind-{self.name}", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify_all()
+
+    def flush(self) -> None:
+        """Write everything queued so far and wait for it (or its final failure)."""
+        with self._cond:
+            if self._thread is None:
+                return
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending_rows or self._in_flight:
+                self._cond.wait()
+
+    def close(self) -> None:
+        """Flush and stop the background thread; later add() calls raise."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "pending": self._pending_rows,
+                "batches": self.batches,
+                "rows_written": self.rows_written,
+                "rows_coalesced": self.rows_coalesced,
+                "retries": self.retries,
+                "rows_failed": self.rows_failed,
+            }
+
+    # ----------------------------
+    # Flusher thread
+    # ----------------------------
+
+    def _due(self) -> bool:
+        if not self._pending_rows:
+            return False
+        if self._closed or self._flush_requested or self._pending_rows >= self.max_rows:
+            return True
+        return time.monotonic() - self._oldest >= self.max_delay_s
+
+    def _take_batch(self) -> list[Row]:
+        batch: list[Row] = []
+        if self._key is not None:
+            while self._keyed and len(batch) < self.max_rows:
+                batch.append(self._keyed.popitem(last=False)[1])
+        else:
+            while self._groups and (not batch or len(batch) + len(self._groups[0]) <= self.max_rows):
+                batch.extend(self._groups.pop(0))
+        self._pending_rows -= len(batch)
+        self._oldest = time.monotonic() if self._pending_rows else None
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._due():
+                    if self._closed and not self._pending_rows:
+                        return
+                    if not self._pending_rows:
+                        self._flush_requested = False
+                        self._cond.notify_all()
+                        self._cond.wait()
+                    else:
+                        self._cond.wait(max(0.0, self._oldest + self.max_delay_s - time.monotonic()))
+                batch = self._take_batch()
+                self._in_flight = True
+
+            try:
+                self._write_with_retry(batch)
+            finally:
+                with self._cond:
+                    self._in_flight = False
+                    self._cond.notify_all()
+
+    def _write_with_retry(self, batch: list[Row]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.timer("write_behind_flush_seconds", buffer=self.name):
+                    self._write(batch, attempt > 0)
+            except Exception:
+                if attempt == self.max_retries:
+                    logger.exception(
+                        "Write-behind %s: giving up on %d rows after %d attempts",
+                        self.name,
+                        len(batch),
+                        attempt + 1,
+                    )
+                    self.rows_failed += len(batch)
+                    metrics.inc("failures_total", pipeline="write_behind", stage=self.name)
+                    if self._on_failure is not None:
+                        try:
+                            self._on_failure(batch)
+                        except Exception:
+                            logger.exception("Write-behind %s: on_failure callback failed", self.name)
+                    return
+                self.retries += 1
+                metrics.inc("retries_total", reason="write_behind")
+                delay = self.backoff_s * (2 ** attempt)
+                logger.warning(
+                    "Write-behind %s: write of %d rows failed; retrying in %.1fs",
+                    self.name,
+                    len(batch),
+                    delay,
+                    exc_info=True,
+                )
+                time.sleep(delay)
+            else:
+                self.batches += 1
+                self.rows_written += len(batch)
+                metrics.inc("write_behind_rows_total", len(batch), buffer=self.name)
+                return
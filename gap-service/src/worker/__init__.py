@@ -0,0 +1,4 @@
+# Long-lived gap / market skills worker
+from .worker import Job, LocalQueue, RunsTableQueue, Worker
+
+__all__ = ["Job", "LocalQueue", "RunsTableQueue", "Worker"]
@@ -0,0 +1,211 @@
+"""
+Long-lived worker for gap analysis and market skills jobs.
+
+Keeps one process (and its warm API clients) alive, claims pending work from
+the runs table or a local in-process queue, and runs jobs on a bounded pool.
+On shutdown it stops claiming and drains the jobs already in flight.
+
+runs-table protocol: a row whose status is "<kind>_pending" (kind is "gap"
+or "market") is claimed by a conditional update to "<kind>_running", then set
+to "<kind>_done" or "<kind>_failed". Other statuses are ignored. The profile
+edge function queues "gap_pending" rows when GAP_WORKER_QUEUE=1; see the
+Worker Queue section of the README.
+"""
+
+import logging
+import queue
+import signal
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ("gap", "market")
+DEFAULT_CONCURRENCY = 4
+DEFAULT_POLL_INTERVAL_S = 2.0
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    user_id: str
+
+
+# ---------------------------------------------------------------------------
+# Job sources
+# ---------------------------------------------------------------------------
+
+class RunsTableQueue:
+    """Claims pending jobs from the Supabase runs table."""
+
+    def __init__(self, supabase: Any, kinds: tuple[str, ...] = JOB_KINDS):
+        self.supabase = supabase
+        self.kinds = kinds
+
+    def claim(self, limit: int) -> list[Job]:
+        if limit <= 0:
+            return []
+        resp = (
+            self.supabase.table("runs")
+            .select("id,user_id,status")
+            .in_("status", [f"{k}_pending" for k in self.kinds])
+            .order("created_at")
+            .limit(limit)
+            .execute()
+        )
+        claimed = []
+        for row in resp.data or []:
+            kind = row["status"].rsplit("_", 1)[0]
+            # Conditional update: only one worker wins the pending → running flip
+            won = (
+                self.supabase.table("runs")
+                .update({"status": f"{kind}_running"})
+                .eq("id", row["id"])
+                .eq("status", row["status"])
+                .execute()
+            )
+            if won.data:
+                claimed.append(Job(id=row["id"], kind=kind, user_id=row["user_id"]))
+        return claimed
+
+    def complete(self, job: Job, result: Any) -> None:
+        self._set_status(job, f"{job.kind}_done")
+
+    def fail(self, job: Job, error: BaseException) -> None:
+        self._set_status(job, f"{job.kind}_failed")
+
+    def _set_status(self, job: Job, status: str) -> None:
+        self.supabase.table("runs").update({"status": status}).eq("id", job.id).execute()
+
+    def is_drained(self) -> bool:
+        return False
+
+
+class LocalQueue:
+    """In-process stand-in for the runs table (e.g. jobs read from stdin)."""
+
+    def __init__(self) -> None:
+        self._queue: "queue.Queue[Job]" = queue.Queue()
+        self._closed = threading.Event()
+        self._counter = 0
+        self._lock = threading.Lock()
+        self.results: dict[str, Any] = {}
+
+    def submit(self, kind: str, user_id: str) -> Job:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with self._lock:
+            self._counter += 1
+            job = Job(id=f"local-{self._counter}", kind=kind, user_id=user_id)
+        self._queue.put(job)
+        return job
+
+    def close(self) -> None:
+        """No more jobs will be submitted."""
+        self._closed.set()
+
+    def claim(self, limit: int) -> list[Job]:
+        jobs = []
+        while len(jobs) < limit:
+            try:
+                jobs.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return jobs
+
+    def complete(self, job: Job, result: Any) -> None:
+        self.results[job.id] = result
+
+    def fail(self, job: Job, error: BaseException) -> None:
+        self.results[job.id] = {"error": str(error)}
+
+    def is_drained(self) -> bool:
+        return self._closed.is_set() and self._queue.empty()
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+class Worker:
+    def __init__(
+        self,
+        job_queue: Any,
+        handlers: dict[str, Callable[[str], Any]],
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        poll_interval_s: float = DEFAULT_POLL_INTERVAL_S,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        self.queue = job_queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval_s = poll_interval_s
+        self.processed = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._inflight: set[Future] = set()
+        self._lock = threading.Lock()
+
+    def stop(self) -> None:
+        """Stop claiming new jobs; run() returns once in-flight jobs finish."""
+        self._stop.set()
+
+    def install_signal_handlers(self) -> None:
+        def handle(signum, _frame):
+            logger.info("Received signal %s; draining in-flight jobs", signum)
+            self.stop()
+
+        signal.signal(signal.SIGTERM, handle)
+        signal.signal(signal.SIGINT, handle)
+
+    def _run_job(self, job: Job) -> None:
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind: {job.kind}")
+            result = handler(job.user_id)
+        except Exception as e:
+            logger.exception("Job failed id=%s kind=%s user_id=%s", job.id, job.kind, job.user_id)
+            with self._lock:
+                self.failed += 1
+            self.queue.fail(job, e)
+            return
+        with self._lock:
+            self.processed += 1
+        self.queue.complete(job, result)
+        logger.info("Job done id=%s kind=%s user_id=%s", job.id, job.kind, job.user_id)
+
+    def run(self) -> None:
+        """Claim and run jobs until stop() is called or the queue is drained."""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while not self._stop.is_set():
+                with self._lock:
+                    self._inflight = {f for f in self._inflight if not f.done()}
+                    free = self.concurrency - len(self._inflight)
+
+                jobs: list[Job] = []
+                if free > 0:
+                    try:
+                        jobs = self.queue.claim(free)
+                    except Exception:
+                        logger.exception("Failed to claim jobs")
+
+                for job in jobs:
+                    future = pool.submit(self._run_job, job)
+                    with self._lock:
+                        self._inflight.add(future)
+
+                if not jobs:
+                    with self._lock:
+                        idle = not any(not f.done() for f in self._inflight)
+                    if idle and self.queue.is_drained():
+                        break
+                    self._stop.wait(self.poll_interval_s if free > 0 else 0.05)
+
+            # Graceful drain: the pool's context exit waits for in-flight jobs
+        logger.info("Worker stopped processed=%d failed=%d", self.processed, self.failed)
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+# Same import roots as the run_*.py scripts
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src", "market-skills"))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+# In-process Supabase / LLM / Adzuna stand-ins shared with the benchmarks
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from util import clients, metrics, singleflight  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture
+def counter():
+    """counter(name, **labels): current value of a process-wide metrics counter."""
+
+    def value(name: str, **labels) -> float:
+        for c in metrics.snapshot()["counters"]:
+            if c["name"] == name and c["labels"] == {k: str(v) for k, v in labels.items()}:
+                return c["value"]
+        return 0.0
+
+    return value
+
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    """A fresh FakeSupabase wired in as the shared client, with no cross-process locks."""
+    import fakes
+
+    db = fakes.FakeSupabase()
+    fakes.install(supabase=db)
+    monkeypatch.setattr(singleflight, "_default", singleflight.SingleFlight(None))
+    yield db
+    clients.reset_clients()
@@ -0,0 +1,129 @@
+import logging
+
+import pytest
+
+from util.llm_json import (
+    JsonArrayScanner,
+    MalformedReply,
+    iter_json_array,
+    parse_json_array,
+    parse_json_lenient,
+    repair_json,
+    repair_json_status,
+)
+
+
+# ---------------------------------------------------------------------------
+# Well-formed input
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('["Python", "SQL"]', ["Python", "SQL"]),
+        ("[]", []),
+        ('["Python", "SQL",]', ["Python", "SQL"]),
+        ('```json\n["Python", "SQL"]\n```', ["Python", "SQL"]),
+        ('Here are the skills: ["A, B", "C]"] Hope this helps!', ["A, B", "C]"]),
+        ('[{"name": "dbt", "tags": ["etl", "sql"]}, 3, null]', [{"name": "dbt", "tags": ["etl", "sql"]}, 3, None]),
+        ('["say \\"hi\\"", "back\\\\slash"]', ['say "hi"', "back\\slash"]),
+    ],
+)
+def test_parse_json_array(text, expected, counter):
+    assert parse_json_array(text) == expected
+    assert parse_json_lenient(text) == expected
+    assert counter("json_repairs_total", source="llm", result="ok") == 0
+
+
+def test_iter_json_array_across_chunk_boundaries():
+    text = '["Py\\"thon", {"a": [1, 2]}, "SQL"]'
+    chunks = [text[i:i + 3] for i in range(0, len(text), 3)]
+    assert list(iter_json_array(chunks)) == ['Py"thon', {"a": [1, 2]}, "SQL"]
+
+
+def test_iter_json_array_stops_reading_at_closing_bracket():
+    consumed = []
+
+    def chunks():
+        for chunk in ['["a", ', '"b"]', " and some chatter", " that never ends"]:
+            consumed.append(chunk)
+            yield chunk
+
+    assert list(iter_json_array(chunks())) == ["a", "b"]
+    assert consumed == ['["a", ', '"b"]']
+
+
+def test_scanner_yields_elements_as_they_complete():
+    scanner = JsonArrayScanner()
+    assert scanner.feed('Sure: ["a", "b') == ["a"]
+    assert scanner.feed('", "c"') == ["b"]
+    assert scanner.feed("]") == ["c"]
+    assert scanner.done and scanner.count == 3
+
+
+# ---------------------------------------------------------------------------
+# Truncated input
+# ---------------------------------------------------------------------------
+
+def test_iter_json_array_raises_on_unterminated_stream():
+    with pytest.raises(ValueError, match="Unterminated"):
+        list(iter_json_array(['["a", "b"']))
+
+
+def test_truncated_between_elements_keeps_everything():
+    assert repair_json_status('["a", "b"') == (["a", "b"], True)
+    assert repair_json_status('["a", "b",') == (["a", "b"], True)
+
+
+def test_truncated_inside_element_drops_it_and_logs(caplog):
+    with caplog.at_level(logging.WARNING, logger="util.llm_json"):
+        assert repair_json('["a", "b') == ["a"]
+    assert "dropped incomplete element" in caplog.text
+    assert "'\"b'" in caplog.text
+    assert repair_json_status('["a", "b')[1] is True
+
+
+def test_truncated_nested_object_is_closed():
+    assert repair_json_status('{"missing_skills": ["a", "b"', "{") == ({"missing_skills": ["a", "b"]}, True)
+
+
+def test_truncated_reply_counted_by_parse_json_lenient(counter):
+    assert parse_json_lenient('["a", "b', source="groq") == ["a"]
+    assert counter("json_repairs_total", source="groq", result="truncated") == 1
+    assert counter("json_repairs_total", source="groq", result="ok") == 0
+
+
+# ---------------------------------------------------------------------------
+# Almost-JSON that repair fixes
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("['Python', 'SQL']", ["Python", "SQL"]),
+        ('["multi\nline"]', ["multi\nline"]),
+        ("['it\\'s']", ["it's"]),
+    ],
+)
+def test_repairs_without_truncation(text, expected, counter):
+    assert repair_json_status(text) == (expected, False)
+    assert parse_json_lenient(text) == expected
+    assert counter("json_repairs_total", source="llm", result="ok") == 1
+
+
+# ---------------------------------------------------------------------------
+# Garbage
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("text", ["", "no json here", "{not: an array}", '["a" "b"]', '["a": 1]'])
+def test_garbage_raises_malformed_reply(text, counter):
+    with pytest.raises(MalformedReply) as info:
+        parse_json_lenient(text)
+    assert info.value.text == text
+    assert isinstance(info.value, ValueError)
+    assert counter("json_repairs_total", source="llm", result="failed") == 1
+
+
+def test_scanner_rejects_empty_element():
+    with pytest.raises(ValueError, match="empty element"):
+        parse_json_array('["a",, "b"]')
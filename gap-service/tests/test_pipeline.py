@@ -0,0 +1,104 @@
+import sqlite3
+
+import pytest
+
+import fakes
+from pipeline import PipelineCheckpoint, run_streaming_pipeline
+
+
+@pytest.fixture
+def checkpoint():
+    return PipelineCheckpoint(":memory:")
+
+
+def _posting(job_id, *skills):
+    return {
+        "id": str(job_id),
+        "redirect_url": f"https://example.com/jobs/{job_id}",
+        "description": f"Posting {job_id}. " + " ".join(f"Experience with {s}." for s in skills),
+    }
+
+
+# ---------------------------------------------------------------------------
+# PipelineCheckpoint
+# ---------------------------------------------------------------------------
+
+def test_checkpoint_round_trip(checkpoint):
+    assert checkpoint.load("u1", "Data Engineer") is None
+    aggregate = {"python": {"count": 2, "evidence": "https://example.com/jobs/1"}}
+    checkpoint.save("u1", "Data Engineer", {"a", "b"}, aggregate, {"python", "sql"})
+
+    assert checkpoint.load("u1", "Data Engineer") == ({"a", "b"}, aggregate, {"python", "sql"})
+    assert checkpoint.load("u1", "Web Developer") is None
+    checkpoint.clear("u1", "Data Engineer")
+    assert checkpoint.load("u1", "Data Engineer") is None
+
+
+def test_checkpoint_migrates_files_without_written(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE checkpoints (user_id TEXT NOT NULL, dream_role TEXT NOT NULL, "
+        "processed TEXT NOT NULL, aggregate TEXT NOT NULL, updated_at REAL NOT NULL, "
+        "PRIMARY KEY (user_id, dream_role))"
+    )
+    conn.execute("INSERT INTO checkpoints VALUES ('u1', 'Data Engineer', '[\"a\"]', '{}', 0)")
+    conn.commit()
+    conn.close()
+
+    assert PipelineCheckpoint(path).load("u1", "Data Engineer") == ({"a"}, {}, set())
+
+
+# ---------------------------------------------------------------------------
+# run_streaming_pipeline
+# ---------------------------------------------------------------------------
+
+TOP_SKILLS = ["Python", "SQL", "Spark", "Airflow", "Kubernetes", "Docker", "Terraform", "AWS", "Azure", "GCP"]
+
+
+def _run(jobs, checkpoint=None, **kwargs):
+    upserts, pruned = [], []
+    final = run_streaming_pipeline(
+        jobs,
+        user_id="u1",
+        dream_role="Data Engineer",
+        model=fakes.FakeGeminiModel(),
+        upsert=upserts.append,
+        prune=pruned.append,
+        checkpoint=checkpoint,
+        max_workers=1,
+        flush_every=2,
+        **kwargs,
+    )
+    return final, upserts, pruned
+
+
+def test_partial_skills_that_drop_out_are_pruned(checkpoint):
+    # The first two postings put Tableau in a partial upsert; the rest push it out of the top rows
+    jobs = [_posting(i, "Tableau") for i in range(2)]
+    jobs += [_posting(i, *TOP_SKILLS) for i in range(2, 8)]
+
+    final, upserts, pruned = _run(jobs, checkpoint)
+    final_names = {row["skill_name"] for row in final}
+    written = {row["skill_name"] for batch in upserts for row in batch}
+    assert len(final) == 10
+    assert upserts[-1] == final
+    assert pruned == [sorted(written - final_names)]
+    assert len(pruned[0]) == 1 and pruned[0][0] not in final_names
+    assert checkpoint.load("u1", "Data Engineer") is None
+
+
+def test_nothing_pruned_when_partials_stay(checkpoint):
+    final, upserts, pruned = _run([_posting(i, "Python", "SQL") for i in range(4)], checkpoint)
+    assert {row["skill_name"] for row in final} == {row["skill_name"] for row in upserts[0]}
+    assert pruned == []
+
+
+def test_resumed_run_prunes_names_written_before_the_interruption(checkpoint):
+    state = {"Tableau": {"count": 1, "evidence": "https://example.com/jobs/0"}}
+    checkpoint.save("u1", "Data Engineer", {"0"}, state, {"Tableau"})
+    jobs = [_posting(i, *TOP_SKILLS) for i in range(1, 5)]
+
+    final, _upserts, pruned = _run(jobs, checkpoint)
+    assert "Tableau" not in {row["skill_name"] for row in final}
+    assert pruned == [["Tableau"]]
@@ -0,0 +1,141 @@
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit
+from util.llm_json import MalformedReply
+from rate_limit import TokenBucket, call_rate_limited, is_rate_limit_error, retry_after_seconds
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+class APIError(Exception):
+    def __init__(self, message, status_code=None, headers=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record time.sleep calls in rate_limit instead of sleeping."""
+    slept = []
+    monkeypatch.setattr(rate_limit.time, "sleep", slept.append)
+    return slept
+
+
+def _flaky(failures, error):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error
+        return "ok"
+
+    return fn, calls
+
+
+# ---------------------------------------------------------------------------
+# Classification
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("exc", [
+    APIError("slow down", status_code=429),
+    ResourceExhausted("quota"),
+    RuntimeError("HTTP 429 Too Many Requests"),
+    RuntimeError("You exceeded your current quota"),
+])
+def test_rate_limit_errors(exc):
+    assert is_rate_limit_error(exc)
+
+
+@pytest.mark.parametrize("exc", [
+    APIError("server error", status_code=500),
+    RuntimeError("unknown model 4290"),
+    RuntimeError("sales quota report failed"),
+    MalformedReply("429 items, bad JSON", "[429"),
+])
+def test_other_errors(exc):
+    assert not is_rate_limit_error(exc)
+
+
+def test_retry_after_from_header_or_message():
+    assert retry_after_seconds(APIError("429", 429, {"retry-after": "7"})) == 7.0
+    assert retry_after_seconds(RuntimeError("429: retry_delay { seconds: 12 }")) == 12.0
+    assert retry_after_seconds(RuntimeError("429")) is None
+
+
+# ---------------------------------------------------------------------------
+# Retry on 429
+# ---------------------------------------------------------------------------
+
+def test_retries_on_429_with_backoff(sleeps, counter):
+    fn, calls = _flaky(2, APIError("slow down", status_code=429))
+    assert call_rate_limited(fn, None) == "ok"
+    assert len(calls) == 3
+    assert sleeps == [2.0, 4.0]
+    assert counter("retries_total", reason="rate_limit") == 2
+
+
+def test_honors_retry_after(sleeps):
+    fn, _calls = _flaky(1, APIError("slow down", 429, {"retry-after": "9"}))
+    assert call_rate_limited(fn, None) == "ok"
+    assert sleeps == [9.0]
+
+
+def test_gives_up_after_max_retries(sleeps):
+    fn, calls = _flaky(10, APIError("slow down", status_code=429))
+    with pytest.raises(APIError):
+        call_rate_limited(fn, None)
+    assert len(calls) == rate_limit.MAX_RATE_LIMIT_RETRIES + 1
+
+
+def test_other_errors_are_not_retried(sleeps):
+    fn, calls = _flaky(1, MalformedReply("not JSON", "oops"))
+    with pytest.raises(MalformedReply):
+        call_rate_limited(fn, None)
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_429_pauses_the_limiter(sleeps):
+    bucket = TokenBucket(600, burst=5)
+    paused = []
+    bucket.pause = paused.append
+    fn, calls = _flaky(1, APIError("slow down", status_code=429))
+    assert call_rate_limited(fn, bucket) == "ok"
+    assert paused == [2.0]
+    assert len(calls) == 2
+
+
+# ---------------------------------------------------------------------------
+# TokenBucket
+# ---------------------------------------------------------------------------
+
+def test_bucket_allows_burst_then_paces(sleeps, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda s: (sleeps.append(s), now.__setitem__(0, now[0] + s)))
+
+    bucket = TokenBucket(60, burst=2)   # one request per second
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_bucket_pause_holds_back_callers(sleeps, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda s: (sleeps.append(s), now.__setitem__(0, now[0] + s)))
+
+    bucket = TokenBucket(6000, burst=10)
+    bucket.pause(5.0)
+    assert bucket.acquire() >= 5.0
+
+
+def test_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
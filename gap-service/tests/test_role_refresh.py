@@ -0,0 +1,122 @@
+import pytest
+
+import rate_limit
+from role_profiles import RoleProfileStore
+from role_refresh import BudgetLimiter, LLMBudgetExhausted, refresh_roles
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+@pytest.fixture
+def store():
+    s = RoleProfileStore(":memory:")
+    yield s
+    s.close()
+
+
+def _rows(dream_role, *skills):
+    return [
+        {"user_id": None, "source": "market", "dream_role": dream_role,
+         "skill_name": s, "score": 1.0, "evidence": None}
+        for s in skills
+    ]
+
+
+def _builder(calls_per_role, calls):
+    """build() that sends calls_per_role LLM requests through the limiter."""
+    def build(dream_role, limiter):
+        for _ in range(calls_per_role):
+            try:
+                limiter.acquire()
+            except LLMBudgetExhausted:
+                break   # like the extraction loop: the posting is skipped
+            calls.append(dream_role)
+        return _rows(dream_role, "Python", "SQL")
+    return build
+
+
+# ---------------------------------------------------------------------------
+# BudgetLimiter
+# ---------------------------------------------------------------------------
+
+def test_budget_limiter_raises_once_spent():
+    budget = BudgetLimiter(2)
+    budget.acquire()
+    budget.acquire()
+    assert budget.remaining == 0
+    assert not budget.exhausted
+    with pytest.raises(LLMBudgetExhausted):
+        budget.acquire()
+    assert budget.exhausted
+    assert budget.used == 2
+
+
+def test_rate_limit_retries_spend_budget(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda _s: None)
+    budget = BudgetLimiter(2)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise RateLimited("429")
+
+    with pytest.raises(LLMBudgetExhausted):
+        rate_limit.call_rate_limited(fn, budget)
+    assert len(calls) == 2
+    assert budget.used == 2
+
+
+# ---------------------------------------------------------------------------
+# refresh_roles
+# ---------------------------------------------------------------------------
+
+def test_refresh_within_budget(store, counter):
+    calls = []
+    summary = refresh_roles(
+        [("Data Engineer", 30), ("Web Developer", 10)], _builder(2, calls),
+        store=store, llm_budget=10, calls_per_role=2, min_age_s=3600,
+    )
+    assert summary["refreshed"] == ["Data Engineer", "Web Developer"]
+    assert summary["llm_calls"] == 4
+    assert [r["skill_name"] for r in store.get("data engineer")["rows"]] == ["Python", "SQL"]
+    assert counter("role_refreshes_total", result="refreshed") == 2
+
+
+def test_fresh_roles_are_skipped(store):
+    store.put("Data Engineer", _rows("Data Engineer", "Go"))
+    calls = []
+    summary = refresh_roles(
+        [("Data Engineer", 30)], _builder(2, calls),
+        store=store, llm_budget=10, calls_per_role=2, min_age_s=3600,
+    )
+    assert summary["fresh"] == ["Data Engineer"]
+    assert calls == []
+
+
+def test_roles_past_the_budget_keep_their_old_profile(store, counter):
+    store.put("Web Developer", _rows("Web Developer", "Go"))
+    calls = []
+    summary = refresh_roles(
+        [("Data Engineer", 30), ("Web Developer", 10)], _builder(3, calls),
+        store=store, llm_budget=4, calls_per_role=1, min_age_s=0,
+    )
+    assert summary["refreshed"] == ["Data Engineer"]
+    assert summary["over_budget"] == ["Web Developer"]
+    assert summary["llm_calls"] == 4
+    # The partial build was refused, the previous profile kept
+    assert [r["skill_name"] for r in store.get("Web Developer")["rows"]] == ["Go"]
+    assert counter("role_refreshes_total", result="over_budget") == 1
+
+
+def test_failed_build_is_reported(store):
+    def build(dream_role, limiter):
+        raise RuntimeError("adzuna down")
+
+    summary = refresh_roles(
+        [("Data Engineer", 30)], build,
+        store=store, llm_budget=10, calls_per_role=1, min_age_s=0,
+    )
+    assert summary["failed"] == ["Data Engineer"]
+    assert store.get("Data Engineer") is None
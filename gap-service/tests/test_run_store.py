@@ -0,0 +1,136 @@
+import pytest
+
+from skills import gap_analysis
+from skills.run_store import GapRunStore, skills_fingerprint
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = GapRunStore(str(tmp_path / "runs" / "gap_runs.sqlite3"))
+    yield s
+    s.close()
+
+
+def _result(run_id, missing=("Docker",)):
+    return {"run_id": run_id, "missing_skills": list(missing), "parent_run_id": None}
+
+
+# ---------------------------------------------------------------------------
+# GapRunStore
+# ---------------------------------------------------------------------------
+
+def test_fingerprint_ignores_order_case_and_aliases():
+    a = skills_fingerprint(["Python", "React.js"], ["SQL", "Kubernetes"], "m")
+    b = skills_fingerprint(["reactjs", "python"], ["k8s", "sql", "SQL"], "m")
+    assert a == b
+
+
+def test_fingerprint_changes_with_skills_and_model():
+    base = skills_fingerprint(["Python"], ["SQL"], "m")
+    assert skills_fingerprint(["Python", "Go"], ["SQL"], "m") != base
+    assert skills_fingerprint(["Python"], ["SQL", "Docker"], "m") != base
+    assert skills_fingerprint(["Python"], ["SQL"], "other-model") != base
+
+
+def test_latest_returns_last_saved_run(store):
+    assert store.latest("u1") is None
+    store.save("u1", "fp1", _result("r1"), ["Python"], ["SQL"])
+    store.save("u1", "fp2", _result("r2"), ["Python"], ["SQL", "Docker"])
+
+    latest = store.latest("u1")
+    assert latest["run_id"] == "r2"
+    assert latest["fingerprint"] == "fp2"
+    assert latest["result"]["missing_skills"] == ["Docker"]
+    assert latest["market_skills"] == ["SQL", "Docker"]
+    assert store.latest("u2") is None
+
+
+def test_discard_only_forgets_the_given_run(store):
+    store.save("u1", "fp", _result("r1"), [], ["SQL"])
+    store.discard("u1", "r0")  # an older run: the stored one stays
+    assert store.latest("u1")["run_id"] == "r1"
+    store.discard("u1", "r1")
+    assert store.latest("u1") is None
+
+
+def test_runs_survive_reopening(tmp_path):
+    path = str(tmp_path / "gap_runs.sqlite3")
+    s = GapRunStore(path)
+    s.save("u1", "fp", _result("r1"), [], ["SQL"])
+    s.close()
+    s = GapRunStore(path)
+    assert s.latest("u1")["run_id"] == "r1"
+    s.close()
+
+
+# ---------------------------------------------------------------------------
+# Reuse and invalidation in analyze_skill_gaps
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def gap_env(fake_supabase, tmp_path, monkeypatch):
+    import fakes
+
+    groq = fakes.FakeGroq()
+    fakes.install(supabase=fake_supabase, groq=groq)
+    monkeypatch.setenv("GAP_RUN_STORE_PATH", str(tmp_path / "gap_runs.sqlite3"))
+    monkeypatch.setenv("GAP_WRITE_BEHIND", "0")
+    monkeypatch.setenv("GAP_MATCH_MODE", "llm")
+    monkeypatch.setattr(gap_analysis, "_run_store", None)
+    (user_id,) = fakes.seed_users(fake_supabase, 1)
+    yield fake_supabase, groq, user_id
+    if gap_analysis._run_store is not None:
+        gap_analysis._run_store.close()
+
+
+def _gap_rows(db, run_id):
+    return db.table("gap_skills").select("skill_name").eq("run_id", run_id).execute().data
+
+
+def test_unchanged_skills_reuse_the_previous_run(gap_env):
+    db, groq, user_id = gap_env
+    first = gap_analysis.analyze_skill_gaps(user_id)
+    calls = groq.calls
+
+    second = gap_analysis.analyze_skill_gaps(user_id)
+    assert second["reused"] is True
+    assert second["run_id"] == first["run_id"]
+    assert second["missing_skills"] == first["missing_skills"]
+    assert second["gap_skills_inserted"] == 0
+    assert groq.calls == calls
+    assert len(_gap_rows(db, first["run_id"])) == len(first["missing_skills"])
+
+
+def test_force_recomputes(gap_env):
+    _db, groq, user_id = gap_env
+    first = gap_analysis.analyze_skill_gaps(user_id)
+    calls = groq.calls
+
+    forced = gap_analysis.analyze_skill_gaps(user_id, force=True)
+    assert forced["reused"] is False
+    assert forced["run_id"] != first["run_id"]
+    assert groq.calls > calls
+
+
+def test_deleted_gap_rows_invalidate_the_run(gap_env):
+    db, _groq, user_id = gap_env
+    first = gap_analysis.analyze_skill_gaps(user_id)
+    assert first["missing_skills"], "seeded user should have gaps"
+    db.table("gap_skills").delete().eq("user_id", user_id).execute()
+
+    again = gap_analysis.analyze_skill_gaps(user_id)
+    assert again["reused"] is False
+    assert again["run_id"] != first["run_id"]
+    assert sorted(r["skill_name"] for r in _gap_rows(db, again["run_id"])) == sorted(again["missing_skills"])
+
+
+def test_changed_skills_invalidate_the_run(gap_env):
+    db, _groq, user_id = gap_env
+    first = gap_analysis.analyze_skill_gaps(user_id)
+    db.table("skills").insert([{"user_id": user_id, "source": "market", "skill_name": "Rust"}]).execute()
+
+    again = gap_analysis.analyze_skill_gaps(user_id)
+    assert again["reused"] is False
+    assert "Rust" in again["missing_skills"]
+    assert gap_analysis._get_run_store().latest(user_id)["run_id"] == again["run_id"]
+    assert again["run_id"] != first["run_id"]
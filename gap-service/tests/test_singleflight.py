@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+
+import pytest
+
+from util.singleflight import SingleFlight, fcntl
+
+
+def _run_concurrently(n, target):
+    results, errors = [None] * n, [None] * n
+
+    def run(i):
+        try:
+            results[i] = target(i)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    return results, errors
+
+
+def _slow(calls, result, started=None, delay=0.2):
+    def fn():
+        calls.append(1)
+        if started is not None:
+            started.set()
+        time.sleep(delay)
+        return result
+    return fn
+
+
+# ---------------------------------------------------------------------------
+# In-process
+# ---------------------------------------------------------------------------
+
+def test_concurrent_callers_share_one_run(counter):
+    flight = SingleFlight()
+    calls = []
+    fn = _slow(calls, {"run_id": "r1"})
+
+    results, errors = _run_concurrently(5, lambda _i: flight.do("gap", "u1", fn))
+    assert errors == [None] * 5
+    assert results == [{"run_id": "r1"}] * 5
+    assert len(calls) == 1
+    assert counter("singleflight_total", op="gap", result="leader") == 1
+    assert counter("singleflight_total", op="gap", result="shared") == 4
+
+
+def test_waiters_get_the_leaders_exception():
+    flight = SingleFlight()
+    started = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        raise RuntimeError("llm down")
+
+    def call(i):
+        if i:
+            started.wait()
+        return flight.do("gap", "u1", fn)
+
+    _results, errors = _run_concurrently(3, call)
+    assert len(calls) == 1
+    assert all(isinstance(e, RuntimeError) and str(e) == "llm down" for e in errors)
+
+
+def test_different_keys_and_ops_run_separately():
+    flight = SingleFlight()
+    calls = []
+    keys = [("gap", "u1"), ("gap", "u2"), ("market", "u1")]
+    results, _errors = _run_concurrently(
+        3, lambda i: flight.do(*keys[i], _slow(calls, keys[i], delay=0.05))
+    )
+    assert len(calls) == 3
+    assert results == keys
+
+
+def test_finished_run_is_not_reused():
+    flight = SingleFlight()
+    calls = []
+    assert flight.do("gap", "u1", lambda: calls.append(1) or len(calls)) == 1
+    assert flight.do("gap", "u1", lambda: calls.append(1) or len(calls)) == 2
+
+
+# ---------------------------------------------------------------------------
+# Cross-process (separate lock handles stand in for separate processes)
+# ---------------------------------------------------------------------------
+
+needs_fcntl = pytest.mark.skipif(fcntl is None, reason="cross-process coalescing needs fcntl")
+
+
+@needs_fcntl
+def test_waiting_process_reads_the_leaders_result(tmp_path, counter):
+    leader, waiter = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    started = threading.Event()
+    calls = []
+
+    def call(i):
+        if i == 0:
+            return leader.do("gap", "u1", _slow(calls, {"run_id": "r1"}, started))
+        started.wait()
+        return waiter.do("gap", "u1", _slow(calls, {"run_id": "r2"}))
+
+    results, errors = _run_concurrently(2, call)
+    assert errors == [None, None]
+    assert results == [{"run_id": "r1"}, {"run_id": "r1"}]
+    assert len(calls) == 1
+    assert counter("singleflight_total", op="gap", result="shared_process") == 1
+    assert os.listdir(tmp_path) == []
+
+
+@needs_fcntl
+def test_waiting_process_reruns_after_a_failed_leader(tmp_path):
+    leader, waiter = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.2)
+        raise RuntimeError("llm down")
+
+    def call(i):
+        if i == 0:
+            return leader.do("gap", "u1", fail)
+        started.wait()
+        return waiter.do("gap", "u1", lambda: "recomputed")
+
+    results, errors = _run_concurrently(2, call)
+    assert isinstance(errors[0], RuntimeError)
+    assert results[1] == "recomputed"
+    assert os.listdir(tmp_path) == []
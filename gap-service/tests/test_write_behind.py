@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+from util.write_behind import WriteBehindBuffer
+
+
+class Sink:
+    """Write function recording batches; fails the first `failures` attempts."""
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.batches = []
+        self.retry_flags = []
+        self._lock = threading.Lock()
+
+    def __call__(self, rows, retry):
+        time.sleep(self.delay)
+        with self._lock:
+            self.retry_flags.append(retry)
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("supabase unavailable")
+            self.batches.append(list(rows))
+
+    @property
+    def rows(self):
+        return [row for batch in self.batches for row in batch]
+
+
+def _buffer(sink, **kwargs):
+    kwargs.setdefault("max_delay_s", 60.0)   # only flush/close/max_rows write
+    kwargs.setdefault("backoff_s", 0.001)
+    return WriteBehindBuffer(sink, name="test", **kwargs)
+
+
+def test_close_flushes_pending_rows():
+    sink = Sink()
+    buf = _buffer(sink)
+    buf.add([{"id": 1}, {"id": 2}])
+    buf.add([{"id": 3}])
+    assert sink.rows == []
+
+    buf.close()
+    assert sink.rows == [{"id": 1}, {"id": 2}, {"id": 3}]
+    assert buf.stats() == {
+        "pending": 0, "batches": 1, "rows_written": 3,
+        "rows_coalesced": 0, "retries": 0, "rows_failed": 0,
+    }
+
+
+def test_add_after_close_raises():
+    buf = _buffer(Sink())
+    buf.close()
+    with pytest.raises(RuntimeError):
+        buf.add([{"id": 1}])
+
+
+def test_flush_waits_for_the_write():
+    sink = Sink(delay=0.1)
+    buf = _buffer(sink)
+    buf.add([{"id": 1}])
+    buf.flush()
+    assert sink.rows == [{"id": 1}]
+    buf.add([{"id": 2}])
+    buf.flush()
+    assert sink.rows == [{"id": 1}, {"id": 2}]
+    buf.close()
+
+
+def test_max_rows_triggers_a_write_without_flush():
+    sink = Sink()
+    buf = _buffer(sink, max_rows=2)
+    buf.add([{"id": 1}, {"id": 2}])
+    deadline = time.monotonic() + 5
+    while not sink.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sink.batches == [[{"id": 1}, {"id": 2}]]
+    buf.close()
+
+
+def test_max_delay_triggers_a_write():
+    sink = Sink()
+    buf = _buffer(sink, max_delay_s=0.05)
+    buf.add([{"id": 1}])
+    deadline = time.monotonic() + 5
+    while not sink.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sink.rows == [{"id": 1}]
+    buf.close()
+
+
+def test_keyed_rows_coalesce_latest_wins():
+    sink = Sink()
+    buf = _buffer(sink, key=lambda r: (r["user_id"], r["skill_name"]))
+    buf.add([{"user_id": "u1", "skill_name": "SQL", "score": 0.5}])
+    buf.add([
+        {"user_id": "u1", "skill_name": "SQL", "score": 0.9},
+        {"user_id": "u2", "skill_name": "SQL", "score": 0.1},
+    ])
+    buf.close()
+    assert sink.rows == [
+        {"user_id": "u1", "skill_name": "SQL", "score": 0.9},
+        {"user_id": "u2", "skill_name": "SQL", "score": 0.1},
+    ]
+    assert buf.stats()["rows_coalesced"] == 1
+
+
+def test_groups_are_never_split_across_batches():
+    sink = Sink()
+    buf = _buffer(sink, max_rows=3)
+    buf.add([{"run": "a"}] * 2)
+    buf.add([{"run": "b"}] * 2)
+    buf.add([{"run": "c"}] * 4)
+    buf.close()
+    assert [[r["run"] for r in batch] for batch in sink.batches] == [["a", "a"], ["b", "b"], ["c"] * 4]
+
+
+def test_failed_write_is_retried(counter):
+    sink = Sink(failures=2)
+    buf = _buffer(sink)
+    buf.add([{"id": 1}])
+    buf.close()
+    assert sink.retry_flags == [False, True, True]
+    assert sink.rows == [{"id": 1}]
+    assert buf.stats()["retries"] == 2
+    assert counter("retries_total", reason="write_behind") == 2
+
+
+def test_on_failure_gets_rows_after_the_last_retry(counter):
+    sink = Sink(failures=10)
+    failed = []
+    buf = _buffer(sink, max_retries=2, on_failure=failed.extend)
+    buf.add([{"id": 1}, {"id": 2}])
+    buf.flush()
+    assert failed == [{"id": 1}, {"id": 2}]
+    assert len(sink.retry_flags) == 3
+    assert buf.stats()["rows_failed"] == 2
+    assert counter("failures_total", pipeline="write_behind", stage="test") == 1
+    buf.close()
@@ -128,6 +128,8 @@ Deno.serve(async (req) => {
     const supabaseUrl = Deno.env.get("SUPABASE_URL")!;
     const serviceRoleKey = Deno.env.get("SUPABASE_SERVICE_ROLE_KEY")!;
     const lovableApiKey = Deno.env.get("LOVABLE_API_KEY")!;
+    // Hand gap analysis to the Python worker (gap-service/run_worker.py)
+    const queueGapAnalysis = Deno.env.get("GAP_WORKER_QUEUE") === "1";
 
     const supabase = createClient(supabaseUrl, serviceRoleKey, {
       auth: { autoRefreshToken: false, persistSession: false },
@@ -246,27 +248,53 @@ Deno.serve(async (req) => {
         }
       }
 
-      // Run gap analysis
-      const gaps = await identifyGaps(resumeSkills, marketSkills, lovableApiKey);
-      console.log("Gap analysis result:", { gaps_found: gaps.length });
-
-      if (gaps.length > 0) {
-        // Clear old gap skills for this user
-        await supabase.from("gap_skills").delete().eq("user_id", user_id);
-
-        // Insert new gap skills with priorities
-        const gapRows = gaps.map((skillName, index) => ({
-          user_id,
-          skill_name: skillName,
-          priority: Math.floor(index / 2) + 1, // Groups of 2 per priority level
-          reason: "Missing from resume; appears in job listings.",
-        }));
-
-        const { error: gapError } = await supabase.from("gap_skills").insert(gapRows);
-        if (gapError) {
-          console.error("Failed to insert gap skills:", gapError);
+      if (queueGapAnalysis) {
+        // The worker claims runs rows with status "gap_pending"; keep at most
+        // one pending job per user
+        const { data: pending } = await supabase
+          .from("runs")
+          .select("id")
+          .eq("user_id", user_id)
+          .eq("status", "gap_pending")
+          .limit(1);
+
+        if (pending && pending.length > 0) {
+          console.log("Gap analysis already queued", { user_id, run_id: pending[0].id });
         } else {
-          console.log("Gap skills inserted:", gapRows.length);
+          const { error: queueError } = await supabase.from("runs").insert({
+            user_id,
+            dream_role,
+            term: term ?? null,
+            status: "gap_pending",
+          });
+          if (queueError) {
+            throw new Error(`Failed to queue gap analysis: ${queueError.message}`);
+          }
+          console.log("Gap analysis queued", { user_id });
+        }
+      } else {
+        // Run gap analysis
+        const gaps = await identifyGaps(resumeSkills, marketSkills, lovableApiKey);
+        console.log("Gap analysis result:", { gaps_found: gaps.length });
+
+        if (gaps.length > 0) {
+          // Clear old gap skills for this user
+          await supabase.from("gap_skills").delete().eq("user_id", user_id);
+
+          // Insert new gap skills with priorities
+          const gapRows = gaps.map((skillName, index) => ({
+            user_id,
+            skill_name: skillName,
+            priority: Math.floor(index / 2) + 1, // Groups of 2 per priority level
+            reason: "Missing from resume; appears in job listings.",
+          }));
+
+          const { error: gapError } = await supabase.from("gap_skills").insert(gapRows);
+          if (gapError) {
+            console.error("Failed to insert gap skills:", gapError);
+          } else {
+            console.log("Gap skills inserted:", gapRows.length);
+          }
         }
       }
     } else {